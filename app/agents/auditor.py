@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
-
-from app.config import get_openai_key
+from app.agents.clients import get_chat_client
+from app.agents.llm import invoke_structured
+from app.agents.llm_cache import get_response_cache
 from app.schemas import AuditReport
-from app.prompts import AUDITOR_SYSTEM
+from app.prompts import AUDITOR_SYSTEM, build_audit_prompt
+from app.agents.checks import BLOCKING_CATEGORIES, LOCAL_CATEGORIES, run_local_checks
+from app.tracing import span, traced
 
 
 class AuditorAgent:
@@ -14,43 +14,80 @@ class AuditorAgent:
     LLM-based educational auditor with structured critique output.
     """
 
-    def __init__(self, model: str = "gpt-4o-mini"):
-        api_key = get_openai_key()
-        if not api_key:
-            raise RuntimeError(
-                "OPENAI_API_KEY not found (set in .env, env vars, or .streamlit/secrets.toml)"
-            )
-        self.client = ChatOpenAI(model=model, temperature=0.1, openai_api_key=api_key)
+    def __init__(self, model: str = "gpt-4o-mini", client=None):
+        # Shared client (agents.clients); tests and benchmarks can pass their own chat model.
+        self.client = client if client is not None else get_chat_client(model, temperature=0.1)
+        self.cache = get_response_cache()
 
-    def audit(self, qb_json: dict, context_snippets: list[dict], targets: dict) -> AuditReport:
-        parser = PydanticOutputParser(pydantic_object=AuditReport)
-        ctx_lines = []
-        for i, snip in enumerate(context_snippets, start=1):
-            ctx_lines.append(
-                f"[SNIPPET {i}] source={snip.get('source')} page={snip.get('page')} "
-                f"source_type={snip.get('source_type','material')}\n{snip.get('text')}\n"
+    @traced("audit")
+    def audit(
+        self,
+        qb_json: dict,
+        context_snippets: list[dict],
+        targets: dict,
+        retained_questions: list[str] | None = None,
+        embedder=None,
+        short_circuit: bool = True,
+        context_count: int | None = None,
+    ) -> AuditReport:
+        """
+        Runs the deterministic checks (agents.checks.run_local_checks) first.
+        If a bank-wide one fails (BLOCKING_CATEGORIES: the whole bank will be
+        regenerated) and `short_circuit` is set, their report is returned and
+        the LLM is not called; otherwise the LLM audits a compact digest of
+        the bank (see prompts.build_audit_prompt) for the semantic red lines
+        only and the local issues are merged in. With `retained_questions`,
+        only the given (changed) questions are audited, Redundancy is checked
+        against the retained ones, and bank-wide Distribution and Quantity
+        are left to the caller. `context_count` sizes the Quantity check (see
+        run_local_checks).
+        """
+        with span("audit.local_checks") as sp:
+            local_issues = run_local_checks(
+                qb_json,
+                context_snippets,
+                targets,
+                retained_questions=retained_questions,
+                embedder=embedder,
+                context_count=context_count,
+            )
+            sp.set(issues=len(local_issues))
+        categories = sorted({iss.category for iss in local_issues})
+        if short_circuit and BLOCKING_CATEGORIES.intersection(categories):
+            return AuditReport(
+                passed=False,
+                issues=local_issues,
+                summary=(
+                    f"Failed local checks ({', '.join(categories)}); "
+                    "LLM audit skipped until these are fixed."
+                ),
             )
-        ctx_text = "\n".join(ctx_lines)
-
-        prompt = f"""
-Question Bank JSON:
-{qb_json}
 
-Targets:
-{targets}
+        prompt = build_audit_prompt(
+            qb_json,
+            context_snippets,
+            targets,
+            local_checks=LOCAL_CATEGORIES,
+        )
 
-Context snippets:
-{ctx_text}
-"""
+        from langchain_core.output_parsers import PydanticOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
 
-        chain = (
-            ChatPromptTemplate.from_messages(
-                [
-                    ("system", AUDITOR_SYSTEM),
-                    ("user", "{prompt}\n\n{format_instructions}"),
-                ]
-            )
-            | self.client
-            | parser
+        parser = PydanticOutputParser(pydantic_object=AuditReport)
+        template = ChatPromptTemplate.from_messages(
+            [
+                ("system", AUDITOR_SYSTEM),
+                ("user", "{prompt}\n\n{format_instructions}"),
+            ]
+        )
+        report = invoke_structured(
+            self.client,
+            template,
+            parser,
+            {"prompt": prompt, "format_instructions": parser.get_format_instructions()},
+            cache=self.cache,
         )
-        return chain.invoke({"prompt": prompt, "format_instructions": parser.get_format_instructions()})
+        if local_issues:
+            report.issues.extend(local_issues)
+            report.passed = False
+        return report
@@ -0,0 +1,196 @@
+from __future__ import annotations
+import re
+from collections import Counter
+
+import numpy as np
+
+from app.schemas import AuditIssue
+
+# Red-line categories answered locally; the LLM auditor is told to skip them.
+LOCAL_CATEGORIES = ["Distribution", "Quantity", "Redundancy"]
+# Bank-wide failures that send the whole bank back for regeneration; an LLM audit of it would be wasted.
+BLOCKING_CATEGORIES = frozenset({"Distribution", "Quantity"})
+
+WORD_RE = re.compile(r"\w+")
+
+
+def _norm(s: str) -> str:
+    return " ".join(WORD_RE.findall((s or "").lower()))
+
+
+def check_distribution(qb_json: dict, targets: dict, tolerance: float = 15.0) -> list[AuditIssue]:
+    """
+    Compares the Easy/Medium/Hard split against targets['difficulty_distribution']
+    (percentages). Allows `tolerance` points, or one question's share if larger.
+    """
+    wanted = targets.get("difficulty_distribution") or {}
+    questions = qb_json.get("questions", [])
+    if not wanted or not questions:
+        return []
+    counts = Counter(q.get("difficulty") for q in questions)
+    slack = max(tolerance, 100.0 / len(questions))
+    issues = []
+    for level, pct in wanted.items():
+        actual = 100.0 * counts.get(level, 0) / len(questions)
+        if abs(actual - float(pct)) > slack:
+            issues.append(
+                AuditIssue(
+                    id=None,
+                    category="Distribution",
+                    detail=f"{level}: {actual:.0f}% of questions vs {pct}% requested.",
+                )
+            )
+    return issues
+
+
+def check_quantity(qb_json: dict, targets: dict, context_count: int) -> list[AuditIssue]:
+    # Only enforced when the context is reasonably sized.
+    target_count = int(targets.get("num_questions", 0) or 0)
+    generated = len(qb_json.get("questions", []))
+    if target_count and context_count >= max(10, target_count) and generated < target_count:
+        return [
+            AuditIssue(
+                id=None,
+                category="Quantity",
+                detail=f"Requested {target_count} questions, generated {generated}.",
+            )
+        ]
+    return []
+
+
+def check_citations(qb_json: dict, context_snippets: list[dict], min_overlap: float = 0.8) -> list[AuditIssue]:
+    """
+    Every citation must name a retrieved source+page, and its snippet must be
+    grounded in that page's text (normalized substring, or at least
+    `min_overlap` of its words present).
+    """
+    by_page: dict[tuple, list[str]] = {}
+    for snip in context_snippets:
+        by_page.setdefault((snip.get("source"), snip.get("page")), []).append(_norm(snip.get("text", "")))
+
+    issues = []
+    for q in qb_json.get("questions", []):
+        for c in q.get("source_citation", []):
+            texts = by_page.get((c.get("source"), c.get("page")))
+            if not texts:
+                issues.append(
+                    AuditIssue(
+                        id=q.get("id"),
+                        category="Hallucination",
+                        detail=f"Cites {c.get('source')} p{c.get('page')}, which is not in the retrieved context.",
+                    )
+                )
+                continue
+            cited = _norm(c.get("snippet", ""))
+            if not cited or any(cited in t for t in texts):
+                continue
+            words = cited.split()
+            best = max(sum(1 for w in words if w in set(t.split())) / len(words) for t in texts)
+            if best < min_overlap:
+                issues.append(
+                    AuditIssue(
+                        id=q.get("id"),
+                        category="Hallucination",
+                        detail=f"Cited snippet is not found in {c.get('source')} p{c.get('page')}.",
+                    )
+                )
+    return issues
+
+
+def _similarity_matrix(texts: list[str], embedder=None) -> np.ndarray:
+    if embedder is not None:
+        vecs = np.asarray(embedder.embed_documents(texts), dtype=np.float32)
+        norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vecs = vecs / norms
+        return vecs @ vecs.T
+    # Word-set Jaccard when no embedder is available.
+    sets = [set(_norm(t).split()) for t in texts]
+    n = len(sets)
+    sim = np.eye(n, dtype=np.float32)
+    for i in range(n):
+        for j in range(i + 1, n):
+            union = sets[i] | sets[j]
+            sim[i, j] = sim[j, i] = len(sets[i] & sets[j]) / len(union) if union else 0.0
+    return sim
+
+
+def check_redundancy(
+    qb_json: dict,
+    retained_questions: list[str] | None = None,
+    embedder=None,
+    threshold: float | None = None,
+) -> list[AuditIssue]:
+    """
+    Flags question pairs whose cosine similarity (embedder) or word Jaccard
+    (no embedder) is at or above `threshold`. Retained questions are only
+    compared against the audited ones, not against each other.
+    """
+    questions = qb_json.get("questions", [])
+    retained = list(retained_questions or [])
+    if len(questions) + len(retained) < 2 or not questions:
+        return []
+    threshold = threshold if threshold is not None else (0.9 if embedder is not None else 0.6)
+    texts = [q.get("question_text", "") for q in questions] + retained
+    sim = _similarity_matrix(texts, embedder)
+    n = len(questions)
+    issues = []
+    for i in range(n):
+        for j in range(i + 1, len(texts)):
+            if sim[i, j] >= threshold:
+                if j < n:
+                    # Within the bank only the later question is flagged; the earlier one stays.
+                    flagged, other = questions[j].get("id"), questions[i].get("id")
+                else:
+                    flagged, other = questions[i].get("id"), "an approved question"
+                issues.append(
+                    AuditIssue(
+                        id=flagged,
+                        category="Redundancy",
+                        detail=f"{flagged} is near-identical to {other} (similarity {sim[i, j]:.2f}).",
+                    )
+                )
+    return issues
+
+
+def find_near_duplicates(
+    texts: list[str],
+    against: list[str],
+    embedder=None,
+    threshold: float | None = None,
+) -> list[int]:
+    """
+    Indices of `texts` that are near-identical to any of `against`, by the
+    same measure and default thresholds as check_redundancy.
+    """
+    if not texts or not against:
+        return []
+    threshold = threshold if threshold is not None else (0.9 if embedder is not None else 0.6)
+    sim = _similarity_matrix(list(texts) + list(against), embedder)
+    n = len(texts)
+    return [i for i in range(n) if (sim[i, n:] >= threshold).any()]
+
+
+def run_local_checks(
+    qb_json: dict,
+    context_snippets: list[dict],
+    targets: dict,
+    retained_questions: list[str] | None = None,
+    embedder=None,
+    context_count: int | None = None,
+) -> list[AuditIssue]:
+    """
+    Deterministic red-line checks that need no LLM: citation grounding and
+    Redundancy on the given questions, plus bank-wide Distribution and
+    Quantity unless this is a partial audit (`retained_questions` given).
+    Quantity is sized on `context_count` (snippets retrieved before packing)
+    when given, else on the snippets passed in.
+    """
+    issues: list[AuditIssue] = []
+    if retained_questions is None:
+        issues += check_distribution(qb_json, targets)
+        count = len(context_snippets) if context_count is None else context_count
+        issues += check_quantity(qb_json, targets, count)
+    issues += check_citations(qb_json, context_snippets)
+    issues += check_redundancy(qb_json, retained_questions=retained_questions, embedder=embedder)
+    return issues
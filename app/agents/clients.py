@@ -0,0 +1,59 @@
+from __future__ import annotations
+import threading
+from typing import TYPE_CHECKING
+
+from app.config import get_openai_base_url, get_openai_key
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+_CLIENTS: dict[tuple, ChatOpenAI] = {}
+_API_KEY: str | None = None
+_LOCK = threading.Lock()
+
+
+def _api_key() -> str:
+    # Read once per process; reset_clients() forgets it (e.g. after a key rotation).
+    global _API_KEY
+    if _API_KEY is None:
+        _API_KEY = get_openai_key()
+        if not _API_KEY:
+            raise RuntimeError(
+                "OPENAI_API_KEY not found (set in .env, env vars, or .streamlit/secrets.toml)"
+            )
+    return _API_KEY
+
+
+def get_chat_client(model: str, temperature: float, base_url: str | None = None) -> ChatOpenAI:
+    """
+    Process-wide ChatOpenAI per (model, temperature, base_url), shared by all
+    agents, threads and Streamlit sessions so each keeps one warm HTTP
+    connection pool instead of opening a new one per agent. `base_url`
+    defaults to OPENAI_BASE_URL.
+    """
+    base_url = base_url or get_openai_base_url()
+    key = (model, float(temperature), base_url)
+    with _LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            # Imported here: langchain_openai (and openai) cost about a second to import.
+            from langchain_openai import ChatOpenAI
+
+            client = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                openai_api_key=_api_key(),
+                base_url=base_url,
+                # Retries (with backoff and the shared rate limits) belong to agents.dispatch; the
+                # SDK's own would multiply them and retry outside the dispatcher's budget.
+                max_retries=0,
+            )
+            _CLIENTS[key] = client
+        return client
+
+
+def reset_clients() -> None:
+    global _API_KEY
+    with _LOCK:
+        _CLIENTS.clear()
+        _API_KEY = None
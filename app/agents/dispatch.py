@@ -0,0 +1,320 @@
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+from app.config import get_llm_dispatch_settings
+from app.tracing import current_span
+
+T = TypeVar("T")
+
+# Lower runs first. Interactive previews jump ahead of full banks and batch jobs.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BATCH = 10
+
+_PRIORITY: ContextVar[int] = ContextVar("llm_priority", default=PRIORITY_NORMAL)
+
+
+@contextmanager
+def llm_priority(level: int) -> Iterator[None]:
+    """
+    Sets the dispatch priority for LLM calls made in this context (thread or
+    task). Worker threads do not inherit it, so set it inside the worker.
+    """
+    token = _PRIORITY.set(level)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute` units per minute up to `capacity`. A zero rate
+    means unlimited.
+    """
+
+    def __init__(self, per_minute: float, capacity: float | None = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        # Seconds until `amount` is available (0 if it is now).
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        if self.rate:
+            self.level -= min(amount, self.capacity)
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    if getattr(exc, "status_code", None) == 429 or getattr(getattr(exc, "response", None), "status_code", None) == 429:
+        return True
+    if type(exc).__name__ == "RateLimitError":
+        return True
+    text = str(exc).lower()
+    return "429" in text or "rate limit" in text
+
+
+def _retry_after(exc: BaseException) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class Dispatcher:
+    """
+    Shared admission point for every LLM request in the process.
+
+    Requests wait in a priority queue (lower value first, FIFO within a
+    level) and are admitted only when both token buckets allow it: one on
+    requests per minute, one on estimated tokens per minute (prompt plus
+    expected completion). Calls that fail with a 429 are retried with
+    jittered exponential backoff (full jitter, honouring Retry-After) and
+    re-enter the queue. Queue depth and wait times are kept for metrics().
+    """
+
+    def __init__(
+        self,
+        rpm: float = 0,
+        tpm: float = 0,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        burst_s: float = 10.0,
+    ):
+        # Buckets hold `burst_s` seconds of budget so a cold start cannot spend a whole minute at once.
+        self.requests = TokenBucket(rpm, capacity=max(1.0, rpm * burst_s / 60.0) if rpm else None)
+        self.tokens = TokenBucket(tpm, capacity=tpm * burst_s / 60.0 if tpm else None)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._queue: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._waits: deque[float] = deque(maxlen=1000)
+        self.admitted = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+
+    # ---- admission ----
+    def _enqueue(self, priority: int) -> tuple[int, int]:
+        ticket = (priority, next(self._seq))
+        heapq.heappush(self._queue, ticket)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        return ticket
+
+    def _try_admit(self, ticket: tuple[int, int], tokens: float) -> float | None:
+        # Called with the lock held. None means admitted, else seconds to wait.
+        if self._queue[0] != ticket:
+            return 0.05
+        now = time.monotonic()
+        wait = max(self.requests.wait_for(1, now), self.tokens.wait_for(tokens, now))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        heapq.heappop(self._queue)
+        self.admitted += 1
+        self._cond.notify_all()
+        return None
+
+    def _abandon(self, ticket: tuple[int, int]) -> None:
+        # A cancelled waiter must not block the queue behind it.
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+    def admit(self, tokens: float = 0, priority: int | None = None) -> float:
+        """
+        Blocks until this request may be sent. Returns the time spent waiting.
+        """
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(_PRIORITY.get() if priority is None else priority)
+            try:
+                while True:
+                    wait = self._try_admit(ticket, tokens)
+                    if wait is None:
+                        break
+                    self._cond.wait(wait)
+            except BaseException:
+                self._abandon(ticket)
+                raise
+        waited = time.monotonic() - start
+        self._waits.append(waited)
+        current_span().add(queue_wait_ms=round(waited * 1000, 3))
+        return waited
+
+    async def aadmit(self, tokens: float = 0, priority: int | None = None) -> float:
+        start = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(_PRIORITY.get() if priority is None else priority)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_admit(ticket, tokens)
+                if wait is None:
+                    break
+                # Async waiters poll; notify_all only wakes threads.
+                await asyncio.sleep(min(wait, 0.05))
+        except BaseException:
+            with self._cond:
+                self._abandon(ticket)
+            raise
+        waited = time.monotonic() - start
+        self._waits.append(waited)
+        current_span().add(queue_wait_ms=round(waited * 1000, 3))
+        return waited
+
+    # ---- retry ----
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        self.retries += 1
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(exc)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _should_retry(self, exc: BaseException, attempt: int) -> bool:
+        if not is_rate_limit_error(exc):
+            return False
+        self.rate_limited += 1
+        if attempt >= self.max_retries:
+            self.failed += 1
+            return False
+        return True
+
+    def call(self, fn: Callable[[], T], tokens: float = 0, priority: int | None = None) -> T:
+        """
+        Runs fn() once admitted, retrying 429s. Other errors propagate.
+        """
+        for attempt in itertools.count():
+            self.admit(tokens, priority)
+            try:
+                return fn()
+            except Exception as exc:
+                if not self._should_retry(exc, attempt):
+                    raise
+                time.sleep(self._backoff(attempt, exc))
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], tokens: float = 0, priority: int | None = None) -> T:
+        for attempt in itertools.count():
+            await self.aadmit(tokens, priority)
+            try:
+                return await fn()
+            except Exception as exc:
+                if not self._should_retry(exc, attempt):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, exc))
+
+    def stream(self, open_stream: Callable[[], Iterator[T]], tokens: float = 0, priority: int | None = None) -> Iterator[T]:
+        """
+        Streams chunks from open_stream(); a 429 is retried only if it comes
+        before the first chunk (later failures propagate so nothing is repeated).
+        """
+        for attempt in itertools.count():
+            self.admit(tokens, priority)
+            started = False
+            try:
+                for chunk in open_stream():
+                    started = True
+                    yield chunk
+                return
+            except Exception as exc:
+                if started or not self._should_retry(exc, attempt):
+                    raise
+                time.sleep(self._backoff(attempt, exc))
+
+    async def astream(
+        self, open_stream: Callable[[], AsyncIterator[T]], tokens: float = 0, priority: int | None = None
+    ) -> AsyncIterator[T]:
+        for attempt in itertools.count():
+            await self.aadmit(tokens, priority)
+            started = False
+            try:
+                async for chunk in open_stream():
+                    started = True
+                    yield chunk
+                return
+            except Exception as exc:
+                if started or not self._should_retry(exc, attempt):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, exc))
+
+    # ---- metrics ----
+    def metrics(self) -> dict:
+        waits = sorted(self._waits)
+
+        def pct(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+
+        with self._cond:
+            depth = len(self._queue)
+            by_priority: dict[int, int] = {}
+            for priority, _ in self._queue:
+                by_priority[priority] = by_priority.get(priority, 0) + 1
+        return {
+            "queue_depth": depth,
+            "queue_depth_by_priority": by_priority,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failed": self.failed,
+            "wait_s": {
+                "mean": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "max": round(waits[-1], 4) if waits else 0.0,
+            },
+        }
+
+
+_DISPATCHER: Dispatcher | None = None
+_DISPATCHER_LOCK = threading.Lock()
+
+
+def get_dispatcher() -> Dispatcher:
+    """
+    Process-wide dispatcher configured from the environment
+    (see config.get_llm_dispatch_settings).
+    """
+    global _DISPATCHER
+    with _DISPATCHER_LOCK:
+        if _DISPATCHER is None:
+            settings = get_llm_dispatch_settings()
+            _DISPATCHER = Dispatcher(
+                rpm=settings["rpm"],
+                tpm=settings["tpm"],
+                max_retries=settings["max_retries"],
+            )
+        return _DISPATCHER
+
+
+def set_dispatcher(dispatcher: Dispatcher | None) -> None:
+    # Lets callers (batch runs, tests, benchmarks) install their own limits; None resets to the env config.
+    global _DISPATCHER
+    with _DISPATCHER_LOCK:
+        _DISPATCHER = dispatcher
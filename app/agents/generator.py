@@ -1,11 +1,15 @@
 from __future__ import annotations
+import time
+from typing import AsyncIterator, Iterator
 
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
-
-from app.config import get_openai_key
-from app.schemas import QuestionBank, SubjectProfile, TopicPlan
+from app.schemas import QuestionBank, QuestionItem, SubjectProfile, TopicPlan
+from app.agents.streaming import QuestionStreamParser
+from app.agents.dispatch import get_dispatcher
+from app.agents.clients import get_chat_client
+from app.agents.llm import ainvoke_structured, invoke_structured, llm_span, request_tokens, response_key
+from app.rag.packing import count_tokens
+from app.tracing import suspended, traced
+from app.agents.llm_cache import get_response_cache
 from app.prompts import (
     PLANNER_SYSTEM,
     GENERATOR_SYSTEM,
@@ -18,15 +22,13 @@ DEFAULT_MODEL = "gpt-4o-mini"
 
 
 class GeneratorAgent:
-    def __init__(self, model: str = DEFAULT_MODEL):
-        api_key = get_openai_key()
-        if not api_key:
-            raise RuntimeError(
-                "OPENAI_API_KEY not found (set in .env, env vars, or .streamlit/secrets.toml)"
-            )
-        self.client = ChatOpenAI(model=model, temperature=0.2, openai_api_key=api_key)
+    def __init__(self, model: str = DEFAULT_MODEL, client=None):
+        # Shared client (agents.clients); tests and benchmarks can pass their own chat model.
+        self.client = client if client is not None else get_chat_client(model, temperature=0.2)
         self.model = model
+        self.cache = get_response_cache()
 
+    @traced("generator.plan")
     def plan(self, topic: str, syllabus_snippets: list[dict]) -> TopicPlan:
         """
         Returns a TopicPlan using STRICT structured parsing (no json.loads).
@@ -34,20 +36,25 @@ class GeneratorAgent:
         """
         prompt = build_planner_prompt(topic, syllabus_snippets)
 
+        from langchain_core.output_parsers import PydanticOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
+
         parser = PydanticOutputParser(pydantic_object=TopicPlan)
-        chain = (
-            ChatPromptTemplate.from_messages(
-                [
-                    ("system", PLANNER_SYSTEM),
-                    ("user", "{prompt}\n\n{format_instructions}"),
-                ]
-            )
-            | self.client
-            | parser
+        template = ChatPromptTemplate.from_messages(
+            [
+                ("system", PLANNER_SYSTEM),
+                ("user", "{prompt}\n\n{format_instructions}"),
+            ]
+        )
+        return invoke_structured(
+            self.client,
+            template,
+            parser,
+            {"prompt": prompt, "format_instructions": parser.get_format_instructions()},
+            cache=self.cache,
         )
-        return chain.invoke({"prompt": prompt, "format_instructions": parser.get_format_instructions()})
 
-    def generate(
+    def _generate_inputs(
         self,
         course_name: str,
         targets: dict,
@@ -55,10 +62,8 @@ class GeneratorAgent:
         subject_profile: dict | None = None,
         question_mix: dict | None = None,
         critique: str | None = None,
-    ) -> QuestionBank:
-        """
-        Returns a QuestionBank using STRICT structured parsing.
-        """
+        avoid_questions: list[str] | None = None,
+    ):
         prompt = build_generator_prompt(
             course_name,
             targets,
@@ -66,21 +71,164 @@ class GeneratorAgent:
             subject_profile=subject_profile,
             question_mix=question_mix,
             critique=critique,
+            avoid_questions=avoid_questions,
         )
 
+        from langchain_core.output_parsers import PydanticOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
+
         parser = PydanticOutputParser(pydantic_object=QuestionBank)
-        chain = (
-            ChatPromptTemplate.from_messages(
-                [
-                    ("system", GENERATOR_SYSTEM),
-                    ("user", "{prompt}\n\n{format_instructions}"),
-                ]
+        template = ChatPromptTemplate.from_messages(
+            [
+                ("system", GENERATOR_SYSTEM),
+                ("user", "{prompt}\n\n{format_instructions}"),
+            ]
+        )
+        return template, parser, {"prompt": prompt, "format_instructions": parser.get_format_instructions()}
+
+    @traced("generator.generate")
+    def generate(
+        self,
+        course_name: str,
+        targets: dict,
+        context_snippets: list[dict],
+        subject_profile: dict | None = None,
+        question_mix: dict | None = None,
+        critique: str | None = None,
+        avoid_questions: list[str] | None = None,
+    ) -> QuestionBank:
+        """
+        Returns a QuestionBank using STRICT structured parsing.
+        """
+        template, parser, inputs = self._generate_inputs(
+            course_name, targets, context_snippets, subject_profile, question_mix, critique, avoid_questions
+        )
+        return invoke_structured(self.client, template, parser, inputs, cache=self.cache)
+
+    @traced("generator.generate")
+    async def agenerate(
+        self,
+        course_name: str,
+        targets: dict,
+        context_snippets: list[dict],
+        subject_profile: dict | None = None,
+        question_mix: dict | None = None,
+        critique: str | None = None,
+        avoid_questions: list[str] | None = None,
+    ) -> QuestionBank:
+        """
+        Async variant of generate (ainvoke), used for concurrent shards.
+        """
+        template, parser, inputs = self._generate_inputs(
+            course_name, targets, context_snippets, subject_profile, question_mix, critique, avoid_questions
+        )
+        return await ainvoke_structured(self.client, template, parser, inputs, cache=self.cache)
+
+    def stream_generate(
+        self,
+        course_name: str,
+        targets: dict,
+        context_snippets: list[dict],
+        subject_profile: dict | None = None,
+        question_mix: dict | None = None,
+        critique: str | None = None,
+        avoid_questions: list[str] | None = None,
+        max_questions: int | None = None,
+    ) -> Iterator[QuestionItem]:
+        """
+        Streams tokens and yields each QuestionItem as soon as its JSON object
+        closes. Stops (closing the stream) once `max_questions` have arrived;
+        breaking out of the loop cancels the request the same way.
+        """
+        template, parser, inputs = self._generate_inputs(
+            course_name, targets, context_snippets, subject_profile, question_mix, critique, avoid_questions
+        )
+        messages = template.format_messages(**inputs)
+        key = response_key(self.client, messages) if self.cache is not None else None
+        cached = self.cache.get(key) if key is not None else None
+        stream_parser = QuestionStreamParser()
+        count = 0
+        if cached is not None:
+            for item in stream_parser.feed(cached)[:max_questions or None]:
+                yield item
+            return
+        with llm_span(self.client, messages, "llm.stream") as sp:
+            started = time.perf_counter()
+            stream = get_dispatcher().stream(
+                lambda: self.client.stream(messages), tokens=request_tokens(self.client, messages)
             )
-            | self.client
-            | parser
+            try:
+                for chunk in stream:
+                    for item in stream_parser.feed(chunk.content or ""):
+                        if not count:
+                            sp.set(first_item_ms=round((time.perf_counter() - started) * 1000, 1))
+                        with suspended():
+                            yield item
+                        count += 1
+                        if max_questions and count >= max_questions:
+                            return
+            finally:
+                stream.close()
+                sp.set(items=count, tokens_out=count_tokens(stream_parser.buffer))
+            self._cache_stream(key, parser, stream_parser.buffer)
+
+    async def astream_generate(
+        self,
+        course_name: str,
+        targets: dict,
+        context_snippets: list[dict],
+        subject_profile: dict | None = None,
+        question_mix: dict | None = None,
+        critique: str | None = None,
+        avoid_questions: list[str] | None = None,
+        max_questions: int | None = None,
+    ) -> AsyncIterator[QuestionItem]:
+        """
+        Async variant of stream_generate, used for concurrent shards.
+        """
+        template, parser, inputs = self._generate_inputs(
+            course_name, targets, context_snippets, subject_profile, question_mix, critique, avoid_questions
         )
-        return chain.invoke({"prompt": prompt, "format_instructions": parser.get_format_instructions()})
+        messages = template.format_messages(**inputs)
+        key = response_key(self.client, messages) if self.cache is not None else None
+        cached = self.cache.get(key) if key is not None else None
+        stream_parser = QuestionStreamParser()
+        count = 0
+        if cached is not None:
+            for item in stream_parser.feed(cached)[:max_questions or None]:
+                yield item
+            return
+        with llm_span(self.client, messages, "llm.stream") as sp:
+            started = time.perf_counter()
+            stream = get_dispatcher().astream(
+                lambda: self.client.astream(messages), tokens=request_tokens(self.client, messages)
+            )
+            try:
+                async for chunk in stream:
+                    for item in stream_parser.feed(chunk.content or ""):
+                        if not count:
+                            sp.set(first_item_ms=round((time.perf_counter() - started) * 1000, 1))
+                        with suspended():
+                            yield item
+                        count += 1
+                        if max_questions and count >= max_questions:
+                            return
+            finally:
+                await stream.aclose()
+                sp.set(items=count, tokens_out=count_tokens(stream_parser.buffer))
+            self._cache_stream(key, parser, stream_parser.buffer)
 
+    def _cache_stream(self, key: str | None, parser, text: str) -> None:
+        # Only a stream that ran to completion and parses as a whole is cached.
+        if key is None:
+            return
+        try:
+            parser.parse(text)
+        except Exception:
+            return
+        self.cache.put(key, text)
+
+    @traced("generator.classify_subject")
     def classify_subject(self, syllabus_snippets: list[dict]) -> SubjectProfile:
         """
         Returns a SubjectProfile inferred from syllabus/context snippets.
@@ -95,15 +243,20 @@ Syllabus/context snippets:
 Detect the subject and recommend a question mix.
 """
 
+        from langchain_core.output_parsers import PydanticOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
+
         parser = PydanticOutputParser(pydantic_object=SubjectProfile)
-        chain = (
-            ChatPromptTemplate.from_messages(
-                [
-                    ("system", SUBJECT_SYSTEM),
-                    ("user", "{prompt}\n\n{format_instructions}"),
-                ]
-            )
-            | self.client
-            | parser
+        template = ChatPromptTemplate.from_messages(
+            [
+                ("system", SUBJECT_SYSTEM),
+                ("user", "{prompt}\n\n{format_instructions}"),
+            ]
+        )
+        return invoke_structured(
+            self.client,
+            template,
+            parser,
+            {"prompt": prompt, "format_instructions": parser.get_format_instructions()},
+            cache=self.cache,
         )
-        return chain.invoke({"prompt": prompt, "format_instructions": parser.get_format_instructions()})
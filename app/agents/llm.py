@@ -0,0 +1,87 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+from app.agents.dispatch import get_dispatcher
+from app.agents.llm_cache import ResponseCache, cache_key
+from app.rag.packing import count_tokens
+from app.tracing import span
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from langchain_core.prompts import ChatPromptTemplate
+
+# Completion budget assumed for the tokens-per-minute bucket when the client sets no max_tokens.
+COMPLETION_TOKENS_ESTIMATE = 1024
+
+
+def _model_params(client) -> tuple[str, float | None]:
+    model = getattr(client, "model_name", None) or getattr(client, "model", None) or type(client).__name__
+    return str(model), getattr(client, "temperature", None)
+
+
+def response_key(client, messages: list[BaseMessage]) -> str:
+    system = "\n".join(str(m.content) for m in messages if m.type == "system")
+    user = "\n".join(str(m.content) for m in messages if m.type != "system")
+    model, temperature = _model_params(client)
+    return cache_key(system, user, model, temperature)
+
+
+def prompt_tokens(messages: list[BaseMessage]) -> int:
+    return sum(count_tokens(str(m.content)) for m in messages)
+
+
+def request_tokens(client, messages: list[BaseMessage]) -> int:
+    # Prompt tokens plus the completion budget, charged against the TPM limit up front.
+    return prompt_tokens(messages) + (getattr(client, "max_tokens", None) or COMPLETION_TOKENS_ESTIMATE)
+
+
+def llm_span(client, messages: list[BaseMessage], name: str = "llm.call"):
+    model, _ = _model_params(client)
+    return span(
+        name,
+        model=model,
+        tokens_in=prompt_tokens(messages),
+        bytes=sum(len(str(m.content).encode("utf-8")) for m in messages),
+    )
+
+
+def invoke_structured(client, template: ChatPromptTemplate, parser, inputs: dict, cache: ResponseCache | None = None):
+    """
+    template | client | parser, with the raw completion served from / stored
+    in `cache` keyed by the rendered prompt, model and temperature. Only
+    completions that parse are cached; misses go through the process-wide
+    dispatcher (agents.dispatch) for rate limits and 429 retries.
+    """
+    messages = template.format_messages(**inputs)
+    with llm_span(client, messages) as sp:
+        key = response_key(client, messages) if cache is not None else None
+        text = cache.get(key) if key is not None else None
+        sp.set(cached=text is not None)
+        if text is not None:
+            return parser.parse(text)
+        text = get_dispatcher().call(lambda: client.invoke(messages).content, tokens=request_tokens(client, messages))
+        sp.set(tokens_out=count_tokens(text))
+        result = parser.parse(text)
+        if key is not None:
+            cache.put(key, text)
+        return result
+
+
+async def ainvoke_structured(client, template: ChatPromptTemplate, parser, inputs: dict, cache: ResponseCache | None = None):
+    messages = template.format_messages(**inputs)
+    with llm_span(client, messages) as sp:
+        key = response_key(client, messages) if cache is not None else None
+        text = cache.get(key) if key is not None else None
+        sp.set(cached=text is not None)
+        if text is not None:
+            return parser.parse(text)
+
+        async def _send() -> str:
+            return (await client.ainvoke(messages)).content
+
+        text = await get_dispatcher().acall(_send, tokens=request_tokens(client, messages))
+        sp.set(tokens_out=count_tokens(text))
+        result = parser.parse(text)
+        if key is not None:
+            cache.put(key, text)
+        return result
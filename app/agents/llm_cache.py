@@ -0,0 +1,144 @@
+from __future__ import annotations
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from app.config import get_llm_cache_settings
+
+
+def cache_key(system: str, user: str, model: str, temperature: float | None) -> str:
+    payload = json.dumps([system, user, model, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of raw LLM completions: an in-memory LRU in front of an
+    SQLite table. Entries expire after `ttl_s`; each tier is size-bounded
+    (LRU order in memory, oldest-first on disk). Counters are exposed via
+    stats() so hit rates can be surfaced next to run logs.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        max_memory: int = 256,
+        max_disk: int = 5000,
+        ttl_s: float | None = 7 * 24 * 3600,
+    ):
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.ttl_s = ttl_s
+        self._mem: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL NOT NULL, text TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+            self._db.commit()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_s is not None and time.time() - created > self.ttl_s
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._mem.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self._mem[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT created, text FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[0]):
+                        self._remember(key, row[0], row[1])
+                        self.disk_hits += 1
+                        return row[1]
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+            self.misses += 1
+            return None
+
+    def put(self, key: str, text: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, text)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, created, text) VALUES (?, ?, ?)",
+                    (key, now, text),
+                )
+                over = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_disk
+                if over > 0:
+                    self._db.execute(
+                        "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY created LIMIT ?)",
+                        (over,),
+                    )
+                self._db.commit()
+
+    def _remember(self, key: str, created: float, text: str) -> None:
+        self._mem[key] = (created, text)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_memory:
+            self._mem.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._mem),
+        }
+
+
+_CACHE: ResponseCache | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache | None:
+    """
+    Process-wide cache configured from the environment (see config.get_llm_cache_settings).
+    Returns None when caching is disabled.
+    """
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            settings = get_llm_cache_settings()
+            if not settings["enabled"]:
+                return None
+            _CACHE = ResponseCache(
+                path=settings["path"],
+                max_memory=settings["max_memory"],
+                max_disk=settings["max_disk"],
+                ttl_s=settings["ttl_s"],
+            )
+        return _CACHE
+
+
+def set_response_cache(cache: ResponseCache | None) -> None:
+    # Lets callers (tests, benchmarks) install their own cache instance.
+    global _CACHE
+    with _CACHE_LOCK:
+        _CACHE = cache
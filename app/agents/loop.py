@@ -1,8 +1,123 @@
 from __future__ import annotations
+import logging
+import re
+from concurrent.futures import Future
+from typing import Callable
 
 from app.agents.generator import GeneratorAgent
 from app.agents.auditor import AuditorAgent
-from app.schemas import AuditIssue
+from app.agents.sharding import generate_sharded, merge_banks
+from app.agents.checks import check_distribution, check_quantity, find_near_duplicates
+from app.schemas import QuestionBank, QuestionItem
+from app.tracing import current_span, span
+
+logger = logging.getLogger(__name__)
+
+
+def _resolve_seed(seed: Future | None) -> QuestionBank | None:
+    if seed is None:
+        return None
+    try:
+        return seed.result()
+    except Exception as exc:
+        # The caller generates the seed's questions itself instead.
+        logger.warning("Seed bank failed; generating its questions with the remainder: %r", exc)
+        current_span().set(seed_error=type(exc).__name__)
+        return None
+
+
+def _join_seed(
+    gen: GeneratorAgent,
+    course_name: str,
+    targets: dict,
+    qb: QuestionBank,
+    seed_bank: QuestionBank | None,
+    seed_count: int,
+    on_question: Callable[[QuestionItem], None] | None = None,
+    embedder=None,
+    **generate_kwargs,
+) -> QuestionBank:
+    """
+    Puts the seed's questions first. Remainder questions that repeat a seed
+    question are dropped (both were generated at once from the same
+    context), and the shortfall - those drops plus any seed questions that
+    never arrived - is generated with every kept stem as an exclusion.
+    """
+    seed_items = list(seed_bank.questions) if seed_bank is not None else []
+    rest = list(qb.questions)
+    dupes = set(
+        find_near_duplicates(
+            [q.question_text for q in rest], [q.question_text for q in seed_items], embedder=embedder
+        )
+    )
+    rest = [q for k, q in enumerate(rest) if k not in dupes]
+    shortfall = max(0, seed_count - len(seed_items)) + len(dupes)
+    banks = [QuestionBank(course=course_name, questions=seed_items), QuestionBank(course=course_name, questions=rest)]
+    if shortfall:
+        top_up_targets = dict(targets)
+        top_up_targets["num_questions"] = shortfall
+        extra = gen.generate(
+            course_name=course_name,
+            targets=top_up_targets,
+            avoid_questions=[q.question_text for q in seed_items + rest],
+            **generate_kwargs,
+        )
+        for item in extra.questions:
+            if on_question is not None:
+                on_question(item)
+        banks.append(extra)
+    current_span().set(seed_questions=len(seed_items), seam_duplicates=len(dupes), top_up=shortfall)
+    return merge_banks(course_name, banks)
+
+
+def _distinct(items: list[QuestionItem], against: list[str], embedder=None) -> list[QuestionItem]:
+    # Drops items near-identical to `against` or to an earlier item of the same batch.
+    texts = [q.question_text for q in items]
+    repeats = set(find_near_duplicates(texts, against, embedder=embedder))
+    kept: list[QuestionItem] = []
+    for k, q in enumerate(items):
+        if k in repeats:
+            continue
+        if kept and find_near_duplicates([q.question_text], [p.question_text for p in kept], embedder=embedder):
+            continue
+        kept.append(q)
+    return kept
+
+
+def _flagged_ids(qb: QuestionBank, audit) -> list[str]:
+    present = {q.id for q in qb.questions}
+    flagged: list[str] = []
+    for iss in audit.issues:
+        for qid in re.findall(r"Q\d+", iss.id or ""):
+            if qid in present and qid not in flagged:
+                flagged.append(qid)
+    return flagged
+
+
+def _splice(qb: QuestionBank, flagged: list[str], fresh: list[QuestionItem]) -> tuple[QuestionBank, list[QuestionItem]]:
+    """
+    Puts replacements into the flagged slots (keeping their ids) and appends
+    any extra questions with new ids. Returns the bank and the changed items.
+    """
+    fresh = list(fresh)
+    changed: list[QuestionItem] = []
+    questions: list[QuestionItem] = []
+    for q in qb.questions:
+        if q.id in flagged:
+            if not fresh:
+                continue
+            item = fresh.pop(0).model_copy(update={"id": q.id})
+            changed.append(item)
+            questions.append(item)
+        else:
+            questions.append(q)
+    next_no = 1 + max([int(m) for q in questions for m in re.findall(r"\d+", q.id)[:1]] or [0])
+    for item in fresh:
+        item = item.model_copy(update={"id": f"Q{next_no}"})
+        next_no += 1
+        changed.append(item)
+        questions.append(item)
+    return QuestionBank(course=qb.course, questions=questions), changed
 
 
 def run_generation_loop(
@@ -13,56 +128,226 @@ def run_generation_loop(
     question_mix: dict | None,
     max_iters: int = 4,
     model: str = "gpt-4o-mini",
+    shard_size: int | None = None,
+    concurrency: int = 4,
+    seed: Future | None = None,
+    seed_count: int = 0,
+    repair: bool = False,
+    on_question: Callable[[QuestionItem], None] | None = None,
+    embedder=None,
+    generator: GeneratorAgent | None = None,
+    auditor: AuditorAgent | None = None,
+    context_count: int | None = None,
 ):
-    gen = GeneratorAgent(model=model)
-    aud = AuditorAgent(model=model)
+    """
+    Generate -> audit -> critique loop. With `shard_size`, banks larger than one
+    shard are generated as concurrent shards and merged (see agents.sharding).
+
+    `seed` is a Future for a bank of `seed_count` questions generated in
+    parallel (the UI preview). The first iteration only generates the
+    remainder, then waits for the seed and puts its questions first; seam
+    duplicates and a failed seed are made up by a top-up call (_join_seed).
+
+    With `repair`, later iterations keep the questions that passed, regenerate
+    only the ids the auditor flagged (plus any shortfall for Quantity), and
+    re-audit just those against the retained set. Replacements that repeat a
+    kept question are dropped and asked for again before they are spliced in.
+    Issues without a question id fall back to regenerating the whole bank.
+
+    `on_question` is called with each QuestionItem of a full generation as
+    soon as it has streamed in, so callers can render before the bank is done.
+
+    Each audit runs the local checks first (agents.checks) and only calls
+    the LLM auditor once they pass; `embedder` backs the Redundancy check.
+    `generator` / `auditor` replace the default agents (e.g. ones built on
+    a fake chat model for benchmarks). `context_count` is how many snippets
+    retrieval returned before packing (default: len(context_snippets)). The
+    Quantity check is sized on it, because packing to a token budget merges
+    and drops snippets and would otherwise switch the check off.
+    """
+    gen = generator or GeneratorAgent(model=model)
+    aud = auditor or AuditorAgent(model=model)
 
     logs: list[dict] = []
     critique: str | None = None
     qb = None
     audit = None
 
+    target_count = int(targets.get("num_questions", 0) or 0)
+    if context_count is None:
+        context_count = len(context_snippets)
+
     for i in range(max_iters):
-        qb = gen.generate(
-            course_name=course_name,
-            targets=targets,
-            context_snippets=context_snippets,
-            subject_profile=subject_profile,
-            question_mix=question_mix,
-            critique=critique,
-        )
-        audit = aud.audit(qb.model_dump(), context_snippets, targets)
-
-        # Enforce quantity if context is reasonably sized
-        target_count = int(targets.get("num_questions", 0) or 0)
-        if target_count and len(context_snippets) >= max(10, target_count):
-            if len(qb.questions) < target_count:
-                audit.passed = False
-                audit.issues.append(
-                    AuditIssue(
-                        id=None,
-                        category="Quantity",
-                        detail=f"Requested {target_count} questions, generated {len(qb.questions)}.",
+        with span("loop.iteration", iteration=i + 1) as iteration_span:
+            flagged: list[str] = []
+            missing = 0
+            keep: list[QuestionItem] = []
+            repairable = False
+            if repair and qb is not None and audit is not None:
+                flagged = _flagged_ids(qb, audit)
+                missing = max(0, target_count - len(qb.questions))
+                keep = [q for q in qb.questions if q.id not in flagged]
+                repairable = not any(not iss.id and iss.category != "Quantity" for iss in audit.issues)
+
+            if repairable and (flagged or missing) and keep:
+                repair_targets = dict(targets)
+                repair_targets["num_questions"] = len(flagged) + missing
+                avoid = [q.question_text for q in keep]
+                if shard_size and repair_targets["num_questions"] > shard_size:
+                    fresh = generate_sharded(
+                        gen,
+                        course_name,
+                        repair_targets,
+                        context_snippets,
+                        subject_profile=subject_profile,
+                        question_mix=question_mix,
+                        critique=critique,
+                        avoid_questions=avoid,
+                        shard_size=shard_size,
+                        concurrency=concurrency,
+                    )
+                else:
+                    fresh = gen.generate(
+                        course_name=course_name,
+                        targets=repair_targets,
+                        context_snippets=context_snippets,
+                        subject_profile=subject_profile,
+                        question_mix=question_mix,
+                        critique=critique,
+                        avoid_questions=avoid,
+                    )
+                # A repair prompt can come back with a kept question's wording (and a cached one will,
+                # every time); drop those before they take a slot, and ask once more for the difference.
+                fresh_items = _distinct(fresh.questions, avoid, embedder=embedder)
+                repeats = len(fresh.questions) - len(fresh_items)
+                if repeats:
+                    top_up_targets = dict(repair_targets)
+                    top_up_targets["num_questions"] = repeats
+                    extra = gen.generate(
+                        course_name=course_name,
+                        targets=top_up_targets,
+                        context_snippets=context_snippets,
+                        subject_profile=subject_profile,
+                        question_mix=question_mix,
+                        critique=critique,
+                        avoid_questions=avoid + [q.question_text for q in fresh_items],
+                    )
+                    fresh_items += _distinct(
+                        extra.questions, avoid + [q.question_text for q in fresh_items], embedder=embedder
+                    )
+                iteration_span.set(repair_repeats=repeats)
+                qb, changed = _splice(qb, flagged, fresh_items)
+                audit_targets = dict(targets)
+                audit_targets["audit_scope"] = (
+                    f"Partial re-audit of {len(changed)} regenerated question(s); "
+                    "bank-wide Distribution and Quantity are checked by the caller."
+                )
+                audit = aud.audit(
+                    QuestionBank(course=qb.course, questions=changed).model_dump(),
+                    context_snippets,
+                    audit_targets,
+                    retained_questions=avoid,
+                    embedder=embedder,
+                )
+                full = qb.model_dump()
+                bank_issues = check_distribution(full, targets) + check_quantity(full, targets, context_count)
+                if bank_issues:
+                    audit.issues.extend(bank_issues)
+                    audit.passed = False
+                generator_response = (
+                    f"Regenerated {len(flagged)} flagged question(s) and {missing} missing; kept {len(keep)}."
+                )
+            else:
+                gen_targets = targets
+                if seed is not None and i == 0 and seed_count:
+                    gen_targets = dict(targets)
+                    gen_targets["num_questions"] = max(1, target_count - seed_count)
+                gen_count = int(gen_targets.get("num_questions", 0) or 0)
+
+                if shard_size and gen_count > shard_size:
+                    qb = generate_sharded(
+                        gen,
+                        course_name,
+                        gen_targets,
+                        context_snippets,
+                        subject_profile=subject_profile,
+                        question_mix=question_mix,
+                        critique=critique,
+                        shard_size=shard_size,
+                        concurrency=concurrency,
+                        on_question=on_question,
+                    )
+                elif on_question is not None:
+                    items: list[QuestionItem] = []
+                    for item in gen.stream_generate(
+                        course_name=course_name,
+                        targets=gen_targets,
+                        context_snippets=context_snippets,
+                        subject_profile=subject_profile,
+                        question_mix=question_mix,
+                        critique=critique,
+                        max_questions=gen_count,
+                    ):
+                        items.append(item)
+                        on_question(item)
+                    qb = QuestionBank(course=course_name, questions=items)
+                else:
+                    qb = gen.generate(
+                        course_name=course_name,
+                        targets=gen_targets,
+                        context_snippets=context_snippets,
+                        subject_profile=subject_profile,
+                        question_mix=question_mix,
+                        critique=critique,
                     )
+                    # The model echoes the course back in its own words; history and exports key on the requested one.
+                    qb = QuestionBank(course=course_name, questions=qb.questions)
+                if i == 0 and seed is not None and seed_count:
+                    qb = _join_seed(
+                        gen,
+                        course_name,
+                        targets,
+                        qb,
+                        _resolve_seed(seed),
+                        seed_count,
+                        on_question=on_question,
+                        embedder=embedder,
+                        context_snippets=context_snippets,
+                        subject_profile=subject_profile,
+                        question_mix=question_mix,
+                        critique=critique,
+                    )
+                audit = aud.audit(
+                    qb.model_dump(),
+                    context_snippets,
+                    targets,
+                    embedder=embedder,
+                    # Nothing is regenerated after the last iteration, so its bank always gets the LLM audit.
+                    short_circuit=i < max_iters - 1,
+                    context_count=context_count,
+                )
+                generator_response = (
+                    "Regenerated question bank with the latest critique applied."
+                    if critique
+                    else "Generated initial question bank."
                 )
 
-        logs.append(
-            {
-                "iteration": i + 1,
-                "generator_response": "Regenerated question bank with the latest critique applied."
-                if critique
-                else "Generated initial question bank.",
-                "auditor_summary": audit.summary,
-                "auditor_issues": [issue.model_dump() for issue in audit.issues],
-                "passed": audit.passed,
-            }
-        )
+            iteration_span.set(questions=len(qb.questions), issues=len(audit.issues), passed=audit.passed)
+            logs.append(
+                {
+                    "iteration": i + 1,
+                    "generator_response": generator_response,
+                    "auditor_summary": audit.summary,
+                    "auditor_issues": [issue.model_dump() for issue in audit.issues],
+                    "passed": audit.passed,
+                }
+            )
 
-        if audit.passed:
-            break
+            if audit.passed:
+                break
 
-        critique = audit.summary + "\n" + "\n".join(
-            [f"{iss.category}: {iss.detail}" for iss in audit.issues]
-        )
+            critique = audit.summary + "\n" + "\n".join(
+                [f"{iss.category}: {iss.detail}" for iss in audit.issues]
+            )
 
     return qb, audit, logs
@@ -0,0 +1,86 @@
+from __future__ import annotations
+import asyncio
+from typing import Callable
+
+from app.agents.generator import GeneratorAgent
+from app.schemas import QuestionBank, QuestionItem
+from app.tracing import span
+
+
+def plan_shards(num_questions: int, context_snippets: list[dict], shard_size: int = 10) -> list[tuple[int, list[dict]]]:
+    """
+    Splits the target into shards of at most `shard_size` questions. Snippets
+    are dealt round-robin so every shard gets a similar relevance mix and the
+    shards draw on different material.
+    """
+    n_shards = max(1, -(-num_questions // shard_size))
+    n_shards = min(n_shards, max(1, len(context_snippets)))
+    base, extra = divmod(num_questions, n_shards)
+    shards = []
+    for i in range(n_shards):
+        count = base + (1 if i < extra else 0)
+        snippets = context_snippets[i::n_shards]
+        if count:
+            shards.append((count, snippets))
+    return shards
+
+
+def merge_banks(course_name: str, banks: list[QuestionBank]) -> QuestionBank:
+    # Shard order is preserved; ids are renumbered Q1..QN across the merged bank.
+    questions = []
+    for bank in banks:
+        for q in bank.questions:
+            questions.append(q.model_copy(update={"id": f"Q{len(questions) + 1}"}))
+    return QuestionBank(course=course_name, questions=questions)
+
+
+async def agenerate_sharded(
+    gen: GeneratorAgent,
+    course_name: str,
+    targets: dict,
+    context_snippets: list[dict],
+    subject_profile: dict | None = None,
+    question_mix: dict | None = None,
+    critique: str | None = None,
+    avoid_questions: list[str] | None = None,
+    shard_size: int = 10,
+    concurrency: int = 4,
+    on_question: Callable[[QuestionItem], None] | None = None,
+) -> QuestionBank:
+    shards = plan_shards(int(targets.get("num_questions", 0) or 0), context_snippets, shard_size)
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _run(count: int, snippets: list[dict]) -> QuestionBank:
+        shard_targets = dict(targets)
+        shard_targets["num_questions"] = count
+        kwargs = dict(
+            course_name=course_name,
+            targets=shard_targets,
+            context_snippets=snippets,
+            subject_profile=subject_profile,
+            question_mix=question_mix,
+            critique=critique,
+            avoid_questions=avoid_questions,
+        )
+        async with sem:
+            with span("generate.shard", questions=count, snippets=len(snippets)):
+                if on_question is None:
+                    return await gen.agenerate(**kwargs)
+                items: list[QuestionItem] = []
+                async for item in gen.astream_generate(max_questions=count, **kwargs):
+                    items.append(item)
+                    on_question(item)
+                return QuestionBank(course=course_name, questions=items)
+
+    results = await asyncio.gather(*[_run(c, s) for c, s in shards], return_exceptions=True)
+    banks = [r for r in results if isinstance(r, QuestionBank)]
+    if not banks:
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise errors[0]
+    # A failed shard only shortens the bank; the Quantity check reports it.
+    return merge_banks(course_name, banks)
+
+
+def generate_sharded(gen: GeneratorAgent, course_name: str, targets: dict, context_snippets: list[dict], **kwargs) -> QuestionBank:
+    return asyncio.run(agenerate_sharded(gen, course_name, targets, context_snippets, **kwargs))
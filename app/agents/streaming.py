@@ -0,0 +1,93 @@
+from __future__ import annotations
+import json
+
+from pydantic import ValidationError
+
+from app.schemas import QuestionItem
+
+
+class QuestionStreamParser:
+    """
+    Incremental parser for a streamed QuestionBank JSON document.
+
+    Text is fed as it arrives; every object that is a direct element of the
+    top-level "questions" array is validated as a QuestionItem the moment its
+    closing brace is seen. Anything before the first "{" (e.g. a ```json
+    fence) is ignored, and items that fail validation are counted in
+    `invalid` rather than raised.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.invalid = 0
+        self._pos = 0
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: str | None = None
+        # One frame per open container: [kind, key_of_pending_value, is_questions_array]
+        self._stack: list[list] = []
+        self._item_start: int | None = None
+
+    def feed(self, text: str) -> list[QuestionItem]:
+        self.buffer += text
+        items: list[QuestionItem] = []
+        buf = self.buffer
+        for i in range(self._pos, len(buf)):
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    try:
+                        self._last_string = json.loads(buf[self._string_start:i + 1])
+                    except ValueError:
+                        self._last_string = None
+                continue
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                else:
+                    continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                if self._stack and self._stack[-1][0] == "obj":
+                    self._stack[-1][1] = self._last_string
+            elif ch in "{[":
+                parent = self._stack[-1] if self._stack else None
+                if ch == "{" and parent is not None and parent[2]:
+                    self._item_start = i
+                is_questions = (
+                    ch == "["
+                    and len(self._stack) == 1
+                    and parent is not None
+                    and parent[1] == "questions"
+                )
+                self._stack.append(["obj" if ch == "{" else "arr", None, is_questions])
+            elif ch in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                parent = self._stack[-1] if self._stack else None
+                if ch == "}" and parent is not None and parent[2] and self._item_start is not None:
+                    item = self._validate(buf[self._item_start:i + 1])
+                    self._item_start = None
+                    if item is not None:
+                        items.append(item)
+            elif ch == "," and self._stack and self._stack[-1][0] == "obj":
+                self._stack[-1][1] = None
+        self._pos = len(buf)
+        return items
+
+    def _validate(self, raw: str) -> QuestionItem | None:
+        try:
+            return QuestionItem.model_validate(json.loads(raw))
+        except (ValueError, ValidationError):
+            self.invalid += 1
+            return None
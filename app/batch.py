@@ -0,0 +1,355 @@
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.agents.dispatch import PRIORITY_BATCH, Dispatcher, get_dispatcher, llm_priority, set_dispatcher
+from app.agents.loop import run_generation_loop
+from app.config import get_llm_dispatch_settings
+from app.export import questions_to_csv_bytes, questions_to_pdf_bytes
+from app.rag.lexical import BM25Index, lexical_path
+from app.rag.manifest import IngestManifest, file_sha256, manifest_path
+from app.rag.packing import pack_context
+from app.rag.pipeline import ingest_pdfs
+from app.rag.question_index import get_question_index
+from app.rag.retrieve import retrieve_top_k_strict
+from app.rag.vectorstore import build_where, collection_name_for, get_client, get_collection, get_embedder, writer_lock
+from app.reporting import compute_coverage_report
+from app.resources import get_resources
+from app.tracing import trace
+
+# Same defaults as the Streamlit app.
+COLLECTION_NAME = "course_material"
+CHUNK_SIZE = 1000
+OVERLAP = 200
+MAX_TOTAL_CTX = 40
+CTX_TOKEN_BUDGET = 6000
+SHARD_SIZE = 10
+GEN_CONCURRENCY = 4
+
+DIFFICULTY_DISTRIBUTIONS = {
+    "Easy": {"Easy": 100, "Medium": 0, "Hard": 0},
+    "Medium": {"Easy": 0, "Medium": 100, "Hard": 0},
+    "Hard": {"Easy": 0, "Medium": 0, "Hard": 100},
+}
+
+
+@dataclass
+class BatchJob:
+    """
+    One bank to produce. `pdfs` entries are paths (treated as course
+    material) or {"path": ..., "source_type": "material|outcomes|sample_paper"}.
+    """
+
+    course: str
+    pdfs: list
+    topics: list[str] = field(default_factory=list)
+    num_questions: int = 20
+    marks: int = 2
+    difficulty: str = "Medium"
+    bloom_focus: str = "Mixed"
+    include_sample_papers: bool = True
+    job_id: str = ""
+
+    def __post_init__(self):
+        if not self.job_id:
+            slug = re.sub(r"[^a-z0-9]+", "-", self.course.lower()).strip("-") or "course"
+            self.job_id = f"{slug}-{self.signature()[:8]}"
+
+    def signature(self) -> str:
+        # Identifies the job's inputs, PDF contents included, so a checkpoint is only reused for an unchanged job.
+        payload = {k: v for k, v in asdict(self).items() if k != "job_id"}
+        payload["contents"] = [file_sha256(path) if Path(path).exists() else None for path, _, _ in self.files()]
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def files(self) -> list[tuple[str, str, str]]:
+        out = []
+        for entry in self.pdfs:
+            if isinstance(entry, str):
+                entry = {"path": entry}
+            path = str(entry["path"])
+            out.append((path, Path(path).name, entry.get("source_type", "material")))
+        return out
+
+
+def load_manifest(path: str) -> list[BatchJob]:
+    """
+    Reads a JSON list of jobs (or {"jobs": [...]}); keys match BatchJob fields.
+    """
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if isinstance(data, dict):
+        data = data.get("jobs", [])
+    return [BatchJob(**job) for job in data]
+
+
+class Checkpoint:
+    """
+    JSON file of finished jobs ({job_id: result}), rewritten atomically after
+    each job so an interrupted batch resumes where it stopped.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done: dict[str, dict] = {}
+        if path.exists():
+            try:
+                self.done = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.done = {}
+
+    def completed(self, job: BatchJob) -> dict | None:
+        result = self.done.get(job.job_id)
+        if result and result.get("status") == "done" and result.get("signature") == job.signature():
+            return result
+        return None
+
+    def record(self, result: dict) -> None:
+        with self._lock:
+            self.done[result["job_id"]] = result
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(self.done, indent=2), encoding="utf-8")
+            tmp.replace(self.path)
+
+
+def run_job(
+    job: BatchJob,
+    out_dir: str,
+    persist_dir: str = "data/vector_db",
+    model: str = "gpt-4o-mini",
+    max_iters: int = 4,
+    pii_consent: bool = False,
+) -> dict:
+    """
+    ingest -> retrieve -> run_generation_loop -> CSV/PDF export for one job.
+    Returns a result dict with output paths and per-stage timings (seconds);
+    the job's spans are written to `<job_dir>/trace.jsonl`.
+    """
+    timings: dict[str, float] = {}
+    start = time.perf_counter()
+    job_dir = Path(out_dir) / job.job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+
+    with trace(f"batch:{job.job_id}") as run_trace:
+        course_collection = collection_name_for(COLLECTION_NAME, course=job.course)
+        client = get_client(persist_dir)
+        files = job.files()
+
+        t = time.perf_counter()
+        # Jobs for the same course share a collection (and so may the ingest queue):
+        # open it under the writer lock so this ingest starts from the last one's postings.
+        with writer_lock(client, course_collection):
+            collection = get_collection(client, course_collection, get_embedder())
+            lexical = BM25Index(lexical_path(client, course_collection))
+            manifest = IngestManifest(manifest_path(client, course_collection))
+            ingested = ingest_pdfs(
+                collection,
+                manifest,
+                files,
+                chunk_size=CHUNK_SIZE,
+                overlap=OVERLAP,
+                course=job.course,
+                lexical=lexical,
+            )
+            get_resources().invalidate(client, course_collection)
+        timings["ingest"] = time.perf_counter() - t
+        pii = [{"file": r["source"], "findings": r["pii"]} for r in ingested if r["pii"]]
+        if pii and not pii_consent:
+            raise RuntimeError(f"PII detected in {', '.join(p['file'] for p in pii)}; rerun with consent.")
+
+        t = time.perf_counter()
+        allowed_types = ["material", "outcomes"] + (["sample_paper"] if job.include_sample_papers else [])
+        query = " ".join(job.topics) or job.course
+        ctx = retrieve_top_k_strict(
+            collection,
+            query,
+            k=MAX_TOTAL_CTX,
+            allowed_source_types=allowed_types,
+            where=build_where(sources=[source for _, source, _ in files]),
+            lexical_index=lexical if len(lexical) else None,
+        )
+        # The Quantity check is sized on what retrieval found, not on what fit the budget.
+        retrieved = len(ctx[:MAX_TOTAL_CTX])
+        ctx = pack_context(ctx[:MAX_TOTAL_CTX], token_budget=CTX_TOKEN_BUDGET)
+        timings["retrieve"] = time.perf_counter() - t
+        if not ctx:
+            raise RuntimeError("No usable context found in the job's PDFs.")
+
+        targets = {
+            "topic": ", ".join(job.topics) or job.course,
+            "num_questions": job.num_questions,
+            "marks_each": job.marks,
+            "bloom_focus": job.bloom_focus,
+            "difficulty_mix": job.difficulty,
+            "difficulty_distribution": DIFFICULTY_DISTRIBUTIONS.get(job.difficulty),
+            "mark_distribution": None,
+            "question_type_preferences": {"include_numerical": True, "include_diagram": False},
+            "instruction": (
+                "Generate exam-relevant questions strictly from context. "
+                "Try to reach the requested count if context supports it. "
+                "If context is shallow, output fewer questions instead of inventing."
+            ),
+        }
+
+        t = time.perf_counter()
+        with llm_priority(PRIORITY_BATCH):
+            qb, audit, logs = run_generation_loop(
+                course_name=job.course,
+                targets=targets,
+                context_snippets=ctx,
+                subject_profile=None,
+                question_mix=None,
+                max_iters=max_iters,
+                model=model,
+                shard_size=SHARD_SIZE,
+                concurrency=GEN_CONCURRENCY,
+                repair=True,
+                embedder=get_embedder(),
+                context_count=retrieved,
+            )
+        timings["generate"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        questions = qb.model_dump().get("questions", [])
+        # Near-duplicates within the bank and against earlier banks of the course; a rerun of this job is not history.
+        question_index = get_question_index(get_embedder())
+        duplicates = question_index.find_duplicates(questions, course=job.course, exclude_bank=job.job_id)
+        coverage = compute_coverage_report(questions, duplicates)
+        csv_path = job_dir / "question_bank.csv"
+        pdf_path = job_dir / "question_bank.pdf"
+        csv_path.write_bytes(questions_to_csv_bytes(questions))
+        pdf_path.write_bytes(questions_to_pdf_bytes(questions, coverage))
+        # Exported banks are issued, like downloaded ones in the UI: later banks are checked against them.
+        question_index.add_bank(job.job_id, job.course, questions)
+        timings["export"] = time.perf_counter() - t
+    timings["total"] = time.perf_counter() - start
+
+    report = {
+        "coverage": coverage,
+        "audit": audit.model_dump() if audit else None,
+        "logs": logs,
+        "timings": timings,
+        "dispatch": get_dispatcher().metrics(),
+        "stages": run_trace.totals(),
+    }
+    (job_dir / "report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    run_trace.write_jsonl(str(job_dir / "trace.jsonl"))
+    return {
+        "job_id": job.job_id,
+        "course": job.course,
+        "status": "done",
+        "signature": job.signature(),
+        "questions": len(questions),
+        "near_duplicates": len(duplicates),
+        "passed": bool(audit and audit.passed),
+        "outputs": {
+            "csv": str(csv_path),
+            "pdf": str(pdf_path),
+            "report": str(job_dir / "report.json"),
+            "trace": str(job_dir / "trace.jsonl"),
+        },
+        "timings": {k: round(v, 3) for k, v in timings.items()},
+    }
+
+
+def run_batch(
+    jobs: list[BatchJob],
+    out_dir: str = "data/batch",
+    workers: int = 4,
+    rpm: float | None = None,
+    resume: bool = True,
+    **job_kwargs,
+) -> list[dict]:
+    """
+    Runs jobs on a pool of `workers` threads. `rpm` installs a process-wide
+    LLM dispatcher with that request limit, shared by all jobs; batch calls
+    queue behind interactive ones. Finished jobs are checkpointed in
+    `<out_dir>/checkpoint.json`; with `resume`, jobs whose inputs are
+    unchanged are not run again. Failures are recorded, not raised.
+    """
+    if rpm:
+        settings = get_llm_dispatch_settings()
+        set_dispatcher(Dispatcher(rpm=rpm, tpm=settings["tpm"], max_retries=settings["max_retries"]))
+    checkpoint = Checkpoint(Path(out_dir) / "checkpoint.json")
+    results: dict[str, dict] = {}
+    pending = []
+    for job in jobs:
+        previous = checkpoint.completed(job) if resume else None
+        if previous is not None:
+            results[job.job_id] = {**previous, "resumed": True}
+        else:
+            pending.append(job)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(run_job, job, out_dir, **job_kwargs): job for job in pending}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:
+                result = {
+                    "job_id": job.job_id,
+                    "course": job.course,
+                    "status": "failed",
+                    "signature": job.signature(),
+                    "error": f"{type(exc).__name__}: {exc}",
+                }
+            checkpoint.record(result)
+            results[job.job_id] = result
+
+    return [results[job.job_id] for job in jobs]
+
+
+def format_summary(results: list[dict]) -> str:
+    stages = ["ingest", "retrieve", "generate", "export", "total"]
+    lines = [f"{'job':<32} {'status':<8} {'qs':>4} " + " ".join(f"{s:>9}" for s in stages)]
+    for r in results:
+        status = "resumed" if r.get("resumed") else r["status"]
+        timings = r.get("timings", {})
+        cells = " ".join(f"{timings[s]:>9.2f}" if s in timings else f"{'-':>9}" for s in stages)
+        lines.append(f"{r['job_id'][:32]:<32} {status:<8} {r.get('questions', 0):>4} {cells}")
+        if r.get("error"):
+            lines.append(f"  error: {r['error']}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate question banks for many courses without the UI.")
+    parser.add_argument("manifest", help="JSON list of jobs (course, pdfs, topics, num_questions, marks, difficulty)")
+    parser.add_argument("--out", default="data/batch", help="output directory (per-job folders + checkpoint.json)")
+    parser.add_argument("--workers", type=int, default=4, help="jobs run concurrently")
+    parser.add_argument("--rpm", type=float, default=None, help="global LLM requests per minute")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--max-iters", type=int, default=4)
+    parser.add_argument("--no-resume", action="store_true", help="rerun jobs already in the checkpoint")
+    parser.add_argument("--pii-consent", action="store_true", help="continue when PII is detected")
+    args = parser.parse_args(argv)
+
+    results = run_batch(
+        load_manifest(args.manifest),
+        out_dir=args.out,
+        workers=args.workers,
+        rpm=args.rpm,
+        resume=not args.no_resume,
+        model=args.model,
+        max_iters=args.max_iters,
+        pii_consent=args.pii_consent,
+    )
+    print(format_summary(results))
+    (Path(args.out) / "summary.json").write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0 if all(r["status"] == "done" for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,17 +1,143 @@
 from __future__ import annotations
 import os
-from dotenv import load_dotenv
+import sys
+import threading
+
+_ENV_LOADED = False
+_ENV_LOCK = threading.Lock()
+
+
+def _getenv(name: str, default: str | None = None) -> str | None:
+    # .env is read on the first lookup rather than at import, so importing app.* stays cheap.
+    global _ENV_LOADED
+    if not _ENV_LOADED:
+        with _ENV_LOCK:
+            if not _ENV_LOADED:
+                from dotenv import load_dotenv
+
+                load_dotenv()
+                _ENV_LOADED = True
+    return os.getenv(name, default)
 
-load_dotenv()
 
 def get_openai_key() -> str | None:
-    # 1) Streamlit secrets
-    try:
-        import streamlit as st
-        if "OPENAI_API_KEY" in st.secrets:
-            return st.secrets["OPENAI_API_KEY"]
-    except Exception:
-        pass
+    # 1) Streamlit secrets, only inside the app (headless runs never import streamlit)
+    if "streamlit" in sys.modules:
+        try:
+            import streamlit as st
+            if "OPENAI_API_KEY" in st.secrets:
+                return st.secrets["OPENAI_API_KEY"]
+        except Exception:
+            pass
 
     # 2) env var / .env
-    return os.getenv("OPENAI_API_KEY")
+    return _getenv("OPENAI_API_KEY")
+
+def get_openai_base_url() -> str | None:
+    # OPENAI_BASE_URL points the shared clients at a proxy or compatible server.
+    return _getenv("OPENAI_BASE_URL") or None
+
+def get_ingest_workers() -> int:
+    # QBANK_INGEST_WORKERS=1 disables the process pool.
+    value = _getenv("QBANK_INGEST_WORKERS")
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            pass
+    return max(1, min(8, os.cpu_count() or 1))
+
+def get_vector_backend() -> str:
+    # "chroma" (default), "numpy" (exact in-process) or "ivf" (approximate in-process).
+    return (_getenv("QBANK_VECTOR_BACKEND") or "chroma").strip().lower()
+
+def get_ann_params() -> dict:
+    # QBANK_IVF_NLIST (default: sqrt(n) at train time) and QBANK_IVF_NPROBE tune recall vs latency.
+    params: dict = {}
+    for env, key in (("QBANK_IVF_NLIST", "nlist"), ("QBANK_IVF_NPROBE", "nprobe")):
+        value = _getenv(env)
+        if value:
+            try:
+                params[key] = max(1, int(value))
+            except ValueError:
+                pass
+    return params
+
+def get_llm_cache_settings() -> dict:
+    # QBANK_LLM_CACHE=off disables response caching; QBANK_LLM_CACHE_PATH="" keeps it in memory only.
+    def _num(env: str, default: float) -> float:
+        try:
+            return float(_getenv(env, default))
+        except ValueError:
+            return default
+
+    ttl = _num("QBANK_LLM_CACHE_TTL", 7 * 24 * 3600)
+    return {
+        "enabled": (_getenv("QBANK_LLM_CACHE") or "on").strip().lower() not in ("0", "off", "false", "no"),
+        "path": _getenv("QBANK_LLM_CACHE_PATH", "data/llm_cache.sqlite") or None,
+        "max_memory": int(_num("QBANK_LLM_CACHE_MEMORY", 256)),
+        "max_disk": int(_num("QBANK_LLM_CACHE_ROWS", 5000)),
+        "ttl_s": ttl if ttl > 0 else None,
+    }
+
+
+def get_question_index_settings() -> dict:
+    # Cosine similarity at or above QBANK_DEDUP_THRESHOLD counts as a near-duplicate question.
+    try:
+        threshold = float(_getenv("QBANK_DEDUP_THRESHOLD", "0.9"))
+    except ValueError:
+        threshold = 0.9
+    return {
+        "path": _getenv("QBANK_QUESTION_INDEX", "data/question_index"),
+        "threshold": min(max(threshold, 0.0), 1.0),
+    }
+
+
+def get_llm_dispatch_settings() -> dict:
+    # QBANK_LLM_RPM / QBANK_LLM_TPM cap requests / tokens per minute across the process; 0 means unlimited.
+    def _num(env: str, default: float) -> float:
+        try:
+            return max(0.0, float(_getenv(env, default)))
+        except ValueError:
+            return default
+
+    return {
+        "rpm": _num("QBANK_LLM_RPM", 0),
+        "tpm": _num("QBANK_LLM_TPM", 0),
+        "max_retries": int(_num("QBANK_LLM_RETRIES", 5)),
+    }
+
+
+def get_trace_dir() -> str | None:
+    # Per-run span logs (JSONL) are written here; QBANK_TRACE_DIR="" disables writing them.
+    return _getenv("QBANK_TRACE_DIR", "data/traces") or None
+
+
+def get_ingest_job_settings() -> dict:
+    # Background ingest: job table location, concurrent jobs, and the indexed-chunk count that unlocks generation.
+    def _int(env: str, default: int) -> int:
+        try:
+            return max(1, int(_getenv(env, default)))
+        except ValueError:
+            return default
+
+    return {
+        "path": _getenv("QBANK_INGEST_JOBS_DB", "data/ingest_jobs.sqlite"),
+        "workers": _int("QBANK_INGEST_JOBS", 2),
+        "min_chunks": _int("QBANK_MIN_READY_CHUNKS", 40),
+    }
+
+
+def get_resource_settings() -> dict:
+    # Shared collections idle for QBANK_RESOURCE_IDLE_S are released; QBANK_RESOURCE_MEMORY_MB (0 = off) caps RSS.
+    def _num(env: str, default: float) -> float:
+        try:
+            return max(0.0, float(_getenv(env, default)))
+        except ValueError:
+            return default
+
+    return {
+        "idle_s": _num("QBANK_RESOURCE_IDLE_S", 900),
+        "max_collections": max(1, int(_num("QBANK_RESOURCE_MAX_COLLECTIONS", 16))),
+        "memory_mb": _num("QBANK_RESOURCE_MEMORY_MB", 0),
+    }
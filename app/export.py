@@ -1,12 +1,16 @@
 from __future__ import annotations
 import io
-import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
+from typing import TYPE_CHECKING
+
+from app.tracing import current_span, traced
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def questions_to_dataframe(questions: list[dict]) -> pd.DataFrame:
+    import pandas as pd
+
     rows = []
     for q in questions:
         citations = "; ".join(
@@ -28,12 +32,21 @@ def questions_to_dataframe(questions: list[dict]) -> pd.DataFrame:
     return pd.DataFrame(rows)
 
 
+@traced("export.csv")
 def questions_to_csv_bytes(questions: list[dict]) -> bytes:
     df = questions_to_dataframe(questions)
-    return df.to_csv(index=False).encode("utf-8")
+    data = df.to_csv(index=False).encode("utf-8")
+    current_span().set(questions=len(questions), bytes=len(data))
+    return data
 
 
+@traced("export.pdf")
 def questions_to_pdf_bytes(questions: list[dict], coverage_report: dict) -> bytes:
+    # reportlab is only needed here, so CSV export and the rest of the app never load it.
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.pdfgen import canvas
+
     buffer = io.BytesIO()
     c = canvas.Canvas(buffer, pagesize=letter)
     width, height = letter
@@ -84,7 +97,9 @@ def questions_to_pdf_bytes(questions: list[dict], coverage_report: dict) -> byte
             y = height - inch
 
     c.save()
-    return buffer.getvalue()
+    data = buffer.getvalue()
+    current_span().set(questions=len(questions), bytes=len(data))
+    return data
 
 
 def _wrap_text(text: str, max_width: float) -> list[str]:
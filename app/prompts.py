@@ -54,9 +54,10 @@ Return JSON only:
 
 AUDITOR_SYSTEM = """You are a strict educational auditor.
 You will be given:
-- context snippets (text + source + page + source_type)
-- generated question bank JSON
+- a compact digest of the generated questions (id, marks, difficulty, bloom, CO, question text, answer head) whose citations are [S#] references
+- the cited context snippets, each listed once (text + source + page + source_type); [C#] entries were cited but are NOT in the retrieved context
 - target settings (difficulty mix, bloom focus, mark distribution)
+- categories already checked locally, which you must not report
 
 Red-line checks (must report as issues if violated):
 1) Hallucination: The question cannot be answered using ONLY the cited snippets.
@@ -94,6 +95,7 @@ def build_generator_prompt(
     subject_profile: dict | None = None,
     question_mix: dict | None = None,
     critique: str | None = None,
+    avoid_questions: list[str] | None = None,
 ) -> str:
     target_text = "\n".join([f"- {k}: {v}" for k, v in targets.items()])
 
@@ -116,6 +118,14 @@ Question mix (percent):
         critique_text = f"""
 Auditor critique to fix:
 {critique}
+"""
+
+    avoid_text = ""
+    if avoid_questions:
+        avoid_lines = "\n".join([f"- {q}" for q in avoid_questions])
+        avoid_text = f"""
+Already approved questions (keep; do NOT repeat or paraphrase them):
+{avoid_lines}
 """
 
     ctx_lines = []
@@ -131,7 +141,7 @@ Course: {course_name}
 
 Generation Targets:
 {target_text}
-{subject_text}{mix_text}{critique_text}
+{subject_text}{mix_text}{critique_text}{avoid_text}
 
 Context snippets (ONLY source of truth):
 {ctx_text}
@@ -142,3 +152,97 @@ If context is thin, reduce output quantity instead of inventing.
 Ensure each QuestionItem includes: question_text, bloom_level, co_mapping, difficulty, marks, answer_key, detailed_rubric, source_citation (source, page, snippet).
 Return ONLY the JSON.
 """
+
+def _answer_head(text: str, max_words: int = 30) -> str:
+    words = (text or "").split()
+    head = " ".join(words[:max_words])
+    return head + (" ..." if len(words) > max_words else "")
+
+def _snippet_ref(citation: dict, context_snippets: list[dict]) -> int | None:
+    cited = " ".join((citation.get("snippet") or "").split()).lower()
+    fallback = None
+    for i, snip in enumerate(context_snippets, start=1):
+        if snip.get("source") != citation.get("source") or snip.get("page") != citation.get("page"):
+            continue
+        if fallback is None:
+            fallback = i
+        if cited and cited[:80] in " ".join((snip.get("text") or "").split()).lower():
+            return i
+    return fallback
+
+def build_audit_prompt(
+    qb_json: dict,
+    context_snippets: list[dict],
+    targets: dict,
+    retained_questions: list[str] | None = None,
+    local_checks: list[str] | None = None,
+) -> str:
+    """
+    Compact, ID-referenced audit payload. Each question is sent as a one-line
+    digest plus its text and the head of its answer (no rubric), citations
+    become [S#] references to the retrieved snippets, and only cited
+    snippets are included, each exactly once. Citations that match no
+    retrieved snippet are listed once as [C#] excerpts so hallucinated
+    sources stay visible to the auditor.
+    """
+    refs_used: dict[int, None] = {}
+    unmatched: dict[tuple, str] = {}
+    q_lines = []
+    for q in qb_json.get("questions", []):
+        refs = []
+        for c in q.get("source_citation", []):
+            idx = _snippet_ref(c, context_snippets)
+            if idx is not None:
+                refs_used.setdefault(idx, None)
+                tag = f"S{idx}"
+            else:
+                key = (c.get("source"), c.get("page"), c.get("snippet"))
+                unmatched.setdefault(key, f"C{len(unmatched) + 1}")
+                tag = unmatched[key]
+            if tag not in refs:
+                refs.append(tag)
+        q_lines.append(
+            f"[{q.get('id')}] {q.get('marks')}m | {q.get('difficulty')} | {q.get('bloom_level')} | "
+            f"{q.get('co_mapping')} | cites: {', '.join(refs) or 'none'}\n"
+            f"Q: {q.get('question_text')}\n"
+            f"A: {_answer_head(q.get('answer_key', ''))}\n"
+        )
+
+    ctx_lines = []
+    for idx in sorted(refs_used):
+        snip = context_snippets[idx - 1]
+        ctx_lines.append(
+            f"[S{idx}] source={snip.get('source')} page={snip.get('page')} "
+            f"source_type={snip.get('source_type','material')}\n{snip.get('text')}\n"
+        )
+    for (source, page, snippet), tag in unmatched.items():
+        ctx_lines.append(f"[{tag}] source={source} page={page} (NOT in retrieved context)\n{snippet}\n")
+
+    retained_text = ""
+    if retained_questions:
+        retained_lines = "\n".join([f"- {q}" for q in retained_questions])
+        retained_text = f"""
+Previously approved questions (do NOT audit these; only report Redundancy
+if a question above overlaps with one of them):
+{retained_lines}
+"""
+
+    local_text = ""
+    if local_checks:
+        local_text = f"""
+Already checked locally (do NOT report these categories): {', '.join(local_checks)}
+"""
+
+    target_text = "\n".join([f"- {k}: {v}" for k, v in targets.items() if k != "instruction"])
+
+    q_text = "\n".join(q_lines)
+    ctx_text = "\n".join(ctx_lines)
+    return f"""
+Questions (id | marks | difficulty | bloom | CO | cited snippets):
+{q_text}{retained_text}
+Targets:
+{target_text}
+{local_text}
+Cited snippets:
+{ctx_text}
+"""
@@ -0,0 +1,145 @@
+from __future__ import annotations
+import numpy as np
+
+from app.rag.numpy_index import NumpyIndex, _normalize, _top_k
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block: int = 65536) -> np.ndarray:
+    out = np.empty(vectors.shape[0], dtype=np.int32)
+    for i in range(0, vectors.shape[0], block):
+        out[i:i + block] = np.argmax(np.asarray(vectors[i:i + block]) @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means on a sample of at most 256 rows per list.
+    """
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    sample_size = min(n, nlist * 256)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.bincount(labels, minlength=nlist) == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class IVFIndex(NumpyIndex):
+    """
+    Inverted-file ANN index over the NumpyIndex storage.
+
+    Rows are clustered by spherical k-means into `nlist` lists; a query only
+    scores the rows of its `nprobe` closest lists. Raising nprobe trades
+    latency for recall (nprobe == nlist is exact). Inserts are assigned to
+    their nearest centroid immediately, deletes compact the assignments, and
+    centroids are retrained on persist once the index has grown 4x since the
+    last training. Below `min_train` rows search falls back to exact.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        embedder,
+        nlist: int | None = None,
+        nprobe: int = 8,
+        min_train: int = 4096,
+    ):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        super().__init__(path, embedder)
+
+    def _reset(self) -> None:
+        super()._reset()
+        self.centroids: np.ndarray | None = None
+        self.assign = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+        self._order: np.ndarray | None = None
+        self._offsets: np.ndarray | None = None
+
+    # ---- persistence ----
+    def _load(self) -> None:
+        super()._load()
+        ivf_path = self.path / "ivf.npz"
+        if ivf_path.exists() and self.ids:
+            data = np.load(ivf_path)
+            if data["assign"].shape[0] != len(self.ids):
+                # Saved for a different row count (interrupted persist): retrain rather than misassign.
+                return
+            self.centroids = data["centroids"]
+            self.assign = data["assign"]
+            self._trained_size = int(data["trained_size"])
+            if self.nlist is None:
+                self.nlist = self.centroids.shape[0]
+
+    def persist(self) -> None:
+        if not self._dirty:
+            return
+        self._consolidate()
+        if len(self.ids) >= self.min_train and (
+            self.centroids is None or len(self.ids) >= 4 * self._trained_size
+        ):
+            self.train()
+        super().persist()
+        if self.centroids is not None:
+            np.savez(
+                self.path / "ivf.npz",
+                centroids=self.centroids,
+                assign=self.assign,
+                trained_size=np.int64(self._trained_size),
+            )
+
+    # ---- structure ----
+    def train(self, iters: int = 10) -> None:
+        self._consolidate()
+        n = len(self.ids)
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        self.nlist = min(nlist, n)
+        self.centroids = train_centroids(self.vectors, self.nlist, iters=iters)
+        self.assign = _assign(self.vectors, self.centroids)
+        self._trained_size = n
+        self._order = None
+
+    def _on_added(self, vectors: np.ndarray) -> None:
+        if self.centroids is None:
+            return
+        self.assign = np.concatenate([self.assign, _assign(vectors, self.centroids)])
+        self._order = None
+
+    def _on_compacted(self, keep: np.ndarray) -> None:
+        if self.centroids is None:
+            return
+        self.assign = self.assign[keep]
+        self._order = None
+
+    def _lists(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._order is None:
+            self._order = np.argsort(self.assign, kind="stable")
+            counts = np.bincount(self.assign, minlength=self.centroids.shape[0])
+            self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self._order, self._offsets
+
+    # ---- reads ----
+    def search_vector(self, query: np.ndarray, k: int, mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        self._consolidate()
+        if self.centroids is None or self.nprobe >= self.centroids.shape[0]:
+            return super().search_vector(query, k, mask)
+
+        order, offsets = self._lists()
+        nprobe = min(self.nprobe, self.centroids.shape[0])
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([order[offsets[p]:offsets[p + 1]] for p in probes])
+        if mask is not None:
+            rows = rows[mask[rows]]
+        if rows.size == 0:
+            return rows, np.zeros(0, dtype=np.float32)
+        rows.sort()
+        scores = np.asarray(self.vectors[rows] @ query, dtype=np.float32)
+        return _top_k(rows, scores, k)
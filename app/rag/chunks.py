@@ -1,8 +1,7 @@
 from __future__ import annotations
 import re
 from dataclasses import dataclass
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
+from typing import Iterable, Iterator
 
 @dataclass
 class Chunk:
@@ -11,6 +10,8 @@ class Chunk:
     page: int
     chunk_id: str
     source_type: str = "material"
+    course: str = ""
+    tenant: str = ""
 
 def _clean(s: str) -> str:
     s = s.replace("\u00a0", " ")
@@ -18,40 +19,47 @@ def _clean(s: str) -> str:
     s = re.sub(r"\n{3,}", "\n\n", s)
     return s.strip()
 
-def chunk_pages(
-    pages: list[dict],
+def iter_chunks(
+    pages: Iterable[dict],
     source: str,
     chunk_size: int = 1000,
     overlap: int = 200,
     source_type: str = "material",
-) -> list[Chunk]:
-    docs: list[Document] = []
+    course: str = "",
+    tenant: str = "",
+) -> Iterator[Chunk]:
+    """
+    Splits pages one at a time as they arrive. Produces exactly the chunks of
+    chunk_pages (same text and ids) without holding the whole document.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
+    idx = 0
     for page in pages:
         text = _clean(page.get("text", ""))
         if not text:
             continue
-        docs.append(
-            Document(
-                page_content=text,
-                metadata={"source": source, "page": page.get("page"), "source_type": source_type},
+        page_no = page.get("page")
+        for piece in splitter.split_text(text):
+            idx += 1
+            yield Chunk(
+                text=piece,
+                source=source,
+                page=page_no,
+                chunk_id=f"{source}:p{page_no}:c{idx}",
+                source_type=source_type,
+                course=course,
+                tenant=tenant,
             )
-        )
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
-    split_docs = splitter.split_documents(docs)
 
-    chunks: list[Chunk] = []
-    for idx, doc in enumerate(split_docs, start=1):
-        meta = doc.metadata or {}
-        page = meta.get("page", 0)
-        cid = f"{source}:p{page}:c{idx}"
-        chunks.append(
-            Chunk(
-                text=doc.page_content,
-                source=meta.get("source", source),
-                page=page,
-                chunk_id=cid,
-                source_type=meta.get("source_type", source_type),
-            )
-        )
-    return chunks
+def chunk_pages(
+    pages: list[dict],
+    source: str,
+    chunk_size: int = 1000,
+    overlap: int = 200,
+    source_type: str = "material",
+) -> list[Chunk]:
+    return list(
+        iter_chunks(pages, source, chunk_size=chunk_size, overlap=overlap, source_type=source_type)
+    )
@@ -0,0 +1,142 @@
+from __future__ import annotations
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.tracing import span
+
+DEFAULT_CACHE_PATH = "data/embed_cache.sqlite"
+
+
+class EmbeddingService(Embeddings):
+    """
+    Process-wide SentenceTransformer front end.
+
+    The model is loaded once on first use, misses are encoded in large
+    batches as float32 arrays, and every vector is stored in an on-disk
+    cache keyed by (model, text hash) so identical text is never encoded
+    twice, across reruns and re-uploads alike.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_path: str | None = DEFAULT_CACHE_PATH,
+        batch_size: int = 256,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        self.hits = 0
+        self.misses = 0
+        if cache_path:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vec BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        if self._db is None:
+            return found
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _store(self, keys: list[str], vectors: np.ndarray) -> None:
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)",
+                [(k, v.tobytes()) for k, v in zip(keys, vectors)],
+            )
+            self._db.commit()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """
+        Returns a (len(texts), dim) float32 matrix, encoding only cache misses.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        keys = [self._key(t) for t in texts]
+        cached = self._lookup(list(dict.fromkeys(keys)))
+
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        self.hits += len(texts) - sum(1 for k in keys if k in missing)
+        self.misses += len(missing)
+
+        if missing:
+            with span("embed", texts=len(missing), bytes=sum(len(t.encode("utf-8")) for t in missing.values())):
+                vectors = np.asarray(
+                    self.model.encode(
+                        list(missing.values()),
+                        batch_size=self.batch_size,
+                        convert_to_numpy=True,
+                        show_progress_bar=False,
+                    ),
+                    dtype=np.float32,
+                )
+                self._store(list(missing.keys()), vectors)
+            cached.update(zip(missing.keys(), vectors))
+
+        return np.vstack([cached[k] for k in keys]).astype(np.float32, copy=False)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.encode([text])[0].tolist()
+
+    def stats(self) -> dict:
+        return {"model": self.model_name, "hits": self.hits, "misses": self.misses}
+
+
+_SERVICES: dict[str, EmbeddingService] = {}
+_SERVICES_LOCK = threading.Lock()
+
+
+def get_embedding_service(
+    model_name: str,
+    cache_path: str | None = DEFAULT_CACHE_PATH,
+    batch_size: int | None = None,
+) -> EmbeddingService:
+    with _SERVICES_LOCK:
+        service = _SERVICES.get(model_name)
+        if service is None:
+            service = EmbeddingService(model_name, cache_path=cache_path, batch_size=batch_size or 256)
+            _SERVICES[model_name] = service
+        elif batch_size:
+            service.batch_size = batch_size
+        return service
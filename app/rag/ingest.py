@@ -1,6 +1,13 @@
 from __future__ import annotations
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
-from PyPDF2 import PdfReader
+from typing import Callable, Iterator
+
+from app.config import get_ingest_workers
+
+# progress(pdf_path, pages_done, total_pages)
+ProgressFn = Callable[[str, int, int], None]
 
 def save_uploaded_pdf(uploaded_file, save_dir: str = "data/uploads") -> str:
     Path(save_dir).mkdir(parents=True, exist_ok=True)
@@ -9,10 +16,83 @@ def save_uploaded_pdf(uploaded_file, save_dir: str = "data/uploads") -> str:
         f.write(uploaded_file.getbuffer())
     return str(file_path)
 
+def _open_pdf(pdf_path: str):
+    # PyPDF2 loads on first use; importing this module (e.g. for save_uploaded_pdf) stays cheap.
+    from PyPDF2 import PdfReader
+
+    return PdfReader(pdf_path)
+
 def extract_pages_from_pdf(pdf_path: str) -> list[dict]:
-    reader = PdfReader(pdf_path)
+    reader = _open_pdf(pdf_path)
     pages: list[dict] = []
     for idx, page in enumerate(reader.pages, start=1):
         text = page.extract_text() or ""
         pages.append({"page": idx, "text": text})
     return pages
+
+def iter_pages_from_pdf(pdf_path: str) -> Iterator[dict]:
+    reader = _open_pdf(pdf_path)
+    for idx, page in enumerate(reader.pages, start=1):
+        yield {"page": idx, "text": page.extract_text() or ""}
+
+def count_pdf_pages(pdf_path: str) -> int:
+    return len(_open_pdf(pdf_path).pages)
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> list[dict]:
+    # Runs in a worker process; each task opens its own reader.
+    reader = _open_pdf(pdf_path)
+    pages: list[dict] = []
+    for idx in range(start, end):
+        text = reader.pages[idx].extract_text() or ""
+        pages.append({"page": idx + 1, "text": text})
+    return pages
+
+def iter_pages_parallel(
+    pdf_path: str,
+    workers: int | None = None,
+    pages_per_task: int = 16,
+    window: int | None = None,
+    progress: ProgressFn | None = None,
+    executor: Executor | None = None,
+) -> Iterator[dict]:
+    """
+    Streams pages in order while at most `window` page ranges are in flight,
+    so memory stays bounded by the window rather than the document length.
+    """
+    workers = workers or get_ingest_workers()
+    total = count_pdf_pages(pdf_path)
+
+    if executor is None and (workers <= 1 or total <= pages_per_task):
+        for page in iter_pages_from_pdf(pdf_path):
+            yield page
+            if progress:
+                progress(pdf_path, page["page"], total)
+        return
+
+    pool = executor or ProcessPoolExecutor(max_workers=workers)
+    window = window or 2 * workers
+    starts = iter(range(0, total, pages_per_task))
+    inflight: deque = deque()
+
+    def _submit_next() -> None:
+        start = next(starts, None)
+        if start is not None:
+            end = min(start + pages_per_task, total)
+            inflight.append(pool.submit(_extract_page_range, pdf_path, start, end))
+
+    try:
+        for _ in range(window):
+            _submit_next()
+        done = 0
+        while inflight:
+            pages = inflight.popleft().result()
+            _submit_next()
+            done += len(pages)
+            if progress:
+                progress(pdf_path, done, total)
+            yield from pages
+    finally:
+        for fut in inflight:
+            fut.cancel()
+        if executor is None:
+            pool.shutdown()
@@ -0,0 +1,322 @@
+from __future__ import annotations
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from app.config import get_ingest_job_settings, get_ingest_workers, get_trace_dir
+from app.rag.ingest import count_pdf_pages
+from app.rag.lexical import BM25Index, lexical_path
+from app.rag.manifest import IngestManifest, file_sha256, manifest_path
+from app.rag.pipeline import ingest_pdfs
+from app.rag.vectorstore import get_collection, writer_lock
+from app.resources import get_resources
+from app.tracing import trace
+
+ACTIVE = ("queued", "running")
+
+
+def _page_count(path: str) -> int:
+    # 0 (unknown) for an unreadable PDF; the worker reports the real error when it gets to it.
+    try:
+        return count_pdf_pages(path)
+    except Exception:
+        return 0
+
+
+def job_signature(persist_dir: str, collection: str, files: list[tuple[str, str, str]], **settings) -> str:
+    # Same file contents into the same collection with the same settings -> same job.
+    contents = sorted((file_sha256(path), source, source_type) for path, source, source_type in files)
+    payload = [persist_dir, collection, contents, sorted(settings.items())]
+    return hashlib.sha256(json.dumps(payload).encode("utf-8")).hexdigest()
+
+
+class JobStore:
+    """
+    SQLite table of ingest jobs and their files. Status, page progress,
+    chunk counts and PII findings are written as the worker goes, so any
+    session (or a reloaded page) can read where a job is.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY, signature TEXT NOT NULL, persist_dir TEXT NOT NULL,
+                collection TEXT NOT NULL, course TEXT NOT NULL, settings TEXT NOT NULL,
+                status TEXT NOT NULL, error TEXT, created REAL NOT NULL, updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_files (
+                job_id TEXT NOT NULL, seq INTEGER NOT NULL, path TEXT NOT NULL, source TEXT NOT NULL,
+                source_type TEXT NOT NULL, status TEXT NOT NULL, pages_done INTEGER NOT NULL DEFAULT 0,
+                pages_total INTEGER NOT NULL DEFAULT 0, chunks INTEGER NOT NULL DEFAULT 0,
+                skipped INTEGER NOT NULL DEFAULT 0, pii TEXT NOT NULL DEFAULT '[]', error TEXT,
+                PRIMARY KEY (job_id, seq)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+            """
+        )
+        self._db.commit()
+
+    def create(
+        self,
+        persist_dir: str,
+        collection: str,
+        course: str,
+        files: list[tuple[str, str, str]],
+        settings: dict,
+    ) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        signature = job_signature(persist_dir, collection, files, **settings)
+        # Page counts up front, so the job's progress covers files that have not started yet.
+        pages = [_page_count(path) for path, _, _ in files]
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, 'queued', NULL, ?, ?)",
+                (job_id, signature, persist_dir, collection, course, json.dumps(settings), now, now),
+            )
+            self._db.executemany(
+                "INSERT INTO job_files (job_id, seq, path, source, source_type, status, pages_total) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?)",
+                [
+                    (job_id, i, path, source, source_type, pages[i])
+                    for i, (path, source, source_type) in enumerate(files)
+                ],
+            )
+            self._db.commit()
+        return job_id
+
+    def set_status(self, job_id: str, status: str, error: str | None = None) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE job_id = ?",
+                (status, error, time.time(), job_id),
+            )
+            self._db.commit()
+
+    def update_file(self, job_id: str, seq: int, **fields) -> None:
+        if "pii" in fields:
+            fields["pii"] = json.dumps(fields["pii"])
+        columns = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE job_files SET {columns} WHERE job_id = ? AND seq = ?",
+                (*fields.values(), job_id, seq),
+            )
+            self._db.execute("UPDATE jobs SET updated = ? WHERE job_id = ?", (time.time(), job_id))
+            self._db.commit()
+
+    def get(self, job_id: str) -> dict | None:
+        """
+        The job with its files and totals (pages_done and pages_total over
+        all files, started or not; chunks indexed so far; PII findings per
+        file), or None.
+        """
+        with self._lock:
+            self._db.row_factory = sqlite3.Row
+            try:
+                row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                files = self._db.execute(
+                    "SELECT * FROM job_files WHERE job_id = ? ORDER BY seq", (job_id,)
+                ).fetchall()
+            finally:
+                self._db.row_factory = None
+        if row is None:
+            return None
+        job = dict(row)
+        job["settings"] = json.loads(job["settings"])
+        job["files"] = [{**dict(f), "skipped": bool(f["skipped"]), "pii": json.loads(f["pii"])} for f in files]
+        # A file whose page count is unknown weighs one page; finished (or skipped) files count in full.
+        totals = [f["pages_total"] or 1 for f in job["files"]]
+        job["pages_total"] = sum(totals)
+        job["pages_done"] = sum(
+            total if f["status"] == "done" else min(f["pages_done"], total) for f, total in zip(job["files"], totals)
+        )
+        job["chunks"] = sum(f["chunks"] for f in job["files"] if f["status"] == "done")
+        job["sources"] = [f["source"] for f in job["files"]]
+        job["pii"] = [{"file": f["source"], "findings": f["pii"]} for f in job["files"] if f["pii"]]
+        return job
+
+    def active(self, signature: str) -> str | None:
+        # Most recent queued or running job for these inputs. Finished jobs are not
+        # reused: the collection may have changed since (another upload, a wiped
+        # persist dir), and a new job costs little when the manifest skips every file.
+        with self._lock:
+            row = self._db.execute(
+                "SELECT job_id FROM jobs WHERE signature = ? AND status IN (?, ?) ORDER BY created DESC LIMIT 1",
+                (signature, *ACTIVE),
+            ).fetchone()
+        return row[0] if row else None
+
+    def unfinished(self) -> list[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT job_id FROM jobs WHERE status IN (?, ?) ORDER BY created", ACTIVE
+            ).fetchall()
+        return [r[0] for r in rows]
+
+
+def is_ready(job: dict | None, min_chunks: int) -> bool:
+    """
+    Generation can start once the job is done, or once at least `min_chunks`
+    chunks from finished files are indexed while the rest is still running.
+    """
+    if not job:
+        return False
+    if job["status"] in ACTIVE:
+        return job["chunks"] >= min_chunks
+    # Finished, failed or cancelled: use whatever made it into the index.
+    return job["status"] == "done" or job["chunks"] > 0
+
+
+class IngestQueue:
+    """
+    Runs ingest jobs on background threads so the Streamlit script never
+    blocks on extraction or embedding. Jobs on the same collection run one
+    after another; files are committed one at a time, so what is indexed
+    becomes searchable before the whole job finishes. Jobs left queued or
+    running by a previous process are resumed on start (the ingest manifest
+    skips files that were already finished).
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2):
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-job")
+        self._cancelled: set[str] = set()
+        for job_id in store.unfinished():
+            self._pool.submit(self._run, job_id)
+
+    def submit(
+        self,
+        persist_dir: str,
+        collection: str,
+        files: list[tuple[str, str, str]],
+        course: str = "",
+        chunk_size: int = 1000,
+        overlap: int = 200,
+    ) -> str:
+        """
+        Queues an ingest of (pdf_path, source, source_type) triples and returns
+        the job id. An identical job that is still queued or running is
+        reused instead of starting another.
+        """
+        settings = {"chunk_size": chunk_size, "overlap": overlap}
+        existing = self.store.active(job_signature(persist_dir, collection, files, **settings))
+        if existing:
+            return existing
+        job_id = self.store.create(persist_dir, collection, course, files, settings)
+        self._pool.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        return self.store.get(job_id)
+
+    def cancel(self, job_id: str) -> None:
+        # Takes effect between files; the file in progress is finished first.
+        job = self.store.get(job_id)
+        if job and job["status"] in ACTIVE:
+            self._cancelled.add(job_id)
+
+    def _run(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None or job["status"] not in ACTIVE:
+            return
+        persist_dir, name = job["persist_dir"], job["collection"]
+        workers = get_ingest_workers()
+        # One extraction pool for the whole job; files are ingested one call at a time.
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        with writer_lock(persist_dir, name), trace(f"ingest_job:{job_id}") as job_trace:
+            try:
+                self.store.set_status(job_id, "running")
+                resources = get_resources()
+                collection = get_collection(persist_dir, name, resources.embedder())
+                lexical = BM25Index(lexical_path(persist_dir, name))
+                manifest = IngestManifest(manifest_path(persist_dir, name))
+                status = "done"
+                for f in job["files"]:
+                    if job_id in self._cancelled:
+                        status = "cancelled"
+                        break
+                    if f["status"] != "done":
+                        self._ingest_file(job, f, collection, manifest, lexical, pool)
+                        # Shared readers reopen from disk and see this file's chunks.
+                        resources.invalidate(persist_dir, name)
+                self.store.set_status(job_id, status)
+            except Exception as exc:
+                self.store.set_status(job_id, "failed", f"{type(exc).__name__}: {exc}")
+            finally:
+                self._cancelled.discard(job_id)
+                if pool is not None:
+                    pool.shutdown()
+        trace_dir = get_trace_dir()
+        if trace_dir:
+            job_trace.write_jsonl(str(Path(trace_dir) / f"{job_trace.trace_id}.jsonl"))
+
+    def _ingest_file(
+        self, job: dict, f: dict, collection, manifest: IngestManifest, lexical: BM25Index, pool=None
+    ) -> None:
+        job_id, seq = job["job_id"], f["seq"]
+        self.store.update_file(job_id, seq, status="running", error=None)
+        last = [0.0]
+
+        def _on_progress(path: str, done: int, total: int) -> None:
+            # Page ranges can finish in quick bursts; one write per 0.2 s is plenty for a progress bar.
+            now = time.monotonic()
+            if now - last[0] >= 0.2 or done >= total:
+                last[0] = now
+                self.store.update_file(job_id, seq, pages_done=done, pages_total=total)
+
+        try:
+            result = ingest_pdfs(
+                collection,
+                manifest,
+                [(f["path"], f["source"], f["source_type"])],
+                progress=_on_progress,
+                course=job["course"],
+                lexical=lexical,
+                executor=pool,
+                **job["settings"],
+            )[0]
+        except Exception as exc:
+            self.store.update_file(job_id, seq, status="failed", error=f"{type(exc).__name__}: {exc}")
+            raise
+        self.store.update_file(
+            job_id,
+            seq,
+            status="done",
+            chunks=result["chunks"],
+            skipped=int(result["skipped"]),
+            pii=result["pii"],
+        )
+
+
+_QUEUE: IngestQueue | None = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_ingest_queue() -> IngestQueue:
+    """
+    Process-wide queue configured from the environment (see
+    config.get_ingest_job_settings); shared by every session.
+    """
+    global _QUEUE
+    with _QUEUE_LOCK:
+        if _QUEUE is None:
+            settings = get_ingest_job_settings()
+            _QUEUE = IngestQueue(JobStore(settings["path"]), workers=settings["workers"])
+        return _QUEUE
+
+
+def set_ingest_queue(queue: IngestQueue | None) -> None:
+    global _QUEUE
+    with _QUEUE_LOCK:
+        _QUEUE = queue
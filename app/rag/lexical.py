@@ -0,0 +1,144 @@
+from __future__ import annotations
+import heapq
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    """a an and are as at be but by for from has have in into is it its of on or
+    that the their then there these this to was were which with what when where
+    who why how can will would should could may might does do did not no""".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def match_where(meta: dict, where: dict | None) -> bool:
+    # Same Chroma-style filter subset as NumpyIndex._mask, for one document.
+    if not where:
+        return True
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(match_where(meta, sub) for sub in cond):
+                return False
+        elif key == "$or":
+            if not any(match_where(meta, sub) for sub in cond):
+                return False
+        else:
+            value = meta.get(key)
+            ops = cond if isinstance(cond, dict) else {"$eq": cond}
+            for op, expected in ops.items():
+                if op == "$eq" and value != expected:
+                    return False
+                if op == "$ne" and value == expected:
+                    return False
+                if op == "$in" and value not in expected:
+                    return False
+                if op == "$nin" and value in expected:
+                    return False
+    return True
+
+
+class BM25Index:
+    """
+    Tokenized inverted index with BM25 statistics, built at ingest time next
+    to the vector store. Postings map term -> {chunk_id: term frequency}, so
+    queries never touch chunk text and deletes need no row renumbering.
+
+    Only postings, document lengths and metadata are stored; chunk text stays
+    in the vector store (fetch it with `collection.get(ids=...)`), so a
+    persist does not rewrite every chunk a second time.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, dict[str, int]] = {}
+        self.docs: dict[str, dict] = {}
+        self.total_len = 0
+        self._dirty = False
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+                self.postings = data["postings"]
+                # Files written before text moved out of the index still carry it; drop it on load.
+                self.docs = {cid: {"meta": d["meta"], "len": d["len"]} for cid, d in data["docs"].items()}
+                self.total_len = sum(d["len"] for d in self.docs.values())
+            except (OSError, ValueError, KeyError):
+                self.postings, self.docs, self.total_len = {}, {}, 0
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self.docs
+
+    def add(self, ids: list[str], texts: list[str], metadatas: list[dict]) -> None:
+        existing = [cid for cid in ids if cid in self.docs]
+        if existing:
+            self.delete(existing)
+        for cid, text, meta in zip(ids, texts, metadatas):
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[cid] = tf
+            length = sum(counts.values())
+            self.docs[cid] = {"meta": meta, "len": length}
+            self.total_len += length
+        self._dirty = True
+
+    def delete(self, ids: list[str] | None = None, where: dict | None = None) -> None:
+        targets = [cid for cid in ids or [] if cid in self.docs]
+        if where:
+            targets += [cid for cid, d in self.docs.items() if match_where(d["meta"], where)]
+        drop = set(targets)
+        if not drop:
+            return
+        for cid in drop:
+            self.total_len -= self.docs.pop(cid)["len"]
+        # Without the text the terms of a chunk are unknown, so one pass over the postings
+        # removes the whole batch (deletes only happen when a source is re-ingested).
+        for term in list(self.postings):
+            plist = self.postings[term]
+            for cid in drop.intersection(plist):
+                del plist[cid]
+            if not plist:
+                del self.postings[term]
+        self._dirty = True
+
+    def persist(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"postings": self.postings, "docs": self.docs}), encoding="utf-8")
+        tmp.replace(self.path)
+        self._dirty = False
+
+    def search(self, query: str, k: int = 10, where: dict | None = None) -> list[tuple[str, float]]:
+        n = len(self.docs)
+        if not n:
+            return []
+        avgdl = self.total_len / n or 1.0
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for cid, tf in plist.items():
+                dl = self.docs[cid]["len"]
+                denom = tf + self.k1 * (1 - self.b + self.b * dl / avgdl)
+                scores[cid] = scores.get(cid, 0.0) + idf * tf * (self.k1 + 1) / denom
+        if where:
+            scores = {cid: sc for cid, sc in scores.items() if match_where(self.docs[cid]["meta"], where)}
+        return heapq.nlargest(k, scores.items(), key=lambda x: x[1])
+
+
+def lexical_path(persist_dir: str, collection_name: str) -> str:
+    return str(Path(persist_dir) / f"{collection_name}.bm25.json")
@@ -0,0 +1,94 @@
+from __future__ import annotations
+import hashlib
+import json
+from pathlib import Path
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class IngestManifest:
+    """
+    Persistent record of what has been ingested into a collection.
+
+    Entries are keyed by source name and store the content hash of the file
+    together with the settings that shaped its chunks, so a file is only
+    re-processed when its bytes or the chunking/embedding settings change.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: dict[str, dict] = {}
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.entries = {}
+
+    @staticmethod
+    def fingerprint(
+        content_hash: str,
+        chunk_size: int,
+        overlap: int,
+        embed_model: str,
+        source_type: str,
+    ) -> dict:
+        return {
+            "sha256": content_hash,
+            "chunk_size": chunk_size,
+            "overlap": overlap,
+            "embed_model": embed_model,
+            "source_type": source_type,
+        }
+
+    def is_current(self, source: str, fingerprint: dict) -> bool:
+        entry = self.entries.get(source)
+        if not entry:
+            return False
+        return all(entry.get(k) == v for k, v in fingerprint.items())
+
+    def get(self, source: str) -> dict | None:
+        return self.entries.get(source)
+
+    def record(
+        self,
+        source: str,
+        fingerprint: dict,
+        chunk_ids: list[str],
+        pii: list[dict],
+        lexical: bool = False,
+    ) -> None:
+        self.entries[source] = {**fingerprint, "chunk_ids": chunk_ids, "pii": pii, "lexical": lexical}
+
+    def mark_lexical(self, source: str) -> None:
+        if source in self.entries:
+            self.entries[source]["lexical"] = True
+
+    def lexical_missing(self, lexical) -> list[str]:
+        """
+        Sources whose chunks are not in the BM25 index `lexical`: ingested
+        before the index existed, or the index file was lost since.
+        """
+        return [
+            source
+            for source, entry in self.entries.items()
+            if entry.get("chunk_ids") and (not entry.get("lexical") or entry["chunk_ids"][0] not in lexical)
+        ]
+
+    def forget(self, source: str) -> None:
+        self.entries.pop(source, None)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+
+
+def manifest_path(persist_dir: str, collection_name: str) -> str:
+    return str(Path(persist_dir) / f"{collection_name}.manifest.json")
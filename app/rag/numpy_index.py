@@ -0,0 +1,309 @@
+from __future__ import annotations
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class NumpyIndex:
+    """
+    In-process exact vector index.
+
+    Normalized embeddings live in one contiguous float32 matrix that is
+    memory-mapped from `vectors.npy`; metadata is held column-wise (one list
+    per key, turned into an object array and cached the first time a filter
+    uses it). Search is a single matrix-vector product followed by
+    argpartition, and distances are cosine distances (lower is closer) to
+    match Chroma's ordering. Exposes the same add_texts / delete /
+    similarity_search_with_score / persist surface as the Chroma wrapper.
+
+    Persisting after appends only writes the new rows: they are appended to
+    `vectors.npy` in place and their ids, texts and metadata go to
+    `meta.jsonl`. A delete (rows renumbered) rewrites both files in full.
+    """
+
+    def __init__(self, path: str, embedder):
+        self.path = Path(path)
+        self.embedder = embedder
+        self._reset()
+        self._load()
+
+    def _reset(self) -> None:
+        self.ids: list[str] = []
+        self.texts: list[str] = []
+        self.columns: dict[str, list] = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._pending: list[np.ndarray] = []
+        self._row: dict[str, int] = {}
+        self._col_cache: dict[str, np.ndarray] = {}
+        self._dirty = False
+        # Rows already in vectors.npy / the metadata files; 0 forces a full rewrite on persist.
+        self._persisted = 0
+
+    # ---- persistence ----
+    def reload(self) -> None:
+        # Drops unsaved changes and reads what is on disk now (another writer may have persisted since).
+        self._reset()
+        self._load()
+
+    def _load(self) -> None:
+        meta_path = self.path / "meta.json"
+        vec_path = self.path / "vectors.npy"
+        if not meta_path.exists() or not vec_path.exists():
+            return
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        self.ids = meta["ids"]
+        self.texts = meta["texts"]
+        self.columns = meta["columns"]
+        journal = self.path / "meta.jsonl"
+        if journal.exists():
+            for line in journal.read_text(encoding="utf-8").splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn last line of an interrupted persist
+                # Entries already folded into meta.json by a rewrite start below the current row count.
+                if entry["start"] == len(self.ids):
+                    self._extend(entry["ids"], entry["texts"], entry["metadatas"])
+        self.vectors = np.load(vec_path, mmap_mode="r")
+        n = min(len(self.ids), self.vectors.shape[0])
+        if n == len(self.ids) == self.vectors.shape[0]:
+            self._persisted = n
+        else:
+            # An interrupted persist left one side longer; keep the rows both have and rewrite next time.
+            self.ids, self.texts = self.ids[:n], self.texts[:n]
+            self.columns = {k: v[:n] for k, v in self.columns.items()}
+            self.vectors = self.vectors[:n]
+        self._row = {cid: i for i, cid in enumerate(self.ids)}
+
+    def _extend(self, ids: list[str], texts: list[str], metadatas: list[dict]) -> None:
+        start = len(self.ids)
+        keys = set(self.columns) | {k for m in metadatas for k in m}
+        for key in keys:
+            col = self.columns.setdefault(key, [None] * start)
+            col.extend(m.get(key) for m in metadatas)
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+
+    def _consolidate(self) -> None:
+        # Appends are buffered so a stream of batches costs one copy, not one per batch.
+        if not self._pending:
+            return
+        parts = ([self.vectors] if self.vectors.size else []) + self._pending
+        self.vectors = np.vstack(parts)
+        self._pending = []
+
+    def persist(self) -> None:
+        if not self._dirty:
+            return
+        self._consolidate()
+        self.path.mkdir(parents=True, exist_ok=True)
+        if not (0 < self._persisted <= len(self.ids) and self._append_rows(self._persisted)):
+            self._rewrite()
+        self._persisted = len(self.ids)
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self._dirty = False
+
+    def _rewrite(self) -> None:
+        vec_tmp = self.path / "vectors.tmp.npy"
+        np.save(vec_tmp, np.ascontiguousarray(self.vectors, dtype=np.float32))
+        meta_tmp = self.path / "meta.json.tmp"
+        meta_tmp.write_text(
+            json.dumps({"ids": self.ids, "texts": self.texts, "columns": self.columns}),
+            encoding="utf-8",
+        )
+        vec_tmp.replace(self.path / "vectors.npy")
+        meta_tmp.replace(self.path / "meta.json")
+        (self.path / "meta.jsonl").unlink(missing_ok=True)
+
+    def _append_rows(self, start: int) -> bool:
+        """
+        Appends rows `start:` to vectors.npy and meta.jsonl. Returns False
+        (nothing written) when the file on disk does not end at `start`.
+        """
+        new = np.ascontiguousarray(self.vectors[start:], dtype=np.float32)
+        if not new.shape[0]:
+            return True
+        with open(self.path / "vectors.npy", "r+b") as f:
+            if np.lib.format.read_magic(f) != (1, 0):
+                return False
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            offset = f.tell()
+            if fortran_order or dtype != np.float32 or shape != (start, new.shape[1]):
+                return False
+            # np.save pads the header so axis 0 can grow in place; check the new one is the same size.
+            header = io.BytesIO()
+            np.lib.format.write_array_header_1_0(
+                header, {"descr": "<f4", "fortran_order": False, "shape": (start + new.shape[0], new.shape[1])}
+            )
+            if header.tell() != offset:
+                return False
+            f.seek(offset + start * new.shape[1] * 4)
+            f.write(new.tobytes())
+            f.truncate()
+            f.seek(0)
+            f.write(header.getvalue())
+        entry = {
+            "start": start,
+            "ids": self.ids[start:],
+            "texts": self.texts[start:],
+            "metadatas": [self._metadata(i) for i in range(start, len(self.ids))],
+        }
+        with open(self.path / "meta.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        return True
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ---- writes ----
+    def add_texts(self, texts: list[str], metadatas: list[dict] | None = None, ids: list[str] | None = None) -> list[str]:
+        texts = list(texts)
+        vectors = np.asarray(self.embedder.embed_documents(texts), dtype=np.float32)
+        return self.add_vectors(vectors, texts, metadatas, ids)
+
+    def add_vectors(
+        self,
+        vectors: np.ndarray,
+        texts: list[str],
+        metadatas: list[dict] | None = None,
+        ids: list[str] | None = None,
+    ) -> list[str]:
+        metadatas = list(metadatas or [{} for _ in texts])
+        ids = list(ids or [f"row{len(self.ids) + i}" for i in range(len(texts))])
+        existing = [cid for cid in ids if cid in self._row]
+        if existing:
+            self.delete(existing)
+
+        new_vecs = _normalize(vectors)
+        self._pending.append(new_vecs)
+
+        start = len(self.ids)
+        self._extend(ids, texts, metadatas)
+        for i, cid in enumerate(ids):
+            self._row[cid] = start + i
+        self._col_cache.clear()
+        self._on_added(new_vecs)
+        self._dirty = True
+        return ids
+
+    def delete(self, ids: list[str] | None = None, where: dict | None = None) -> None:
+        drop = np.zeros(len(self.ids), dtype=bool)
+        for cid in ids or []:
+            if cid in self._row:
+                drop[self._row[cid]] = True
+        if where:
+            drop |= self._mask(where)
+        if not drop.any():
+            return
+        self._consolidate()
+        keep = np.flatnonzero(~drop)
+        self.vectors = np.asarray(self.vectors)[keep] if keep.size else np.zeros((0, 0), dtype=np.float32)
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.columns = {k: [v[i] for i in keep] for k, v in self.columns.items()}
+        self._row = {cid: i for i, cid in enumerate(self.ids)}
+        self._col_cache.clear()
+        self._on_compacted(keep)
+        self._persisted = 0
+        self._dirty = True
+
+    # Hooks for index structures layered on top of the flat matrix.
+    def _on_added(self, vectors: np.ndarray) -> None:
+        pass
+
+    def _on_compacted(self, keep: np.ndarray) -> None:
+        pass
+
+    # ---- reads ----
+    def get(self, ids: list[str] | None = None) -> dict:
+        # Same shape as Chroma's collection.get(); unknown ids are left out.
+        rows = [self._row[cid] for cid in ids or [] if cid in self._row]
+        return {
+            "ids": [self.ids[i] for i in rows],
+            "documents": [self.texts[i] for i in rows],
+            "metadatas": [self._metadata(i) for i in rows],
+        }
+
+    def _metadata(self, row: int) -> dict:
+        return {k: v[row] for k, v in self.columns.items() if v[row] is not None}
+
+    def _column(self, key: str) -> np.ndarray:
+        col = self._col_cache.get(key)
+        if col is None or col.shape[0] != len(self.ids):
+            col = np.asarray(self.columns.get(key, [None] * len(self.ids)), dtype=object)
+            self._col_cache[key] = col
+        return col
+
+    def _mask(self, filter: dict | None) -> np.ndarray | None:
+        """
+        Evaluates a Chroma-style `where` filter ($and/$or, $eq/$ne/$in/$nin or a
+        bare value for equality) against the metadata columns.
+        """
+        if not filter:
+            return None
+        mask = np.ones(len(self.ids), dtype=bool)
+        for key, cond in filter.items():
+            if key == "$and":
+                for sub in cond:
+                    mask &= self._mask(sub)
+            elif key == "$or":
+                any_mask = np.zeros(len(self.ids), dtype=bool)
+                for sub in cond:
+                    any_mask |= self._mask(sub)
+                mask &= any_mask
+            else:
+                col = self._column(key)
+                ops = cond if isinstance(cond, dict) else {"$eq": cond}
+                for op, value in ops.items():
+                    if op == "$eq":
+                        mask &= col == value
+                    elif op == "$ne":
+                        mask &= col != value
+                    elif op == "$in":
+                        mask &= np.isin(col, list(value))
+                    elif op == "$nin":
+                        mask &= ~np.isin(col, list(value))
+                    else:
+                        raise ValueError(f"Unsupported filter operator: {op}")
+        return mask
+
+    def search_vector(self, query: np.ndarray, k: int, mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Exact top-k by cosine similarity. Returns (rows, scores), best first.
+        """
+        self._consolidate()
+        scores = np.asarray(self.vectors @ query, dtype=np.float32)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        return _top_k(np.arange(scores.shape[0]), scores, k)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: dict | None = None):
+        if not self.ids or k <= 0:
+            return []
+        from langchain_core.documents import Document
+
+        q = _normalize(np.asarray(self.embedder.embed_query(query), dtype=np.float32))
+        rows, scores = self.search_vector(q, k, self._mask(filter))
+        return [
+            (Document(id=self.ids[i], page_content=self.texts[i], metadata=self._metadata(i)), float(1.0 - sc))
+            for i, sc in zip(rows, scores)
+        ]
+
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return rows[:0], scores[:0]
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return rows[top], scores[top]
@@ -0,0 +1,127 @@
+from __future__ import annotations
+import re
+from functools import lru_cache
+
+from app.tracing import current_span, traced
+
+WORD_RE = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    # Local count with the gpt-4o tokenizer; ~4 chars/token if tiktoken is unavailable.
+    enc = _encoding()
+    if enc is None:
+        return max(1, len(text or "") // 4)
+    return len(enc.encode(text or "", disallowed_special=()))
+
+
+def _shingles(text: str, n: int = 5) -> set[int]:
+    words = WORD_RE.findall((text or "").lower())
+    if len(words) < n:
+        return {hash(" ".join(words))}
+    return {hash(" ".join(words[i:i + n])) for i in range(len(words) - n + 1)}
+
+
+def _jaccard(a: set[int], b: set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _overlap(a: str, b: str, min_len: int = 20, max_len: int = 400) -> int:
+    """
+    Length of the longest suffix of `a` that is a prefix of `b` (chunk overlap).
+    """
+    for k in range(min(len(a), len(b), max_len), min_len - 1, -1):
+        if a.endswith(b[:k]):
+            return k
+    return 0
+
+
+def _try_merge(a: str, b: str) -> str | None:
+    k = _overlap(a, b)
+    if k:
+        return a + b[k:]
+    k = _overlap(b, a)
+    if k:
+        return b + a[k:]
+    return None
+
+
+@traced("pack_context")
+def pack_context(
+    snippets: list[dict],
+    token_budget: int = 6000,
+    dedup_threshold: float = 0.8,
+) -> list[dict]:
+    """
+    Packs relevance-ordered snippets into `token_budget` prompt tokens.
+
+    Near-duplicates (5-word shingle Jaccard >= dedup_threshold against an
+    already selected snippet) are dropped, overlapping chunks from the same
+    source and page are merged into one snippet so the shared text is sent
+    once, and the remaining snippets are taken in relevance order while they
+    fit the budget.
+    """
+    packed: list[dict] = []
+    shingles: list[set[int]] = []
+    used = 0
+    for snip in snippets:
+        text = snip.get("text") or ""
+        sh = _shingles(text)
+        if any(_jaccard(sh, other) >= dedup_threshold for other in shingles):
+            continue
+
+        merged = False
+        for i, prev in enumerate(packed):
+            if (prev.get("source"), prev.get("page")) != (snip.get("source"), snip.get("page")):
+                continue
+            combined = _try_merge(prev["text"], text)
+            if combined is None:
+                continue
+            extra = count_tokens(combined) - prev["_tokens"]
+            if used + extra <= token_budget:
+                packed[i] = {**prev, "text": combined, "_tokens": prev["_tokens"] + extra}
+                shingles[i] = shingles[i] | sh
+                used += extra
+            merged = True
+            break
+        if merged:
+            continue
+
+        tokens = count_tokens(text)
+        if used + tokens > token_budget:
+            continue
+        packed.append({**snip, "_tokens": tokens})
+        shingles.append(sh)
+        used += tokens
+
+    # Chunks that arrived out of order may only become adjacent once their
+    # neighbour is in; a final pass joins them (this never adds tokens).
+    i = 0
+    while i < len(packed):
+        for j in range(i + 1, len(packed)):
+            a, b = packed[i], packed[j]
+            if (a.get("source"), a.get("page")) != (b.get("source"), b.get("page")):
+                continue
+            combined = _try_merge(a["text"], b["text"])
+            if combined is not None:
+                packed[i] = {**a, "text": combined, "_tokens": count_tokens(combined)}
+                del packed[j]
+                break
+        else:
+            i += 1
+
+    current_span().set(snippets_in=len(snippets), snippets_out=len(packed), tokens_out=sum(p["_tokens"] for p in packed))
+    return [{k: v for k, v in p.items() if k != "_tokens"} for p in packed]
+
@@ -1,5 +1,6 @@
 from __future__ import annotations
 import re
+from typing import Iterable, Iterator
 
 EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
 PHONE_RE = re.compile(r"\b(?:\+?\d{1,3}[-.\s]?)?(?:\d{2,4}[-.\s]?){2,4}\d{2,4}\b")
@@ -25,3 +26,12 @@ def scan_pages_for_pii(pages: list[dict]) -> list[dict]:
         if hits:
             findings.append({"page": page.get("page"), "types": hits})
     return findings
+
+
+def tap_pages_for_pii(pages: Iterable[dict], findings: list[dict]) -> Iterator[dict]:
+    # Pass-through scan for streaming ingest; hits are appended to `findings`.
+    for page in pages:
+        hits = detect_pii(page.get("text", ""))
+        if hits:
+            findings.append({"page": page.get("page"), "types": hits})
+        yield page
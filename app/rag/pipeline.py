@@ -0,0 +1,121 @@
+from __future__ import annotations
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from app.config import get_ingest_workers
+from app.rag.ingest import ProgressFn, iter_pages_parallel
+from app.rag.chunks import iter_chunks
+from app.rag.pii import tap_pages_for_pii
+from app.rag.vectorstore import DEFAULT_EMBED_MODEL, delete_chunks, upsert_chunks
+from app.rag.manifest import IngestManifest, file_sha256
+from app.tracing import span, traced
+
+
+def sync_lexical(collection, manifest: IngestManifest, lexical, batch_size: int = 256) -> int:
+    """
+    Adds the chunks of every manifest source the BM25 index does not cover,
+    reading their text back from the vector store. Returns chunks indexed.
+    """
+    added = 0
+    missing = manifest.lexical_missing(lexical)
+    if not missing:
+        return 0
+    with span("lexical.rebuild", sources=len(missing)) as rebuild_span:
+        for source in missing:
+            chunk_ids = manifest.get(source)["chunk_ids"]
+            for start in range(0, len(chunk_ids), batch_size):
+                stored = collection.get(ids=chunk_ids[start:start + batch_size])
+                lexical.add(stored["ids"], stored["documents"], [m or {} for m in stored["metadatas"]])
+                added += len(stored["ids"])
+            manifest.mark_lexical(source)
+        lexical.persist()
+        manifest.save()
+        rebuild_span.set(chunks=added)
+    return added
+
+
+@traced("ingest")
+def ingest_pdfs(
+    collection,
+    manifest: IngestManifest,
+    files: list[tuple[str, str, str]],
+    chunk_size: int = 1000,
+    overlap: int = 200,
+    embed_model: str = DEFAULT_EMBED_MODEL,
+    workers: int | None = None,
+    progress: ProgressFn | None = None,
+    batch_size: int = 256,
+    course: str = "",
+    tenant: str = "",
+    lexical=None,
+    executor: Executor | None = None,
+) -> list[dict]:
+    """
+    Ingests (pdf_path, source, source_type) triples, skipping any file whose
+    content and settings match the manifest. Chunks left over from a previous
+    version of the same source are deleted before the new ones are upserted.
+
+    Changed files stream through extraction -> PII scan -> splitting ->
+    embedding/upsert as chained generators, so at most a window of page
+    ranges and one upsert batch are held in memory at a time. A BM25Index
+    passed as `lexical` is kept in sync with the vector store, and first
+    back-filled with any recorded source it does not yet cover. Page
+    extraction runs in `executor` when given (callers ingesting file by file
+    pass one pool for all of them), else in a pool opened for this call.
+    """
+    if lexical is not None:
+        # Collections ingested before the BM25 index existed get their postings here.
+        sync_lexical(collection, manifest, lexical, batch_size=batch_size)
+    results: dict[str, dict] = {}
+    pending: list[tuple[str, str, str, dict]] = []
+    for pdf_path, source, source_type in files:
+        fingerprint = IngestManifest.fingerprint(
+            file_sha256(pdf_path), chunk_size, overlap, embed_model, source_type
+        )
+        if manifest.is_current(source, fingerprint):
+            entry = manifest.get(source) or {}
+            results[source] = {
+                "source": source,
+                "skipped": True,
+                "chunks": len(entry.get("chunk_ids", [])),
+                "pii": entry.get("pii", []),
+            }
+        else:
+            pending.append((pdf_path, source, source_type, fingerprint))
+
+    workers = workers or get_ingest_workers()
+    own_pool = executor is None and bool(pending) and workers > 1
+    pool = ProcessPoolExecutor(max_workers=workers) if own_pool else executor
+    try:
+        for pdf_path, source, source_type, fingerprint in pending:
+            previous = manifest.get(source)
+            if previous:
+                delete_chunks(collection, previous.get("chunk_ids", []), lexical=lexical)
+                manifest.forget(source)
+                manifest.save()
+
+            pii_hits: list[dict] = []
+            # Extraction and splitting interleave with the upserts; their time is
+            # what remains of this span after its vector.upsert children.
+            with span("ingest.file", source=source, bytes=os.path.getsize(pdf_path)) as file_span:
+                pages = iter_pages_parallel(pdf_path, workers=workers, progress=progress, executor=pool)
+                chunks = iter_chunks(
+                    tap_pages_for_pii(pages, pii_hits),
+                    source=source,
+                    chunk_size=chunk_size,
+                    overlap=overlap,
+                    source_type=source_type,
+                    course=course,
+                    tenant=tenant,
+                )
+                chunk_ids = upsert_chunks(collection, chunks, batch_size=batch_size, lexical=lexical)
+                file_span.set(chunks=len(chunk_ids))
+
+            manifest.record(source, fingerprint, chunk_ids, pii_hits, lexical=lexical is not None)
+            manifest.save()
+            results[source] = {"source": source, "skipped": False, "chunks": len(chunk_ids), "pii": pii_hits}
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    return [results[source] for _, source, _ in files]
+
@@ -0,0 +1,119 @@
+from __future__ import annotations
+import numpy as np
+
+from app.config import get_question_index_settings
+from app.rag.numpy_index import NumpyIndex, _normalize
+from app.rag.vectorstore import writer_lock
+
+
+class QuestionIndex(NumpyIndex):
+    """
+    Persistent index of issued questions (embedded `question_text`), used to
+    catch near-duplicates within a bank and against past banks.
+
+    Rows are `<bank_id>:<question id>` with course / bank_id metadata.
+    Duplicate detection is batched: the new bank is embedded once, compared
+    with itself by one matrix product, and against history in row blocks of
+    the memory-mapped matrix, so no per-question search loop is needed.
+    """
+
+    def __init__(self, path: str, embedder, threshold: float = 0.9, block: int = 65536):
+        super().__init__(path, embedder)
+        self.threshold = threshold
+        self.block = block
+
+    def embed_questions(self, questions: list[dict]) -> np.ndarray:
+        texts = [q.get("question_text") or "" for q in questions]
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return _normalize(np.asarray(self.embedder.embed_documents(texts), dtype=np.float32))
+
+    def find_duplicates(
+        self,
+        questions: list[dict],
+        course: str | None = None,
+        exclude_bank: str | None = None,
+        threshold: float | None = None,
+    ) -> list[dict]:
+        """
+        Returns one record per flagged question: {id, scope, duplicate_of,
+        similarity, text}. scope is "bank" (a later question repeating an
+        earlier one in the same bank) or "history" (matches a recorded
+        question, optionally limited to `course` and excluding `exclude_bank`).
+        """
+        threshold = self.threshold if threshold is None else threshold
+        if not questions:
+            return []
+        q = self.embed_questions(questions)
+        found: list[dict] = []
+
+        sim = q @ q.T
+        np.fill_diagonal(sim, -1.0)
+        for j in range(1, len(questions)):
+            i = int(np.argmax(sim[:j, j]))
+            if sim[i, j] >= threshold:
+                found.append(
+                    {
+                        "id": questions[j].get("id"),
+                        "scope": "bank",
+                        "duplicate_of": questions[i].get("id"),
+                        "similarity": round(float(sim[i, j]), 3),
+                        "text": questions[i].get("question_text"),
+                    }
+                )
+
+        self._consolidate()
+        if self.ids:
+            where = []
+            if course:
+                where.append({"course": course})
+            if exclude_bank:
+                where.append({"bank_id": {"$ne": exclude_bank}})
+            mask = self._mask({"$and": where} if where else None)
+            best = np.full(len(questions), -np.inf, dtype=np.float32)
+            best_row = np.full(len(questions), -1, dtype=np.int64)
+            for start in range(0, len(self.ids), self.block):
+                scores = np.asarray(self.vectors[start:start + self.block]) @ q.T
+                if mask is not None:
+                    scores[~mask[start:start + self.block]] = -np.inf
+                rows = np.argmax(scores, axis=0)
+                vals = scores[rows, np.arange(len(questions))]
+                better = vals > best
+                best[better] = vals[better]
+                best_row[better] = rows[better] + start
+            for j in np.flatnonzero(best >= threshold):
+                row = int(best_row[j])
+                found.append(
+                    {
+                        "id": questions[j].get("id"),
+                        "scope": "history",
+                        "duplicate_of": self.ids[row],
+                        "similarity": round(float(best[j]), 3),
+                        "text": self.texts[row],
+                    }
+                )
+        return found
+
+    def add_bank(self, bank_id: str, course: str, questions: list[dict]) -> None:
+        """
+        Records a bank as history, replacing any earlier copy of the same bank_id.
+        Sessions and batch jobs each hold their own QuestionIndex, so the write
+        happens under the index's writer lock on a fresh read of the disk.
+        """
+        vectors = self.embed_questions(questions) if questions else None
+        with writer_lock(str(self.path.parent), self.path.name):
+            self.reload()
+            self.delete(where={"bank_id": bank_id})
+            if questions:
+                self.add_vectors(
+                    vectors,
+                    [q.get("question_text") or "" for q in questions],
+                    [{"course": course, "bank_id": bank_id} for _ in questions],
+                    [f"{bank_id}:{q.get('id')}" for q in questions],
+                )
+            self.persist()
+
+
+def get_question_index(embedder) -> QuestionIndex:
+    settings = get_question_index_settings()
+    return QuestionIndex(settings["path"], embedder, threshold=settings["threshold"])
@@ -2,6 +2,8 @@ from __future__ import annotations
 import re
 from typing import List
 
+from app.tracing import traced
+
 def _norm(s: str) -> str:
     return re.sub(r"\s+", " ", (s or "").lower()).strip()
 
@@ -24,24 +26,91 @@ def _build_keywords(query: str) -> List[str]:
     words = [w for w in re.findall(r"[a-zA-Z]{4,}", q)]
     return list(dict.fromkeys(words))[:8]
 
+RRF_K = 60
+
+def _fuse_rrf(docs, metas, dists, lexical_hits, collection) -> list[dict]:
+    """
+    Reciprocal rank fusion of dense and BM25 rankings. Lexical scores come from
+    the precomputed postings, so chunk text is never re-normalized per query;
+    the text of lexical hits is fetched from the vector store in one call.
+    """
+    fused: dict[tuple, dict] = {}
+    for rank, (doc, meta, dist) in enumerate(zip(docs, metas, dists), start=1):
+        meta = meta or {}
+        key = (meta.get("source"), meta.get("page"), doc)
+        fused[key] = {
+            "text": doc,
+            "source": meta.get("source"),
+            "page": meta.get("page"),
+            "source_type": meta.get("source_type", "material"),
+            "distance": float(dist),
+            "kw_score": 0.0,
+            "rrf": 1.0 / (RRF_K + rank),
+        }
+    stored = collection.get(ids=[chunk_id for chunk_id, _ in lexical_hits]) if lexical_hits else {}
+    found = {
+        cid: (text, meta or {})
+        for cid, text, meta in zip(stored.get("ids", []), stored.get("documents", []), stored.get("metadatas", []))
+    }
+    rank = 0
+    for chunk_id, bm25 in lexical_hits:
+        if chunk_id not in found:
+            # Postings for a chunk the vector store no longer has; skip rather than fuse an empty text.
+            continue
+        rank += 1
+        text, meta = found[chunk_id]
+        key = (meta.get("source"), meta.get("page"), text)
+        cand = fused.setdefault(key, {
+            "text": text,
+            "source": meta.get("source"),
+            "page": meta.get("page"),
+            "source_type": meta.get("source_type", "material"),
+            "distance": None,
+            "kw_score": 0.0,
+            "rrf": 0.0,
+        })
+        cand["kw_score"] = float(bm25)
+        cand["rrf"] += 1.0 / (RRF_K + rank)
+    return sorted(fused.values(), key=lambda c: -c["rrf"])
+
+def _merge_where(a: dict | None, b: dict | None) -> dict | None:
+    if a and b:
+        return {"$and": [a, b]}
+    return a or b
+
+@traced("retrieve")
 def retrieve_top_k_strict(
     collection,
     query: str,
     k: int = 5,
     allowed_source_types: list[str] | None = None,
+    where: dict | None = None,
+    fetch_k: int | None = None,
+    lexical_index=None,
 ):
-    results = collection.similarity_search_with_score(query, k=max(25, k * 6))
+    # Source-type / course / tenant / source filters are pushed into the index
+    # query, so candidates are only over-fetched for the keyword re-rank below.
+    where = _merge_where(
+        {"source_type": {"$in": list(allowed_source_types)}} if allowed_source_types else None,
+        where,
+    )
+    fetch_k = fetch_k or max(k * 2, k + 8)
+    if where:
+        results = collection.similarity_search_with_score(query, k=fetch_k, filter=where)
+    else:
+        results = collection.similarity_search_with_score(query, k=fetch_k)
     docs = [r[0].page_content for r in results]
     metas = [r[0].metadata for r in results]
     dists = [float(r[1]) for r in results]
 
+    if lexical_index is not None:
+        return _fuse_rrf(docs, metas, dists, lexical_index.search(query, k=fetch_k, where=where), collection)[:k]
+
     keywords = _build_keywords(query)
 
     candidates = []
     for doc, meta, dist in zip(docs, metas, dists):
         source_type = (meta or {}).get("source_type", "material")
-        if allowed_source_types and source_type not in allowed_source_types:
-            continue
         score = _keyword_score(doc, keywords)
         candidates.append({
             "text": doc,
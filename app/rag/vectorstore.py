@@ -1,32 +1,152 @@
 from __future__ import annotations
+import hashlib
+import re
+import threading
+from itertools import islice
 from pathlib import Path
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
+from typing import Iterable, Protocol
+from app.config import get_ann_params, get_vector_backend
+from app.rag.ann import IVFIndex
+from app.rag.embeddings import EmbeddingService, get_embedding_service
+from app.rag.numpy_index import NumpyIndex
+from app.tracing import span
 
 DEFAULT_EMBED_MODEL = "all-MiniLM-L6-v2"
 
-def get_embedder(model_name: str = DEFAULT_EMBED_MODEL) -> SentenceTransformerEmbeddings:
-    return SentenceTransformerEmbeddings(model_name=model_name)
+def get_embedder(model_name: str = DEFAULT_EMBED_MODEL, batch_size: int | None = None) -> EmbeddingService:
+    # Shared per process: the model loads once and vectors are cached on disk.
+    return get_embedding_service(model_name, batch_size=batch_size)
 
 def get_client(persist_dir: str = "data/vector_db") -> str:
     Path(persist_dir).mkdir(parents=True, exist_ok=True)
     return persist_dir
 
-def get_collection(persist_dir: str, name: str, embedder: SentenceTransformerEmbeddings):
+_WRITER_LOCKS: dict[tuple[str, str], threading.Lock] = {}
+_WRITER_LOCKS_GUARD = threading.Lock()
+
+def writer_lock(persist_dir: str, name: str) -> threading.Lock:
+    """
+    Process-wide lock for writing to one collection. Every writer (ingest
+    queue, batch jobs) opens the collection, its BM25 index and manifest
+    while holding it, so each starts from what the previous one persisted.
+    """
+    key = (str(Path(persist_dir).resolve()), name)
+    with _WRITER_LOCKS_GUARD:
+        return _WRITER_LOCKS.setdefault(key, threading.Lock())
+
+class VectorBackend(Protocol):
+    """
+    Surface shared by the Chroma wrapper and NumpyIndex. Anything passed as
+    `collection` to upsert_chunks / retrieve_top_k_strict must provide it.
+    """
+
+    def add_texts(self, texts: list[str], metadatas: list[dict] | None = None, ids: list[str] | None = None): ...
+
+    def delete(self, ids: list[str] | None = None): ...
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: dict | None = None): ...
+
+    def get(self, ids: list[str] | None = None) -> dict: ...
+
+    def persist(self) -> None: ...
+
+def get_collection(
+    persist_dir: str,
+    name: str,
+    embedder: EmbeddingService,
+    backend: str | None = None,
+) -> VectorBackend:
+    backend = backend or get_vector_backend()
+    if backend == "numpy":
+        return NumpyIndex(str(Path(persist_dir) / f"{name}.npindex"), embedder)
+    if backend == "ivf":
+        return IVFIndex(str(Path(persist_dir) / f"{name}.ivf"), embedder, **get_ann_params())
+    if backend != "chroma":
+        raise ValueError(f"Unknown vector backend: {backend}")
+    # langchain_community (and chromadb behind it) only load when the Chroma backend is used.
+    from langchain_community.vectorstores import Chroma
+
     return Chroma(
         collection_name=name,
         embedding_function=embedder,
         persist_directory=persist_dir,
     )
 
-def upsert_chunks(collection, chunks, batch_size: int = 64):
-    texts = [c.text for c in chunks]
-    metas = [{"source": c.source, "page": c.page, "source_type": c.source_type} for c in chunks]
-    ids = [c.chunk_id for c in chunks]
-
-    for i in range(0, len(chunks), batch_size):
-        b_texts = texts[i:i+batch_size]
-        b_metas = metas[i:i+batch_size]
-        b_ids = ids[i:i+batch_size]
-        collection.add_texts(texts=b_texts, metadatas=b_metas, ids=b_ids)
-    collection.persist()
+def collection_name_for(base: str, course: str | None = None, tenant: str | None = None) -> str:
+    """
+    Per-tenant / per-course partition name, e.g. course_material__acme__signals-and-systems.
+    Kept within Chroma's naming rules (3-63 chars of [a-zA-Z0-9._-]).
+    """
+    parts = [base] + [p for p in (tenant, course) if p]
+    slug = "__".join(re.sub(r"[^a-z0-9._-]+", "-", p.strip().lower()).strip("-._") or "x" for p in parts)
+    if len(slug) > 63:
+        digest = hashlib.sha1(slug.encode("utf-8")).hexdigest()[:10]
+        slug = slug[:52].rstrip("-._") + "-" + digest
+    return slug
+
+def build_where(
+    source_types: list[str] | None = None,
+    course: str | None = None,
+    tenant: str | None = None,
+    sources: list[str] | None = None,
+) -> dict | None:
+    """
+    Metadata filter in Chroma's `where` syntax; NumpyIndex understands the same
+    subset, so the filter is applied inside the index query on every backend.
+    """
+    clauses: list[dict] = []
+    if source_types:
+        clauses.append({"source_type": {"$in": list(source_types)}})
+    if course:
+        clauses.append({"course": course})
+    if tenant:
+        clauses.append({"tenant": tenant})
+    if sources:
+        clauses.append({"source": {"$in": list(sources)}})
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+def chunk_metadata(chunk) -> dict:
+    meta = {"source": chunk.source, "page": chunk.page, "source_type": chunk.source_type}
+    if getattr(chunk, "course", ""):
+        meta["course"] = chunk.course
+    if getattr(chunk, "tenant", ""):
+        meta["tenant"] = chunk.tenant
+    return meta
+
+def upsert_chunks(collection, chunks: Iterable, batch_size: int = 256, lexical=None) -> list[str]:
+    """
+    Upserts chunks in batches. Accepts any iterable, so a streaming producer
+    is consumed one batch at a time and never materialised in full. When a
+    BM25Index is given it is updated with the same batches.
+    """
+    ids: list[str] = []
+    it = iter(chunks)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            break
+        b_ids = [c.chunk_id for c in batch]
+        b_texts = [c.text for c in batch]
+        b_metas = [chunk_metadata(c) for c in batch]
+        with span("vector.upsert", chunks=len(batch), bytes=sum(len(t.encode("utf-8")) for t in b_texts)):
+            collection.add_texts(texts=b_texts, metadatas=b_metas, ids=b_ids)
+            if lexical is not None:
+                lexical.add(b_ids, b_texts, b_metas)
+        ids.extend(b_ids)
+    with span("vector.persist"):
+        collection.persist()
+        if lexical is not None:
+            lexical.persist()
+    return ids
+
+def delete_chunks(collection, ids: list[str], lexical=None):
+    if ids:
+        collection.delete(ids=ids)
+        collection.persist()
+        if lexical is not None:
+            lexical.delete(ids)
+            lexical.persist()
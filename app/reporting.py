@@ -2,14 +2,23 @@ from __future__ import annotations
 from collections import Counter
 
 
-def compute_coverage_report(questions: list[dict]) -> dict:
+def compute_coverage_report(questions: list[dict], duplicates: list[dict] | None = None) -> dict:
     co_counts = Counter([q.get("co_mapping") for q in questions])
     bloom_counts = Counter([q.get("bloom_level") for q in questions])
     difficulty_counts = Counter([q.get("difficulty") for q in questions])
 
-    return {
+    report = {
         "co_distribution": dict(co_counts),
         "bloom_distribution": dict(bloom_counts),
         "difficulty_distribution": dict(difficulty_counts),
         "total_questions": len(questions),
     }
+    if duplicates is not None:
+        # From QuestionIndex.find_duplicates.
+        scopes = Counter(d.get("scope") for d in duplicates)
+        report["near_duplicates"] = {
+            "within_bank": scopes.get("bank", 0),
+            "historical": scopes.get("history", 0),
+            "matches": duplicates,
+        }
+    return report
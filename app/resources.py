@@ -0,0 +1,247 @@
+from __future__ import annotations
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.agents.auditor import AuditorAgent
+from app.agents.generator import GeneratorAgent
+from app.config import get_resource_settings
+from app.rag.embeddings import EmbeddingService
+from app.rag.lexical import BM25Index, lexical_path
+from app.rag.vectorstore import DEFAULT_EMBED_MODEL, VectorBackend, get_collection, get_embedder
+from app.tracing import span
+
+
+def rss_mb() -> float | None:
+    # Current resident set size from /proc (Linux); None where unavailable.
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class _Entry:
+    __slots__ = ("collection", "lexical", "last_used", "lock")
+
+    def __init__(self):
+        self.collection: VectorBackend | None = None
+        self.lexical: BM25Index | None = None
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class ResourceManager:
+    """
+    Owns the heavyweight objects every session needs: the embedding model,
+    opened vector collections with their BM25 indexes, and the generator /
+    auditor agents. Each is built once per process and shared by all
+    sessions and threads.
+
+    Collections handed out here are for reading. Writers (the ingest queue,
+    batch jobs) open their own under vectorstore.writer_lock and call
+    invalidate() after committing, so the next reader reopens from disk;
+    callers should fetch collection() / lexical() when they need them rather
+    than keep the objects. Collections unused for `idle_s`, past
+    `max_collections`, or while RSS is over `memory_mb` are released
+    least-recently-used first.
+    """
+
+    def __init__(self, idle_s: float = 900, max_collections: int = 16, memory_mb: float = 0):
+        self.idle_s = idle_s
+        self.max_collections = max_collections
+        self.memory_mb = memory_mb
+        self._lock = threading.Lock()
+        self._collections: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._agents: dict[tuple, GeneratorAgent | AuditorAgent] = {}
+        self._warm_thread: threading.Thread | None = None
+        self.opened = 0
+        self.reused = 0
+        self.released = 0
+
+    # ---- embedder / agents ----
+    def embedder(self, model_name: str = DEFAULT_EMBED_MODEL) -> EmbeddingService:
+        return get_embedder(model_name)
+
+    def generator(self, model: str = "gpt-4o-mini") -> GeneratorAgent:
+        return self._agent(GeneratorAgent, model)
+
+    def auditor(self, model: str = "gpt-4o-mini") -> AuditorAgent:
+        return self._agent(AuditorAgent, model)
+
+    def _agent(self, cls, model: str):
+        # Agents hold only their (shared) client and config, so one per model serves every session.
+        key = (cls.__name__, model)
+        with self._lock:
+            agent = self._agents.get(key)
+        if agent is None:
+            # Built outside the lock so building a chat client does not stall every other lookup;
+            # if two callers race, the first one stored wins.
+            built = cls(model=model)
+            with self._lock:
+                agent = self._agents.setdefault(key, built)
+        return agent
+
+    def _count(self, opened: bool) -> None:
+        with self._lock:
+            if opened:
+                self.opened += 1
+            else:
+                self.reused += 1
+
+    # ---- collections ----
+    def _entry(self, persist_dir: str, name: str, backend: str | None) -> _Entry:
+        key = (persist_dir, name, backend)
+        with self._lock:
+            entry = self._collections.get(key)
+            if entry is None:
+                entry = self._collections[key] = _Entry()
+            self._collections.move_to_end(key)
+            entry.last_used = time.monotonic()
+        return entry
+
+    def collection(
+        self,
+        persist_dir: str,
+        name: str,
+        backend: str | None = None,
+        embed_model: str = DEFAULT_EMBED_MODEL,
+    ) -> VectorBackend:
+        entry = self._entry(persist_dir, name, backend)
+        # Per-entry lock: concurrent first requests open the collection once, other collections are not blocked.
+        with entry.lock:
+            opened = entry.collection is None
+            if opened:
+                with span("resources.open_collection", collection=name):
+                    entry.collection = get_collection(persist_dir, name, self.embedder(embed_model), backend=backend)
+            collection = entry.collection
+        self._count(opened)
+        self.sweep()
+        return collection
+
+    def lexical(self, persist_dir: str, name: str, backend: str | None = None) -> BM25Index:
+        entry = self._entry(persist_dir, name, backend)
+        with entry.lock:
+            opened = entry.lexical is None
+            if opened:
+                with span("resources.open_lexical", collection=name):
+                    entry.lexical = BM25Index(lexical_path(persist_dir, name))
+            lexical = entry.lexical
+        self._count(opened)
+        self.sweep()
+        return lexical
+
+    def invalidate(self, persist_dir: str, name: str) -> None:
+        """
+        Drops the cached collection and BM25 index so the next collection() /
+        lexical() call reopens them from disk. Objects already handed out are
+        not updated: readers keep a consistent snapshot and must fetch again
+        (per query or per generation run, not once per session) to see the
+        writer's changes.
+        """
+        with self._lock:
+            for key in [k for k in self._collections if k[0] == persist_dir and k[1] == name]:
+                del self._collections[key]
+
+    def sweep(self, now: float | None = None) -> list[str]:
+        """
+        Releases idle collections, then the least recently used ones while
+        over `max_collections` or the memory limit. Returns released names.
+        """
+        now = time.monotonic() if now is None else now
+        released = []
+        with self._lock:
+            for key in [k for k, e in self._collections.items() if now - e.last_used > self.idle_s]:
+                del self._collections[key]
+                released.append(key[1])
+            while len(self._collections) > self.max_collections:
+                key, _ = self._collections.popitem(last=False)
+                released.append(key[1])
+            if self.memory_mb and self._collections:
+                rss = rss_mb()
+                # Keep the most recent collection: it is the one being asked for.
+                while rss is not None and rss > self.memory_mb and len(self._collections) > 1:
+                    key, _ = self._collections.popitem(last=False)
+                    released.append(key[1])
+                    gc.collect()
+                    rss = rss_mb()
+            self.released += len(released)
+        return released
+
+    # ---- lifecycle ----
+    def warm_up(
+        self,
+        persist_dir: str | None = None,
+        collections: list[str] | None = None,
+        models: list[str] | None = None,
+        background: bool = False,
+    ) -> dict | None:
+        """
+        Loads the embedding model (one encode, so the weights are resident),
+        builds the agents for `models` and opens `collections`. With
+        `background=True` this runs once per process on a daemon thread.
+        Returns per-step seconds when run in the foreground.
+        """
+        if background:
+            with self._lock:
+                if self._warm_thread is None:
+                    self._warm_thread = threading.Thread(
+                        target=self.warm_up,
+                        args=(persist_dir, collections, models),
+                        name="resources-warm-up",
+                        daemon=True,
+                    )
+                    self._warm_thread.start()
+            return None
+
+        timings: dict[str, float] = {}
+        t = time.perf_counter()
+        self.embedder().embed_query("warm-up")
+        timings["embedder"] = round(time.perf_counter() - t, 3)
+        for model in models or []:
+            t = time.perf_counter()
+            self.generator(model)
+            self.auditor(model)
+            timings[f"agents:{model}"] = round(time.perf_counter() - t, 3)
+        for name in collections or []:
+            t = time.perf_counter()
+            self.collection(persist_dir, name)
+            self.lexical(persist_dir, name)
+            timings[f"collection:{name}"] = round(time.perf_counter() - t, 3)
+        return timings
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "collections": [key[1] for key in self._collections],
+                "agents": [f"{kind}:{model}" for kind, model in self._agents],
+                "opened": self.opened,
+                "reused": self.reused,
+                "released": self.released,
+                "rss_mb": rss_mb(),
+            }
+
+
+_RESOURCES: ResourceManager | None = None
+_RESOURCES_LOCK = threading.Lock()
+
+
+def get_resources() -> ResourceManager:
+    """
+    Process-wide resource manager configured from the environment (see
+    config.get_resource_settings).
+    """
+    global _RESOURCES
+    with _RESOURCES_LOCK:
+        if _RESOURCES is None:
+            _RESOURCES = ResourceManager(**get_resource_settings())
+        return _RESOURCES
+
+
+def set_resources(resources: ResourceManager | None) -> None:
+    global _RESOURCES
+    with _RESOURCES_LOCK:
+        _RESOURCES = resources
@@ -0,0 +1,292 @@
+from __future__ import annotations
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+
+class Span:
+    """
+    One timed stage. Wall and CPU time (of the thread that opened it) are
+    filled in on exit; `attrs` carries counts such as tokens_in, tokens_out
+    and bytes, set with set() / add() while the span is open.
+    """
+
+    __slots__ = (
+        "name", "span_id", "parent_id", "start_ns", "end_ns", "wall_ms", "cpu_ms", "thread", "attrs", "_cpu0", "_parent"
+    )
+
+    def __init__(self, name: str, parent_id: str | None, attrs: dict):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: int | None = None
+        self.wall_ms = 0.0
+        self.cpu_ms = 0.0
+        self.thread = threading.current_thread().name
+        self.attrs = dict(attrs)
+        self._cpu0 = time.thread_time()
+        self._parent: Span | None = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def add(self, **counts) -> None:
+        for key, value in counts.items():
+            self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def _finish(self) -> None:
+        self.end_ns = time.time_ns()
+        self.wall_ms = (self.end_ns - self.start_ns) / 1e6
+        self.cpu_ms = (time.thread_time() - self._cpu0) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "wall_ms": round(self.wall_ms, 3),
+            "cpu_ms": round(self.cpu_ms, 3),
+            "thread": self.thread,
+            "attrs": self.attrs,
+        }
+
+
+class _NoSpan:
+    # Returned outside a trace so instrumented code never has to check.
+    def set(self, **attrs) -> None:
+        pass
+
+    def add(self, **counts) -> None:
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Trace:
+    """
+    All spans of one run (a UI click, a batch job). Thread-safe; spans from
+    worker threads join it when the work is submitted through bind().
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def to_records(self) -> list[dict]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_ns)
+        return [{"trace_id": self.trace_id, "trace": self.name, **s.to_dict()} for s in spans]
+
+    def write_jsonl(self, path: str) -> str:
+        """
+        Appends one JSON object per span to `path`.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for record in self.to_records():
+                f.write(json.dumps(record, default=str) + "\n")
+        return path
+
+    def to_otlp(self, service: str = "outcome-qbank") -> dict:
+        """
+        OTLP/JSON (ExportTraceServiceRequest) payload, accepted by an
+        OpenTelemetry collector's /v1/traces endpoint.
+        """
+
+        def value(v):
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            return {"stringValue": str(v)}
+
+        spans = []
+        for r in self.to_records():
+            attrs = {**r["attrs"], "cpu_ms": r["cpu_ms"], "thread": r["thread"]}
+            spans.append(
+                {
+                    "traceId": self.trace_id,
+                    "spanId": r["span_id"],
+                    "parentSpanId": r["parent_id"] or "",
+                    "name": r["name"],
+                    "kind": 1,
+                    "startTimeUnixNano": str(r["start_ns"]),
+                    "endTimeUnixNano": str(r["end_ns"] or r["start_ns"]),
+                    "attributes": [{"key": k, "value": value(v)} for k, v in attrs.items()],
+                }
+            )
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+                    "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+                }
+            ]
+        }
+
+    def waterfall(self) -> list[dict]:
+        """
+        Spans in start order with depth and offset from the first span, for
+        rendering as a timing waterfall.
+        """
+        records = self.to_records()
+        if not records:
+            return []
+        t0 = records[0]["start_ns"]
+        depth: dict[str, int] = {}
+        rows = []
+        for r in records:
+            d = depth.get(r["parent_id"], -1) + 1 if r["parent_id"] else 0
+            depth[r["span_id"]] = d
+            rows.append(
+                {
+                    "name": r["name"],
+                    "depth": d,
+                    "offset_ms": round((r["start_ns"] - t0) / 1e6, 1),
+                    "wall_ms": round(r["wall_ms"], 1),
+                    "cpu_ms": round(r["cpu_ms"], 1),
+                    "attrs": r["attrs"],
+                }
+            )
+        return rows
+
+    def totals(self) -> dict[str, dict]:
+        # Wall/CPU time and counters summed per span name.
+        out: dict[str, dict] = {}
+        for r in self.to_records():
+            agg = out.setdefault(r["name"], {"count": 0, "wall_ms": 0.0, "cpu_ms": 0.0})
+            agg["count"] += 1
+            agg["wall_ms"] = round(agg["wall_ms"] + r["wall_ms"], 3)
+            agg["cpu_ms"] = round(agg["cpu_ms"] + r["cpu_ms"], 3)
+            for key in ("tokens_in", "tokens_out", "bytes"):
+                if isinstance(r["attrs"].get(key), (int, float)):
+                    agg[key] = agg.get(key, 0) + r["attrs"][key]
+        return out
+
+
+_TRACE: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("trace", default=None)
+_SPAN: contextvars.ContextVar[Span | None] = contextvars.ContextVar("span", default=None)
+
+
+@contextmanager
+def trace(name: str) -> Iterator[Trace]:
+    """
+    Starts collecting spans for a run. Spans opened outside any trace are no-ops.
+    """
+    run = Trace(name)
+    token = _TRACE.set(run)
+    span_token = _SPAN.set(None)
+    try:
+        with span(name):
+            yield run
+    finally:
+        _SPAN.reset(span_token)
+        _TRACE.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Span | _NoSpan]:
+    run = _TRACE.get()
+    if run is None:
+        yield NO_SPAN
+        return
+    parent = _SPAN.get()
+    current = Span(name, parent.span_id if parent else None, attrs)
+    current._parent = parent
+    token = _SPAN.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.set(error=type(exc).__name__)
+        raise
+    finally:
+        current._finish()
+        run._record(current)
+        try:
+            _SPAN.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. a generator finished by its consumer).
+            _SPAN.set(parent)
+
+
+def current_span() -> Span | _NoSpan:
+    return _SPAN.get() or NO_SPAN
+
+
+@contextmanager
+def suspended() -> Iterator[None]:
+    """
+    Wraps a `yield` made inside a span: generators share their consumer's
+    context, so the span stops being current while the consumer runs and is
+    current again when the generator resumes. Without it, spans the consumer
+    opens between items would nest under the producer's span.
+    """
+    current = _SPAN.get()
+    if current is None:
+        yield
+        return
+    _SPAN.set(current._parent)
+    try:
+        yield
+    finally:
+        _SPAN.set(current)
+
+
+def traced(name: str | None = None) -> Callable:
+    """
+    Decorator form of span() for plain and async functions.
+    """
+
+    def decorate(fn: Callable) -> Callable:
+        label = name or f"{fn.__module__.split('.')[-1]}.{fn.__name__}"
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(label):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def bind(fn: Callable) -> Callable:
+    """
+    Binds fn to the current trace/span so a worker thread records into it:
+    pool.submit(bind(fn), ...).
+    """
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return wrapper
+
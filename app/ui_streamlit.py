@@ -1,5 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from queue import Empty, Queue
 import sys
+import uuid
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
@@ -7,15 +10,21 @@ if str(ROOT) not in sys.path:
 
 import streamlit as st
 
-from app.rag.ingest import save_uploaded_pdf, extract_pages_from_pdf
-from app.rag.chunks import chunk_pages
-from app.rag.vectorstore import get_client, get_collection, get_embedder, upsert_chunks
+from app.rag.ingest import save_uploaded_pdf
+from app.rag.ingest_jobs import ACTIVE, get_ingest_queue, is_ready
+from app.rag.vectorstore import build_where, collection_name_for, get_client
 from app.rag.retrieve import retrieve_top_k_strict
-from app.rag.pii import scan_pages_for_pii
+from app.rag.packing import pack_context
+from app.rag.question_index import get_question_index
 
+from app.config import get_ingest_job_settings, get_trace_dir
+from app.resources import get_resources
+from app.tracing import bind, span, trace
+from app.agents.dispatch import PRIORITY_INTERACTIVE, get_dispatcher, llm_priority
 from app.agents.generator import GeneratorAgent
 from app.agents.loop import run_generation_loop
 from app.reporting import compute_coverage_report
+from app.schemas import QuestionBank
 from app.export import questions_to_csv_bytes, questions_to_pdf_bytes
 
 st.set_page_config(page_title="Outcome-QBank", layout="wide")
@@ -78,11 +87,16 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+# Embedder, collections and agents are shared by every session in this process;
+# the first session to start the server loads the embedding model in the background.
+resources = get_resources()
+resources.warm_up(models=["gpt-4o-mini"], background=True)
+
 # -------- State --------
-st.session_state.setdefault("ingested", False)
 st.session_state.setdefault("syllabus_snippets", [])
 st.session_state.setdefault("planned", None)
 st.session_state.setdefault("ctx", [])
+st.session_state.setdefault("ctx_count", 0)
 st.session_state.setdefault("subject_profile", None)
 st.session_state.setdefault("mix", {"theory": 35, "numerical": 30, "derivation": 15, "equation": 10, "diagram": 10})
 st.session_state.setdefault("logs", [])
@@ -91,6 +105,8 @@ st.session_state.setdefault("last_qb", None)
 st.session_state.setdefault("coverage_report", None)
 st.session_state.setdefault("last_upload_sig", None)
 st.session_state.setdefault("last_run_sig", None)
+# The ingest job id also lives in the URL, so a reloaded page picks the job back up.
+st.session_state.setdefault("ingest_job", st.query_params.get("ingest"))
 
 # -------- Minimal settings --------
 collection_name = "course_material"
@@ -99,6 +115,9 @@ overlap = 200
 top_k = 4
 min_importance = 1
 max_total_ctx = 40
+ctx_token_budget = 6000
+shard_size = 10
+gen_concurrency = 4
 include_sample_papers = True
 bloom_focus = "Mixed"
 
@@ -133,6 +152,17 @@ with col_c:
     )
     st.caption("Used for style only. Never copied.")
 
+
+def _record_bank() -> None:
+    # Downloaded banks become history for near-duplicate detection in later runs.
+    qb_state = st.session_state.get("last_qb")
+    if qb_state and st.session_state.get("bank_id"):
+        # Keyed on the course the bank was requested for (as find_duplicates is), not the model's spelling of it.
+        get_question_index(resources.embedder()).add_bank(
+            st.session_state.bank_id, st.session_state.get("bank_course") or "Course", qb_state.get("questions", [])
+        )
+
+
 st.subheader("Scope")
 course_name = st.text_input("Course name", value="", placeholder="e.g., Signals and Systems")
 topic = st.text_input("Topic", value="", placeholder="e.g., Fourier series")
@@ -142,8 +172,6 @@ num_q = st.slider("Total questions", 5, 100, 20)
 marks_each = st.selectbox("Marks per question", [2, 5, 10], index=0)
 difficulty_mix = st.selectbox("Difficulty level", ["Easy", "Medium", "Hard"], index=1)
 
-generate_clicked = st.button("Generate Questions")
-
 
 def _upload_signature(files: list) -> tuple:
     sig = []
@@ -152,206 +180,300 @@ def _upload_signature(files: list) -> tuple:
     return tuple(sig)
 
 
-if generate_clicked:
-    if not outcomes_files and not material_files:
-        st.error("Please upload course outcomes and/or course materials.")
+# -------- Background ingest --------
+# Uploads are queued for ingest as soon as they change; the script never waits on it.
+ingest_queue = get_ingest_queue()
+min_ready_chunks = get_ingest_job_settings()["min_chunks"]
+persist_dir = get_client("data/vector_db")
+# One partition per course keeps search cost proportional to that course.
+course_collection = collection_name_for(collection_name, course=course_name)
+upload_sig = _upload_signature(outcomes_files) + _upload_signature(material_files) + _upload_signature(sample_files)
+if upload_sig and st.session_state.last_upload_sig != (course_collection, upload_sig):
+    uploads = []
+    for files, source_type in (
+        (outcomes_files, "outcomes"),
+        (material_files, "material"),
+        (sample_files, "sample_paper"),
+    ):
+        for uf in files or []:
+            pdf_path = save_uploaded_pdf(uf, save_dir="data/uploads")
+            uploads.append((pdf_path, uf.name, source_type))
+    job_id = ingest_queue.submit(
+        persist_dir, course_collection, uploads, course=course_name, chunk_size=chunk_size, overlap=overlap
+    )
+    previous_job = st.session_state.ingest_job
+    if previous_job and previous_job != job_id:
+        ingest_queue.cancel(previous_job)
+    st.session_state.ingest_job = job_id
+    st.session_state.last_upload_sig = (course_collection, upload_sig)
+    st.query_params["ingest"] = job_id
+
+ingest_job = ingest_queue.get(st.session_state.ingest_job) if st.session_state.ingest_job else None
+ingest_ready = is_ready(ingest_job, min_ready_chunks)
+st.session_state.ingest_seen = (ingest_job["status"] if ingest_job else None, ingest_ready)
+
+
+@st.fragment(run_every=1.0 if ingest_job and ingest_job["status"] in ACTIVE else None)
+def _ingest_status() -> None:
+    job = ingest_queue.get(st.session_state.ingest_job) if st.session_state.ingest_job else None
+    if job is None:
+        return
+    ready = is_ready(job, min_ready_chunks)
+    if (job["status"], ready) != st.session_state.ingest_seen:
+        # Status changed since the page was drawn: rerun the app to enable generation.
+        st.rerun()
+    if job["status"] in ACTIVE:
+        frac = job["pages_done"] / max(1, job["pages_total"])
+        current = next((f for f in job["files"] if f["status"] == "running"), None)
+        text = f"Indexing {current['source']}: page {current['pages_done']}/{current['pages_total']}" if current else "Queued..."
+        st.progress(min(1.0, frac), text=f"{text} (chunks indexed: {job['chunks']})")
+        if ready:
+            st.caption("Enough material is indexed to generate; the rest keeps indexing in the background.")
+    elif job["status"] == "done":
+        skipped = sum(1 for f in job["files"] if f["skipped"])
+        st.success(f"Ingested OK. chunks={job['chunks']} unchanged_files={skipped}")
     else:
-        upload_sig = (
-            _upload_signature(outcomes_files)
-            + _upload_signature(material_files)
-            + _upload_signature(sample_files)
+        st.warning(f"Ingest {job['status']}. {job['error'] or ''} chunks={job['chunks']}")
+
+
+_ingest_status()
+
+generate_clicked = st.button("Generate Questions", disabled=not ingest_ready)
+
+
+def _waterfall_html(rows: list[dict]) -> str:
+    if not rows:
+        return "No spans recorded."
+    total = max(r["offset_ms"] + r["wall_ms"] for r in rows) or 1.0
+    out = []
+    for r in rows:
+        left = 100.0 * r["offset_ms"] / total
+        width = max(0.4, 100.0 * r["wall_ms"] / total)
+        extras = " ".join(
+            f"{k}={r['attrs'][k]}" for k in ("tokens_in", "tokens_out", "bytes", "cached") if k in r["attrs"]
         )
-        run_sig = (upload_sig, course_name, topic, num_q, marks_each, difficulty_mix)
-
-        with st.spinner("Preparing content..."):
-            client = get_client("data/vector_db")
-            embedder = get_embedder()
-            collection = get_collection(client, collection_name, embedder)
-
-            if (not st.session_state.ingested) or (st.session_state.last_upload_sig != upload_sig):
-                pii_report = []
-                total_chunks = 0
-
-                for of in outcomes_files or []:
-                    pdf_path = save_uploaded_pdf(of, save_dir="data/uploads")
-                    pages = extract_pages_from_pdf(pdf_path)
-                    pii_hits = scan_pages_for_pii(pages)
-                    if pii_hits:
-                        pii_report.append({"file": of.name, "findings": pii_hits})
-
-                    chunks = chunk_pages(
-                        pages,
-                        source=of.name,
-                        chunk_size=chunk_size,
-                        overlap=overlap,
-                        source_type="outcomes",
-                    )
-                    total_chunks += len(chunks)
-                    upsert_chunks(collection, chunks)
-
-                for mf in material_files or []:
-                    pdf_path = save_uploaded_pdf(mf, save_dir="data/uploads")
-                    pages = extract_pages_from_pdf(pdf_path)
-                    pii_hits = scan_pages_for_pii(pages)
-                    if pii_hits:
-                        pii_report.append({"file": mf.name, "findings": pii_hits})
-
-                    chunks = chunk_pages(
-                        pages,
-                        source=mf.name,
-                        chunk_size=chunk_size,
-                        overlap=overlap,
-                        source_type="material",
-                    )
-                    total_chunks += len(chunks)
-                    upsert_chunks(collection, chunks)
-
-                for sf in sample_files or []:
-                    pdf_path = save_uploaded_pdf(sf, save_dir="data/uploads")
-                    pages = extract_pages_from_pdf(pdf_path)
-                    pii_hits = scan_pages_for_pii(pages)
-                    if pii_hits:
-                        pii_report.append({"file": sf.name, "findings": pii_hits})
-
-                    chunks = chunk_pages(
-                        pages,
-                        source=sf.name,
-                        chunk_size=chunk_size,
-                        overlap=overlap,
-                        source_type="sample_paper",
-                    )
-                    total_chunks += len(chunks)
-                    upsert_chunks(collection, chunks)
-
-                if pii_report and not pii_consent:
-                    st.error("PII detected in uploads. Please confirm consent to proceed.")
-                    st.stop()
-                if pii_report and pii_consent:
-                    st.warning("PII detected in uploads. Proceeding with consent.")
-
-                st.session_state.ingested = True
-                st.session_state.last_upload_sig = upload_sig
-                st.success(f"Ingested OK. chunks={total_chunks}")
-
-            if st.session_state.last_run_sig != run_sig:
-                # Fast mode: skip subject detection + planning. Retrieve directly by topic/course.
-                query = topic or course_name or "Course content"
-                allowed_types = ["material", "outcomes"]
-                if include_sample_papers:
-                    allowed_types.append("sample_paper")
-                all_ctx = retrieve_top_k_strict(
-                    collection,
-                    query,
-                    k=max_total_ctx,
-                    allowed_source_types=allowed_types,
-                )
-                st.session_state.ctx = all_ctx[:max_total_ctx]
-                st.session_state.subject_profile = None
-                st.session_state.last_run_sig = run_sig
-            else:
-                query = topic or course_name or "Course content"
+        out.append(
+            f'<div style="display:flex;align-items:center;font-size:12px;color:var(--ink-2);">'
+            f'<div style="width:38%;padding-left:{r["depth"] * 12}px;white-space:nowrap;overflow:hidden;">'
+            f'{r["name"]} &middot; {r["wall_ms"]:.0f} ms (cpu {r["cpu_ms"]:.0f}) {extras}</div>'
+            f'<div style="flex:1;position:relative;height:10px;background:var(--panel-2);">'
+            f'<div style="position:absolute;left:{left:.2f}%;width:{width:.2f}%;height:10px;background:#4c7dd8;"></div>'
+            f"</div></div>"
+        )
+    return "".join(out)
+
 
-        if not st.session_state.ctx:
-            st.warning("No usable context found. Upload more materials.")
+if generate_clicked:
+    # Every stage below records a span; the run's waterfall is shown with the results.
+    with trace("generate_questions") as run_trace:
+        job = ingest_queue.get(st.session_state.ingest_job) if st.session_state.ingest_job else None
+        if not is_ready(job, min_ready_chunks):
+            st.error("Please upload course outcomes and/or course materials.")
+        elif job["pii"] and not pii_consent:
+            st.error("PII detected in uploads. Please confirm consent to proceed.")
         else:
-            difficulty_distribution_map = {
-                "Easy": {"Easy": 100, "Medium": 0, "Hard": 0},
-                "Medium": {"Easy": 0, "Medium": 100, "Hard": 0},
-                "Hard": {"Easy": 0, "Medium": 0, "Hard": 100},
-            }
-            targets = {
-                "topic": topic or course_name or "General",
-                "num_questions": num_q,
-                "marks_each": marks_each,
-                "bloom_focus": bloom_focus,
-                "difficulty_mix": difficulty_mix,
-                "difficulty_distribution": difficulty_distribution_map.get(difficulty_mix),
-                "mark_distribution": None,
-                "question_type_preferences": {"include_numerical": True, "include_diagram": False},
-                "instruction": (
-                    "Generate exam-relevant questions strictly from context. "
-                    "Try to reach the requested count if context supports it. "
-                    "If context is shallow, output fewer questions instead of inventing."
-                ),
-            }
-
-            mix_sum = sum(st.session_state.mix.values()) or 1
-            norm_mix = {k: int(round(v * 100 / mix_sum)) for k, v in st.session_state.mix.items()}
-
-            preview_container = st.empty()
-            if num_q > 5:
-                with preview_container.container():
-                    st.subheader("Preview (quick)")
-                    st.caption("Generating a few quick questions while the full set is prepared.")
-                    with st.spinner("Generating preview..."):
-                        gen = GeneratorAgent(model="gpt-4o-mini")
-                        preview_targets = dict(targets)
-                        preview_targets["num_questions"] = 5
-                        preview_qb = gen.generate(
+            if job["pii"]:
+                st.warning("PII detected in uploads. Proceeding with consent.")
+            # Chunks indexed so far are part of the signature: more material means fresh context.
+            run_sig = (job["job_id"], job["chunks"], course_name, topic, num_q, marks_each, difficulty_mix)
+
+            with st.spinner("Preparing content..."):
+                if st.session_state.last_run_sig != run_sig:
+                    collection = resources.collection(job["persist_dir"], job["collection"])
+                    lexical = resources.lexical(job["persist_dir"], job["collection"])
+                    # Fast mode: skip subject detection + planning. Retrieve directly by topic/course.
+                    query = topic or course_name or "Course content"
+                    allowed_types = ["material", "outcomes"]
+                    if include_sample_papers:
+                        allowed_types.append("sample_paper")
+                    all_ctx = retrieve_top_k_strict(
+                        collection,
+                        query,
+                        k=max_total_ctx,
+                        allowed_source_types=allowed_types,
+                        where=build_where(sources=job["sources"]),
+                        lexical_index=lexical if len(lexical) else None,
+                    )
+                    # Drop near-duplicate / overlapping text and fit the prompt token budget.
+                    st.session_state.ctx = pack_context(all_ctx[:max_total_ctx], token_budget=ctx_token_budget)
+                    # The Quantity check is sized on what retrieval found, not on what fit the budget.
+                    st.session_state.ctx_count = len(all_ctx[:max_total_ctx])
+                    st.session_state.subject_profile = None
+                    st.session_state.last_run_sig = run_sig
+
+            if not st.session_state.ctx:
+                st.warning("No usable context found. Upload more materials.")
+            else:
+                difficulty_distribution_map = {
+                    "Easy": {"Easy": 100, "Medium": 0, "Hard": 0},
+                    "Medium": {"Easy": 0, "Medium": 100, "Hard": 0},
+                    "Hard": {"Easy": 0, "Medium": 0, "Hard": 100},
+                }
+                targets = {
+                    "topic": topic or course_name or "General",
+                    "num_questions": num_q,
+                    "marks_each": marks_each,
+                    "bloom_focus": bloom_focus,
+                    "difficulty_mix": difficulty_mix,
+                    "difficulty_distribution": difficulty_distribution_map.get(difficulty_mix),
+                    "mark_distribution": None,
+                    "question_type_preferences": {"include_numerical": True, "include_diagram": False},
+                    "instruction": (
+                        "Generate exam-relevant questions strictly from context. "
+                        "Try to reach the requested count if context supports it. "
+                        "If context is shallow, output fewer questions instead of inventing."
+                    ),
+                }
+
+                mix_sum = sum(st.session_state.mix.values()) or 1
+                norm_mix = {k: int(round(v * 100 / mix_sum)) for k, v in st.session_state.mix.items()}
+
+                # Preview and full set run side by side and both stream; each question
+                # is shown as soon as it arrives. The preview becomes the first
+                # questions of the full bank instead of being thrown away.
+                preview_n = 5
+                arrivals: Queue = Queue()
+
+                # Runs on a pool thread, where st.session_state is not available
+                # (bind() carries contextvars, not Streamlit's script context), so
+                # everything it needs from the session is passed in.
+                def _stream_preview(
+                    gen: GeneratorAgent,
+                    preview_targets: dict,
+                    preview_ctx: list[dict],
+                    subject_profile: dict | None,
+                ) -> QuestionBank:
+                    items = []
+                    # The preview is what the user is watching; it goes ahead of queued LLM calls.
+                    with llm_priority(PRIORITY_INTERACTIVE), span("preview", questions=preview_n):
+                        for item in gen.stream_generate(
                             course_name=course_name or "Course",
                             targets=preview_targets,
-                            context_snippets=st.session_state.ctx[:15],
-                            subject_profile=st.session_state.get("subject_profile"),
+                            context_snippets=preview_ctx,
+                            subject_profile=subject_profile,
                             question_mix=norm_mix,
+                            max_questions=preview_n,
+                        ):
+                            items.append(item)
+                            arrivals.put(item)
+                    return QuestionBank(course=course_name or "Course", questions=items)
+
+                with ThreadPoolExecutor(max_workers=2) as pool:
+                    preview_future = None
+                    if num_q > preview_n:
+                        preview_targets = dict(targets)
+                        preview_targets["num_questions"] = preview_n
+                        preview_future = pool.submit(
+                            bind(_stream_preview),
+                            resources.generator("gpt-4o-mini"),
+                            preview_targets,
+                            st.session_state.ctx[:15],
+                            st.session_state.get("subject_profile"),
                         )
-                    for q in preview_qb.questions:
-                        st.markdown(f"**{q.id} - {q.marks} marks**")
-                        st.write(q.question_text)
-                        st.divider()
-
-            with st.spinner("Generating full set..."):
-                qb, audit, logs = run_generation_loop(
-                    course_name=course_name or "Course",
-                    targets=targets,
-                    context_snippets=st.session_state.ctx,
-                    subject_profile=st.session_state.get("subject_profile"),
-                    question_mix=norm_mix,
-                    max_iters=1,
-                    model="gpt-4o-mini",
-                )
-
-            if not qb:
-                st.error("Generation failed. Try again with more context.")
-            else:
-                st.session_state.last_qb = qb.model_dump()
-                st.session_state.last_audit = audit.model_dump() if audit else None
-                st.session_state.logs = logs
+                    full_future = pool.submit(
+                        bind(run_generation_loop),
+                        course_name=course_name or "Course",
+                        targets=targets,
+                        context_snippets=st.session_state.ctx,
+                        subject_profile=st.session_state.get("subject_profile"),
+                        question_mix=norm_mix,
+                        max_iters=1,
+                        model="gpt-4o-mini",
+                        shard_size=shard_size,
+                        concurrency=gen_concurrency,
+                        seed=preview_future,
+                        seed_count=preview_n if preview_future else 0,
+                        on_question=arrivals.put,
+                        embedder=resources.embedder(),
+                        generator=resources.generator("gpt-4o-mini"),
+                        auditor=resources.auditor("gpt-4o-mini"),
+                        context_count=st.session_state.ctx_count,
+                    )
 
-                if audit and not audit.passed:
-                    st.warning("Review flagged issues below.")
+                    live_slot = st.empty()
+                    live = live_slot.container()
+                    live.subheader("Questions (arriving)")
+                    live.caption("Shown as they stream in; the audited set replaces this list when ready.")
+                    arrived = 0
+                    with st.spinner("Generating full set..."):
+                        while not full_future.done() or not arrivals.empty():
+                            try:
+                                item = arrivals.get(timeout=0.25)
+                            except Empty:
+                                continue
+                            arrived += 1
+                            live.markdown(f"**#{arrived} - {item.marks} marks**")
+                            live.write(item.question_text)
+                    qb, audit, logs = full_future.result()
+                    live_slot.empty()
+
+                if not qb:
+                    st.error("Generation failed. Try again with more context.")
                 else:
-                    st.success("Questions ready.")
-
-                coverage = compute_coverage_report(st.session_state.last_qb.get("questions", []))
-                st.session_state.coverage_report = coverage
-
-                with st.expander("Coverage report"):
-                    st.json(coverage)
-
-                with st.expander("Improvement log"):
-                    st.json(st.session_state.logs)
+                    st.session_state.last_qb = qb.model_dump()
+                    st.session_state.last_audit = audit.model_dump() if audit else None
+                    st.session_state.logs = logs
+                    st.session_state.bank_id = uuid.uuid4().hex[:12]
+                    st.session_state.bank_course = course_name or "Course"
+
+                    if audit and not audit.passed:
+                        st.warning("Review flagged issues below.")
+                    else:
+                        st.success("Questions ready.")
+
+                    # Near-duplicates within this bank and against banks downloaded before.
+                    question_index = get_question_index(resources.embedder())
+                    duplicates = question_index.find_duplicates(
+                        st.session_state.last_qb.get("questions", []), course=st.session_state.bank_course
+                    )
+                    coverage = compute_coverage_report(st.session_state.last_qb.get("questions", []), duplicates)
+                    st.session_state.coverage_report = coverage
+                    if duplicates:
+                        st.info(f"{len(duplicates)} near-duplicate question(s) found; see the coverage report.")
+
+                    csv_bytes = questions_to_csv_bytes(st.session_state.last_qb.get("questions", []))
+                    pdf_bytes = questions_to_pdf_bytes(st.session_state.last_qb.get("questions", []), coverage)
+
+                    with st.expander("Coverage report"):
+                        st.json(coverage)
+
+                    with st.expander("Improvement log"):
+                        st.json(st.session_state.logs)
+                        st.caption("LLM dispatch (queue depth, waits, 429 retries)")
+                        st.json(get_dispatcher().metrics())
+                        st.caption("Shared resources (collections open in this process, reuse counts, RSS)")
+                        st.json(resources.stats())
+
+                    with st.expander("Timing waterfall"):
+                        st.markdown(_waterfall_html(run_trace.waterfall()), unsafe_allow_html=True)
+                        st.json(run_trace.totals())
+                    st.download_button(
+                        "Download CSV", data=csv_bytes, file_name="question_bank.csv", on_click=_record_bank
+                    )
+                    st.download_button(
+                        "Download PDF", data=pdf_bytes, file_name="question_bank.pdf", on_click=_record_bank
+                    )
 
-                csv_bytes = questions_to_csv_bytes(st.session_state.last_qb.get("questions", []))
-                pdf_bytes = questions_to_pdf_bytes(st.session_state.last_qb.get("questions", []), coverage)
-                st.download_button("Download CSV", data=csv_bytes, file_name="question_bank.csv")
-                st.download_button("Download PDF", data=pdf_bytes, file_name="question_bank.pdf")
+                    st.subheader("Questions")
+                    for q in qb.questions:
+                        st.markdown(f"### {q.id} - {q.marks} marks")
+                        st.markdown(f"**{q.co_mapping} | {q.bloom_level} | {q.difficulty}**")
+                        st.write(q.question_text)
 
-                st.subheader("Questions")
-                for q in qb.questions:
-                    st.markdown(f"### {q.id} - {q.marks} marks")
-                    st.markdown(f"**{q.co_mapping} | {q.bloom_level} | {q.difficulty}**")
-                    st.write(q.question_text)
+                        with st.expander("Answer key"):
+                            st.write(q.answer_key)
 
-                    with st.expander("Answer key"):
-                        st.write(q.answer_key)
+                        with st.expander("Rubric"):
+                            st.write(q.detailed_rubric)
 
-                    with st.expander("Rubric"):
-                        st.write(q.detailed_rubric)
+                        citations = ", ".join([f"{s.source} p{s.page}" for s in q.source_citation])
+                        st.caption("Grounded in: " + citations)
+                        with st.expander("Citations"):
+                            for c in q.source_citation:
+                                st.markdown(f"- {c.source} p{c.page}")
+                                st.write(c.snippet)
+                        st.divider()
 
-                    citations = ", ".join([f"{s.source} p{s.page}" for s in q.source_citation])
-                    st.caption("Grounded in: " + citations)
-                    with st.expander("Citations"):
-                        for c in q.source_citation:
-                            st.markdown(f"- {c.source} p{c.page}")
-                            st.write(c.snippet)
-                    st.divider()
+    trace_dir = get_trace_dir()
+    if trace_dir:
+        run_trace.write_jsonl(str(Path(trace_dir) / f"{run_trace.trace_id}.jsonl"))
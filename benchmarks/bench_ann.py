@@ -0,0 +1,123 @@
+"""
+Exact (NumpyIndex) vs approximate (IVFIndex) search on synthetic corpora.
+
+    python benchmarks/bench_ann.py --sizes 10000,100000,1000000 --nprobe 4,8,16,32
+
+Vectors are drawn from a Gaussian mixture so the corpus has cluster
+structure like real chunk embeddings. Reports build time, recall@k against
+exact search, and p50/p95 query latency per setting as JSON.
+"""
+from pathlib import Path
+import argparse
+import json
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+from app.rag.ann import IVFIndex
+from app.rag.numpy_index import NumpyIndex, _normalize
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    out = np.empty((n, dim), dtype=np.float32)
+    for i in range(0, n, 100_000):
+        j = min(i + 100_000, n)
+        out[i:j] = centers[labels[i:j]] + 0.6 * rng.normal(size=(j - i, dim)).astype(np.float32)
+    return _normalize(out)
+
+
+def _fill(index: NumpyIndex, vectors: np.ndarray, batch: int = 100_000) -> None:
+    for i in range(0, vectors.shape[0], batch):
+        part = vectors[i:i + batch]
+        ids = [f"c{j}" for j in range(i, i + part.shape[0])]
+        metas = [{"source": f"doc{j % 500}.pdf", "page": j % 300} for j in range(i, i + part.shape[0])]
+        index.add_vectors(part, [""] * part.shape[0], metas, ids)
+
+
+def _latencies(index: NumpyIndex, queries: np.ndarray, k: int) -> tuple[list[np.ndarray], list[float]]:
+    results, times = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        rows, _ = index.search_vector(q, k)
+        times.append((time.perf_counter() - t0) * 1000)
+        results.append(rows)
+    return results, times
+
+
+def run(sizes: list[int], dim: int, k: int, nprobes: list[int], queries: int) -> list[dict]:
+    report = []
+    for n in sizes:
+        vectors = synthetic_corpus(n, dim, clusters=max(16, n // 2000))
+        qs = synthetic_corpus(queries, dim, clusters=max(16, n // 2000), seed=1)
+        with tempfile.TemporaryDirectory() as tmp:
+            exact = NumpyIndex(f"{tmp}/exact", embedder=None)
+            _fill(exact, vectors)
+            truth, exact_ms = _latencies(exact, qs, k)
+
+            ivf = IVFIndex(f"{tmp}/ivf", embedder=None, min_train=0)
+            _fill(ivf, vectors)
+            t0 = time.perf_counter()
+            ivf.train()
+            build_s = time.perf_counter() - t0
+
+            row = {
+                "n": n,
+                "dim": dim,
+                "k": k,
+                "nlist": ivf.nlist,
+                "train_s": round(build_s, 3),
+                "exact": {"p50_ms": float(np.percentile(exact_ms, 50)), "p95_ms": float(np.percentile(exact_ms, 95))},
+                "ivf": [],
+            }
+            for nprobe in nprobes:
+                ivf.nprobe = nprobe
+                got, ivf_ms = _latencies(ivf, qs, k)
+                recall = np.mean([len(set(g.tolist()) & set(t.tolist())) / k for g, t in zip(got, truth)])
+                row["ivf"].append(
+                    {
+                        "nprobe": nprobe,
+                        "recall_at_k": round(float(recall), 4),
+                        "p50_ms": float(np.percentile(ivf_ms, 50)),
+                        "p95_ms": float(np.percentile(ivf_ms, 95)),
+                    }
+                )
+            report.append(row)
+            print(json.dumps(row), file=sys.stderr)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", default="4,8,16,32")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(
+        [int(s) for s in args.sizes.split(",")],
+        args.dim,
+        args.k,
+        [int(p) for p in args.nprobe.split(",")],
+        args.queries,
+    )
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
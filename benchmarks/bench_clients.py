@@ -0,0 +1,151 @@
+"""
+Per-call LLM latency with a fresh client per agent vs the shared client registry.
+
+    python benchmarks/bench_clients.py --calls 200 --handshake-ms 30
+
+Runs against a local mock of /v1/chat/completions (HTTP/1.1 keep-alive).
+The server sleeps `--handshake-ms` on every new connection to stand in for
+the TCP + TLS setup of a real API endpoint, and counts connections.
+Modes:
+
+- fresh_pool: new ChatOpenAI with its own HTTP client per call (a new
+  connection pool every time, as when every agent builds its own client)
+- fresh_client: new ChatOpenAI per call on the library's default HTTP client
+- registry: agents.clients.get_chat_client, one client per (model, temperature)
+
+Reports construction time, p50/p95 per-call latency and connections opened as JSON.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import httpx
+import numpy as np
+from langchain_openai import ChatOpenAI
+
+from app.agents.clients import get_chat_client, reset_clients
+
+MODEL = "gpt-4o-mini"
+
+
+def make_server(handshake_s: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with self.server.lock:
+                self.server.connections += 1
+            time.sleep(handshake_s)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            payload = json.dumps(
+                {
+                    "id": "chatcmpl-bench",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": body.get("model", MODEL),
+                    "choices": [
+                        {"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}
+                    ],
+                    "usage": {"prompt_tokens": 8, "completion_tokens": 1, "total_tokens": 9},
+                }
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.lock = threading.Lock()
+    return server
+
+
+def _measure(server: ThreadingHTTPServer, calls: int, make_client) -> dict:
+    server.connections = 0
+    build_ms, call_ms = [], []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        client, close = make_client()
+        t1 = time.perf_counter()
+        client.invoke("ping")
+        t2 = time.perf_counter()
+        if close is not None:
+            close()
+        build_ms.append((t1 - t0) * 1000)
+        call_ms.append((t2 - t1) * 1000)
+    total = np.add(build_ms, call_ms)
+    return {
+        "construct_ms_mean": round(float(np.mean(build_ms)), 3),
+        "call_p50_ms": round(float(np.percentile(call_ms, 50)), 3),
+        "call_p95_ms": round(float(np.percentile(call_ms, 95)), 3),
+        "total_p50_ms": round(float(np.percentile(total, 50)), 3),
+        "total_mean_ms": round(float(np.mean(total)), 3),
+        "connections": server.connections,
+    }
+
+
+def run(calls: int, handshake_ms: float) -> dict:
+    server = make_server(handshake_ms / 1000.0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+    def fresh_pool():
+        http = httpx.Client()
+        return ChatOpenAI(model=MODEL, temperature=0.2, base_url=base_url, http_client=http), http.close
+
+    def fresh_client():
+        return ChatOpenAI(model=MODEL, temperature=0.2, base_url=base_url), None
+
+    def registry():
+        return get_chat_client(MODEL, 0.2, base_url=base_url), None
+
+    reset_clients()
+    # One warm-up call so imports and model-profile lookups are not billed to the first mode.
+    ChatOpenAI(model=MODEL, temperature=0.2, base_url=base_url).invoke("warm-up")
+    report = {"calls": calls, "handshake_ms": handshake_ms}
+    for name, factory in (("fresh_pool", fresh_pool), ("fresh_client", fresh_client), ("registry", registry)):
+        report[name] = _measure(server, calls, factory)
+        print(json.dumps({name: report[name]}), file=sys.stderr)
+    server.shutdown()
+    report["saving_vs_fresh_pool_ms"] = round(
+        report["fresh_pool"]["total_mean_ms"] - report["registry"]["total_mean_ms"], 3
+    )
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=30.0, help="simulated connection setup cost")
+    parser.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    text = json.dumps(run(args.calls, args.handshake_ms), indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Import cost of every app.* module and of the Streamlit UI's first render.
+
+    python benchmarks/bench_imports.py --repeat 5 --out benchmarks/results/imports.json
+
+Each measurement runs in a fresh interpreter, so nothing is already in
+sys.modules. For every module the report gives the median wall time of
+`import <module>` and which heavy third-party packages that import pulled
+in (torch, sentence_transformers, chromadb, langchain_openai, pandas,
+reportlab, ...).
+
+"ui_first_render" replays the top-level imports of app/ui_streamlit.py,
+i.e. everything that has to load before the first widget can be drawn.
+Streamlit itself is included when it is installed.
+"""
+from pathlib import Path
+import argparse
+import ast
+import json
+import statistics
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY = [
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "chromadb",
+    "langchain_community",
+    "langchain_openai",
+    "openai",
+    "langchain_core",
+    "langchain_text_splitters",
+    "pydantic",
+    "numpy",
+    "pandas",
+    "reportlab",
+    "PyPDF2",
+    "tiktoken",
+    "dotenv",
+    "streamlit",
+]
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+t = time.perf_counter()
+error = None
+try:
+{body}
+except Exception as exc:
+    error = f"{{type(exc).__name__}}: {{exc}}"
+ms = (time.perf_counter() - t) * 1000
+print(json.dumps({{"ms": ms, "error": error, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def app_modules() -> list[str]:
+    out = []
+    for path in sorted((ROOT / "app").rglob("*.py")):
+        parts = path.relative_to(ROOT).with_suffix("").parts
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        name = ".".join(parts)
+        # Importing the UI module runs the app; it is measured via its import lines instead.
+        if name != "app.ui_streamlit":
+            out.append(name)
+    return out
+
+
+def ui_imports() -> list[str]:
+    # Top-level import statements of the UI script, in order.
+    tree = ast.parse((ROOT / "app" / "ui_streamlit.py").read_text(encoding="utf-8"))
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def probe(lines: list[str], repeat: int) -> dict:
+    body = "\n".join("    " + line for line in lines) or "    pass"
+    code = PROBE.format(root=str(ROOT), body=body, heavy=HEAVY)
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT)
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {
+        "ms": round(statistics.median(r["ms"] for r in runs), 2),
+        "loaded": runs[-1]["loaded"],
+        "error": runs[-1]["error"],
+    }
+
+
+def run(repeat: int) -> dict:
+    report: dict = {"python": sys.version.split()[0], "repeat": repeat, "modules": {}}
+    report["baseline_interpreter"] = probe([], repeat)
+    for name in app_modules():
+        report["modules"][name] = probe([f"import {name}"], repeat)
+        print(json.dumps({name: report["modules"][name]}), file=sys.stderr)
+
+    lines = ui_imports()
+    try:
+        import streamlit  # noqa: F401
+
+        report["streamlit_available"] = True
+    except ImportError:
+        lines = [line for line in lines if "streamlit" not in line]
+        report["streamlit_available"] = False
+    report["ui_first_render"] = probe(lines, repeat)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per module (median is reported)")
+    parser.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    text = json.dumps(run(args.repeat), indent=2)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
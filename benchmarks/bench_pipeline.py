@@ -0,0 +1,256 @@
+"""
+End-to-end pipeline benchmark on synthetic course PDFs with a fake LLM.
+
+    python benchmarks/bench_pipeline.py --files 4 --pages 50 --out benchmarks/results/$(git rev-parse --short HEAD).json
+
+Stages, all local and deterministic for a given seed:
+
+- ingest: extraction -> chunking -> embedding -> upsert (pages/s, chunks/s)
+- retrieval: retrieve_top_k_strict over topic queries (p50/p95/p99 ms)
+- prompts: packed context, generator and audit prompt sizes (tokens)
+- generation: run_generation_loop with FakeQBankChat for both agents
+- export: CSV and PDF bytes and time
+
+Embeddings use a feature-hashing embedder by default so runs need no model
+download; pass --embedder minilm to include SentenceTransformer time. The
+JSON report carries the commit and parameters; --baseline adds the
+relative change of each metric against an earlier report.
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+from app.agents.auditor import AuditorAgent
+from app.agents.generator import GeneratorAgent
+from app.agents.llm_cache import set_response_cache
+from app.agents.loop import run_generation_loop
+from app.export import questions_to_csv_bytes, questions_to_pdf_bytes
+from app.prompts import build_audit_prompt, build_generator_prompt
+from app.rag.ingest import count_pdf_pages
+from app.rag.lexical import BM25Index, lexical_path
+from app.rag.manifest import IngestManifest, manifest_path
+from app.rag.packing import count_tokens, pack_context
+from app.rag.pipeline import ingest_pdfs
+from app.rag.retrieve import retrieve_top_k_strict
+from app.rag.vectorstore import get_collection, get_embedder
+from app.reporting import compute_coverage_report
+from app.tracing import trace
+from benchmarks.fakes import TERMS, FakeQBankChat, HashEmbedder, synthetic_course_pdfs
+
+COURSE = "Signals and Systems"
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _percentiles(ms: list[float]) -> dict:
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(np.mean(ms)), 3),
+    }
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """
+    Relative change (new / old - 1) of every numeric metric both reports
+    share, keyed "section.metric".
+    """
+    out = {}
+    for section in ("ingest", "retrieval", "prompts", "generation", "export"):
+        for key, new in report.get(section, {}).items():
+            old = baseline.get(section, {}).get(key)
+            if isinstance(new, bool) or not isinstance(new, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            if old:
+                out[f"{section}.{key}"] = round(new / old - 1, 4)
+    return out
+
+
+def run(
+    files: int,
+    pages: int,
+    queries: int,
+    num_questions: int,
+    backend: str,
+    embedder_name: str,
+    workers: int,
+    seed: int,
+) -> dict:
+    # Agents pick up the process-wide response cache; a repeat run would be served from it,
+    # so it is switched off (and any open instance dropped) before anything is built.
+    os.environ["QBANK_LLM_CACHE"] = "off"
+    set_response_cache(None)
+    embedder = HashEmbedder() if embedder_name == "hash" else get_embedder()
+    report: dict = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "params": {
+            "files": files,
+            "pages": pages,
+            "queries": queries,
+            "num_questions": num_questions,
+            "backend": backend,
+            "embedder": embedder_name,
+            "workers": workers,
+            "seed": seed,
+        },
+    }
+
+    with tempfile.TemporaryDirectory() as tmp, trace("bench_pipeline") as run_trace:
+        pdfs = synthetic_course_pdfs(str(Path(tmp) / "pdfs"), files=files, pages=pages, seed=seed)
+        total_pages = sum(count_pdf_pages(p) for p in pdfs)
+        persist = str(Path(tmp) / "db")
+        collection = get_collection(persist, "bench", embedder, backend=backend)
+        lexical = BM25Index(lexical_path(persist, "bench"))
+        manifest = IngestManifest(manifest_path(persist, "bench"))
+
+        t = time.perf_counter()
+        results = ingest_pdfs(
+            collection,
+            manifest,
+            [(p, Path(p).name, "material") for p in pdfs],
+            workers=workers,
+            course=COURSE,
+            lexical=lexical,
+        )
+        ingest_s = time.perf_counter() - t
+        chunks = sum(r["chunks"] for r in results)
+        report["ingest"] = {
+            "pages": total_pages,
+            "chunks": chunks,
+            "seconds": round(ingest_s, 3),
+            "pages_per_s": round(total_pages / ingest_s, 2),
+            "chunks_per_s": round(chunks / ingest_s, 2),
+        }
+
+        topics = [f"{TERMS[i % len(TERMS)]} {TERMS[(i * 7 + 3) % len(TERMS)]}" for i in range(queries)]
+        ms = []
+        ctx = []
+        for q in topics:
+            t = time.perf_counter()
+            ctx = retrieve_top_k_strict(
+                collection, q, k=40, allowed_source_types=["material"], lexical_index=lexical
+            )
+            ms.append((time.perf_counter() - t) * 1000)
+        report["retrieval"] = {"queries": queries, "k": 40, **_percentiles(ms)}
+
+        packed = pack_context(ctx, token_budget=6000)
+        targets = {
+            "topic": topics[-1],
+            "num_questions": num_questions,
+            "marks_each": 2,
+            "bloom_focus": "Mixed",
+            "difficulty_mix": "Medium",
+            "difficulty_distribution": {"Easy": 0, "Medium": 100, "Hard": 0},
+        }
+        gen_prompt = build_generator_prompt(COURSE, targets, packed)
+
+        chat = FakeQBankChat()
+        generator, auditor = GeneratorAgent(client=chat), AuditorAgent(client=chat)
+        t = time.perf_counter()
+        qb, audit, logs = run_generation_loop(
+            COURSE,
+            targets,
+            packed,
+            subject_profile=None,
+            question_mix=None,
+            max_iters=1,
+            shard_size=10,
+            embedder=embedder,
+            generator=generator,
+            auditor=auditor,
+            context_count=len(ctx),
+        )
+        gen_s = time.perf_counter() - t
+        questions = qb.model_dump()["questions"]
+        audit_prompt = build_audit_prompt(qb.model_dump(), packed, targets)
+        report["prompts"] = {
+            "retrieved_snippets": len(ctx),
+            "packed_snippets": len(packed),
+            "retrieved_tokens": sum(count_tokens(c["text"]) for c in ctx),
+            "packed_tokens": sum(count_tokens(c["text"]) for c in packed),
+            "generator_prompt_tokens": count_tokens(gen_prompt),
+            "audit_prompt_tokens": count_tokens(audit_prompt),
+        }
+        report["generation"] = {
+            "questions": len(questions),
+            "seconds": round(gen_s, 3),
+            "audit_passed": bool(audit and audit.passed),
+            "iterations": len(logs),
+        }
+
+        coverage = compute_coverage_report(questions)
+        t = time.perf_counter()
+        csv_bytes = questions_to_csv_bytes(questions)
+        csv_ms = (time.perf_counter() - t) * 1000
+        t = time.perf_counter()
+        pdf_bytes = questions_to_pdf_bytes(questions, coverage)
+        pdf_ms = (time.perf_counter() - t) * 1000
+        report["export"] = {
+            "csv_ms": round(csv_ms, 3),
+            "csv_bytes": len(csv_bytes),
+            "pdf_ms": round(pdf_ms, 3),
+            "pdf_bytes": len(pdf_bytes),
+        }
+
+    report["stages"] = run_trace.totals()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=20, help="pages per PDF")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--backend", default="numpy", choices=["numpy", "ivf", "chroma"])
+    parser.add_argument("--embedder", default="hash", choices=["hash", "minilm"])
+    parser.add_argument("--workers", type=int, default=1, help="PDF extraction processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=None, help="earlier report to compare against")
+    parser.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(
+        args.files,
+        args.pages,
+        args.queries,
+        args.questions,
+        args.backend,
+        args.embedder,
+        args.workers,
+        args.seed,
+    )
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        report["baseline"] = {"commit": baseline.get("commit"), "change": compare(report, baseline)}
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Deterministic stand-ins for the networked / heavyweight parts of the pipeline,
+shared by the benchmark scripts:
+
+- FakeQBankChat: a local chat model that answers the generator, auditor,
+  planner and subject prompts with valid JSON built from the prompt itself
+- HashEmbedder: a feature-hashing embedder (no model download)
+- synthetic_course_pdfs: reportlab PDFs of configurable size
+"""
+from __future__ import annotations
+import json
+import random
+import re
+import time
+import zlib
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+SNIPPET_RE = re.compile(r"\[SNIPPET \d+\] source=(.+?) page=(\d+) source_type=\S+\n(.+?)\n", re.S)
+BLOOM = ["Remember", "Understand", "Apply", "Analyze", "Evaluate", "Create"]
+
+TERMS = (
+    "signal system fourier laplace transform convolution impulse response sampling aliasing filter "
+    "frequency spectrum stability causality linearity modulation bandwidth noise energy power "
+    "periodic discrete continuous kernel eigenfunction phase magnitude pole zero feedback "
+    "controller transfer function bode nyquist damping resonance harmonic series integral "
+    "derivative matrix vector basis orthogonal projection estimator variance entropy channel"
+).split()
+
+
+class FakeQBankChat(BaseChatModel):
+    """
+    Answers by prompt type: a QuestionBank with `num_questions` items cited
+    and grounded in the prompt's snippets, a passing AuditReport, a
+    TopicPlan or a SubjectProfile. Output is a pure function of the prompt;
+    `latency_s` adds a fixed delay per call and `chunk_chars` sets the
+    streamed chunk size.
+    """
+
+    model_name: str = "fake-qbank"
+    temperature: float = 0.0
+    latency_s: float = 0.0
+    chunk_chars: int = 64
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-qbank"
+
+    def _respond(self, messages: list[BaseMessage]) -> str:
+        system = "\n".join(str(m.content) for m in messages if m.type == "system")
+        user = "\n".join(str(m.content) for m in messages if m.type != "system")
+        if "educational auditor" in system:
+            return json.dumps({"passed": True, "issues": [], "summary": "No issues found."})
+        if "exam planner" in system:
+            return json.dumps(
+                {
+                    "topic": "benchmark",
+                    "subtopics": [{"name": t, "importance": 3, "why": "in syllabus", "query": t} for t in TERMS[:4]],
+                    "notes": "",
+                }
+            )
+        if "detect the subject" in system:
+            return json.dumps(
+                {
+                    "subject": "Engineering",
+                    "rationale": "synthetic",
+                    "recommended_mix": {"theory": 60, "numerical": 20, "derivation": 10, "equation": 10, "diagram": 0},
+                    "common_question_types": ["theory"],
+                }
+            )
+        return json.dumps(self._bank(user))
+
+    def _bank(self, prompt: str) -> dict:
+        m = re.search(r"num_questions: (\d+)", prompt)
+        count = int(m.group(1)) if m else 5
+        m = re.search(r"marks_each: (\d+)", prompt)
+        marks = int(m.group(1)) if m else 2
+        m = re.search(r"difficulty_mix: (\w+)", prompt)
+        difficulty = m.group(1) if m and m.group(1) in ("Easy", "Medium", "Hard") else "Medium"
+        course = (re.search(r"Course: (.+)", prompt) or [None, "Course"])[1]
+        snippets = SNIPPET_RE.findall(prompt)
+        questions = []
+        for i in range(count if snippets else 0):
+            source, page, text = snippets[i % len(snippets)]
+            words = text.split()
+            start = (i * 7) % max(1, len(words) - 12)
+            focus = " ".join(words[start:start + 8])
+            questions.append(
+                {
+                    "id": f"Q{i + 1}",
+                    "question_text": f"Q{i + 1}: explain {focus} ({source} p{page}).",
+                    "bloom_level": BLOOM[i % len(BLOOM)],
+                    "co_mapping": f"CO{i % 3 + 1}",
+                    "difficulty": difficulty,
+                    "marks": marks,
+                    "answer_key": " ".join(words[:40]),
+                    "detailed_rubric": "1 mark per correct point.",
+                    "source_citation": [{"source": source, "page": int(page), "snippet": focus}],
+                }
+            )
+        return {"course": course.strip(), "questions": questions}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._respond(messages)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        text = self._respond(messages)
+        for i in range(0, len(text), self.chunk_chars):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[i:i + self.chunk_chars]))
+
+
+class HashEmbedder(Embeddings):
+    """
+    Bag-of-words feature hashing into `dim` float32 dimensions (crc32, so
+    vectors are stable across processes).
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for tok in re.findall(r"\w+", text.lower()):
+                h = zlib.crc32(tok.encode("utf-8"))
+                out[row, h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.encode([text])[0].tolist()
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(TERMS) for _ in range(rng.randint(8, 16))]
+    return " ".join(words).capitalize() + "."
+
+
+def synthetic_course_pdfs(out_dir: str, files: int = 2, pages: int = 20, seed: int = 0) -> list[str]:
+    """
+    Writes `files` PDFs of `pages` pages each (a heading plus ~40 lines of
+    domain vocabulary per page). Same seed, same bytes of text.
+    """
+    rng = random.Random(seed)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for f in range(files):
+        path = out / f"course_{seed}_{f}.pdf"
+        c = canvas.Canvas(str(path), pagesize=letter)
+        width, height = letter
+        for p in range(pages):
+            y = height - 72
+            c.setFont("Helvetica-Bold", 13)
+            c.drawString(72, y, f"Unit {p + 1}: {rng.choice(TERMS).title()} and {rng.choice(TERMS).title()}")
+            y -= 24
+            c.setFont("Helvetica", 10)
+            while y > 72:
+                c.drawString(72, y, _sentence(rng)[:95])
+                y -= 14
+            c.showPage()
+        c.save()
+        paths.append(str(path))
+    return paths
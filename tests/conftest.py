@@ -0,0 +1,21 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.agents.llm_cache import set_response_cache
+
+
+@pytest.fixture(autouse=True)
+def _no_shared_state(monkeypatch, tmp_path):
+    # Keep tests off data/: no response cache on disk, no trace files, a private question index.
+    monkeypatch.setenv("QBANK_LLM_CACHE", "off")
+    monkeypatch.setenv("QBANK_TRACE_DIR", "")
+    monkeypatch.setenv("QBANK_QUESTION_INDEX", str(tmp_path / "question_index"))
+    set_response_cache(None)
+    yield
+    set_response_cache(None)
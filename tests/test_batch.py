@@ -0,0 +1,79 @@
+import shutil
+
+import pytest
+
+import app.batch as batch
+from app.agents.auditor import AuditorAgent
+from app.agents.generator import GeneratorAgent
+from app.agents.loop import run_generation_loop
+from app.batch import BatchJob, Checkpoint, run_batch
+from app.rag.lexical import BM25Index, lexical_path
+from app.rag.question_index import get_question_index
+from app.rag.vectorstore import collection_name_for
+from benchmarks.fakes import FakeQBankChat, HashEmbedder, synthetic_course_pdfs
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    return synthetic_course_pdfs(str(tmp_path / "pdfs"), files=2, pages=3, seed=1)
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    # numpy backend, hashing embedder and the fake chat model: no model download, no API key.
+    embedder = HashEmbedder()
+    monkeypatch.setenv("QBANK_VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(batch, "get_embedder", lambda: embedder)
+
+    def _fake_loop(**kwargs):
+        chat = FakeQBankChat()
+        kwargs.pop("model", None)
+        return run_generation_loop(**kwargs, generator=GeneratorAgent(client=chat), auditor=AuditorAgent(client=chat))
+
+    monkeypatch.setattr(batch, "run_generation_loop", _fake_loop)
+
+
+def test_signature_follows_pdf_contents(tmp_path, pdfs):
+    path = str(tmp_path / "notes.pdf")
+    shutil.copy(pdfs[0], path)
+    before = BatchJob(course="Signals", pdfs=[path]).signature()
+    assert BatchJob(course="Signals", pdfs=[path]).signature() == before
+    # Same path and settings, new bytes: the job is no longer the one checkpointed.
+    shutil.copy(pdfs[1], path)
+    assert BatchJob(course="Signals", pdfs=[path]).signature() != before
+
+
+def test_checkpoint_only_resumes_unchanged_jobs(tmp_path, pdfs):
+    path = str(tmp_path / "notes.pdf")
+    shutil.copy(pdfs[0], path)
+    job = BatchJob(course="Signals", pdfs=[path], job_id="signals")
+    checkpoint = Checkpoint(tmp_path / "out" / "checkpoint.json")
+    checkpoint.record({"job_id": "signals", "status": "done", "signature": job.signature()})
+
+    reloaded = Checkpoint(tmp_path / "out" / "checkpoint.json")
+    assert reloaded.completed(job) is not None
+    assert reloaded.completed(BatchJob(course="Signals", pdfs=[path], num_questions=5, job_id="signals")) is None
+    shutil.copy(pdfs[1], path)
+    assert reloaded.completed(BatchJob(course="Signals", pdfs=[path], job_id="signals")) is None
+
+
+def test_concurrent_jobs_on_one_course_keep_each_others_postings(tmp_path, pdfs, offline):
+    persist = str(tmp_path / "db")
+    jobs = [
+        BatchJob(course="Signals", pdfs=[pdfs[0]], topics=["fourier"], num_questions=4, job_id="a"),
+        BatchJob(course="Signals", pdfs=[pdfs[1]], topics=["laplace"], num_questions=4, job_id="b"),
+    ]
+    results = run_batch(jobs, out_dir=str(tmp_path / "out"), workers=2, persist_dir=persist, max_iters=1)
+    assert [r["status"] for r in results] == ["done", "done"], results
+
+    lexical = BM25Index(lexical_path(persist, collection_name_for(batch.COLLECTION_NAME, course="Signals")))
+    sources = {d["meta"]["source"] for d in lexical.docs.values()}
+    assert sources == {"course_1_0.pdf", "course_1_1.pdf"}
+    # Both banks were recorded as history even though the jobs wrote the question index at once.
+    history = get_question_index(HashEmbedder())
+    assert set(history.columns["bank_id"]) == {"a", "b"}
+    assert len(history) == sum(r["questions"] for r in results)
+
+    # A second run with the same inputs is served from the checkpoint.
+    again = run_batch(jobs, out_dir=str(tmp_path / "out"), workers=2, persist_dir=persist, max_iters=1)
+    assert all(r.get("resumed") for r in again)
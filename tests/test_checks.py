@@ -0,0 +1,96 @@
+from app.agents.auditor import AuditorAgent
+from app.agents.checks import check_citations, check_distribution, check_quantity, check_redundancy, run_local_checks
+from benchmarks.fakes import FakeQBankChat
+
+CTX = [
+    {"source": "notes.pdf", "page": 1, "text": "The Fourier transform maps a signal to its frequency spectrum."},
+    {"source": "notes.pdf", "page": 2, "text": "Sampling above the Nyquist rate avoids aliasing."},
+]
+
+
+def _q(qid, text, difficulty="Medium", page=1, snippet="maps a signal to its frequency spectrum"):
+    return {
+        "id": qid,
+        "question_text": text,
+        "difficulty": difficulty,
+        "source_citation": [{"source": "notes.pdf", "page": page, "snippet": snippet}],
+    }
+
+
+class CountingChat(FakeQBankChat):
+    calls: int = 0
+
+    def _respond(self, messages):
+        self.calls += 1
+        return super()._respond(messages)
+
+
+def test_distribution_allows_one_question_of_slack():
+    targets = {"difficulty_distribution": {"Easy": 0, "Medium": 100, "Hard": 0}}
+    ten = [_q(f"Q{i}", "x") for i in range(9)] + [_q("Q9", "x", difficulty="Hard")]
+    assert check_distribution({"questions": ten}, targets) == []
+    off = [_q(f"Q{i}", "x") for i in range(6)] + [_q(f"H{i}", "x", difficulty="Hard") for i in range(4)]
+    assert {i.category for i in check_distribution({"questions": off}, targets)} == {"Distribution"}
+
+
+def test_quantity_only_enforced_with_enough_context():
+    qb = {"questions": [_q("Q1", "x")]}
+    assert check_quantity(qb, {"num_questions": 5}, context_count=12)[0].category == "Quantity"
+    assert check_quantity(qb, {"num_questions": 5}, context_count=3) == []
+    # Packed context can be short while retrieval found plenty; the caller's count decides.
+    assert {i.category for i in run_local_checks(qb, CTX, {"num_questions": 5}, context_count=12)} == {"Quantity"}
+
+
+def test_citations_must_be_retrieved_and_grounded():
+    qb = {
+        "questions": [
+            _q("Q1", "ok"),
+            _q("Q2", "wrong page", page=7),
+            _q("Q3", "made up", snippet="laplace poles decide stability"),
+        ]
+    }
+    issues = check_citations(qb, CTX)
+    assert [(i.id, i.category) for i in issues] == [("Q2", "Hallucination"), ("Q3", "Hallucination")]
+
+
+def test_redundancy_flags_near_duplicates_and_retained_repeats():
+    qb = {
+        "questions": [
+            _q("Q1", "Explain how the Fourier transform maps a signal to its spectrum."),
+            _q("Q2", "Explain how the Fourier transform maps a signal to its spectrum!"),
+            _q("Q3", "State the Nyquist rate and why sampling below it causes aliasing."),
+        ]
+    }
+    assert [i.id for i in check_redundancy(qb)] == ["Q2"]
+    retained = ["State the Nyquist rate and why sampling below it causes aliasing."]
+    partial = {"questions": [qb["questions"][2]]}
+    assert [i.id for i in check_redundancy(partial, retained_questions=retained)] == ["Q3"]
+
+
+def test_partial_audit_skips_bank_wide_checks():
+    qb = {"questions": [_q(f"Q{i}", f"question {i}") for i in range(4)]}
+    targets = {"num_questions": 10, "difficulty_distribution": {"Easy": 100, "Medium": 0, "Hard": 0}}
+    assert {i.category for i in run_local_checks(qb, CTX * 6, targets)} == {"Distribution", "Quantity"}
+    assert run_local_checks(qb, CTX * 6, targets, retained_questions=[]) == []
+
+
+def test_llm_audit_is_skipped_only_for_blocking_failures():
+    chat = CountingChat()
+    auditor = AuditorAgent(client=chat)
+
+    # A per-question failure still gets the semantic audit; the local issue is merged in.
+    qb = {"questions": [_q("Q1", "ok"), _q("Q2", "wrong page", page=7)]}
+    report = auditor.audit(qb, CTX, {})
+    assert chat.calls == 1
+    assert not report.passed
+    assert [i.id for i in report.issues] == ["Q2"]
+
+    # A bank that will be regenerated anyway is not sent to the LLM...
+    short = {"num_questions": 10}
+    report = auditor.audit(qb, CTX * 6, short)
+    assert chat.calls == 1
+    assert "Quantity" in {i.category for i in report.issues}
+
+    # ...unless the caller has no further iteration to regenerate it in.
+    auditor.audit(qb, CTX * 6, short, short_circuit=False)
+    assert chat.calls == 2
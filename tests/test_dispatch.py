@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from app.agents.clients import get_chat_client, reset_clients
+from app.agents.dispatch import PRIORITY_BATCH, PRIORITY_INTERACTIVE, Dispatcher, TokenBucket
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def _flaky(failures: int, exc: Exception, result="ok"):
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        if len(calls) <= failures:
+            raise exc
+        return result
+
+    return fn, calls
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(per_minute=60, capacity=2)
+    now = bucket._updated
+    assert bucket.wait_for(2, now) == 0.0
+    bucket.take(2)
+    assert bucket.wait_for(1, now) == pytest.approx(1.0)
+    assert bucket.wait_for(1, now + 0.5) == pytest.approx(0.5)
+    # Requests above capacity are clamped instead of waiting forever.
+    assert bucket.wait_for(10, now + 2.0) == 0.0
+    assert TokenBucket(per_minute=0).wait_for(1e9, now) == 0.0
+
+
+def test_rate_limits_are_retried_and_other_errors_are_not():
+    dispatcher = Dispatcher(max_retries=3, base_delay=0.001, max_delay=0.01)
+    fn, calls = _flaky(2, RateLimited("429 Too Many Requests"))
+    assert dispatcher.call(fn) == "ok"
+    assert len(calls) == 3
+    assert (dispatcher.retries, dispatcher.rate_limited, dispatcher.failed) == (2, 2, 0)
+
+    fn, calls = _flaky(1, ValueError("bad schema"))
+    with pytest.raises(ValueError):
+        dispatcher.call(fn)
+    assert len(calls) == 1
+
+    fn, calls = _flaky(10, RateLimited("429"))
+    with pytest.raises(RateLimited):
+        dispatcher.call(fn)
+    assert len(calls) == 4
+    assert dispatcher.failed == 1
+
+
+def test_stream_retries_only_before_the_first_chunk():
+    dispatcher = Dispatcher(max_retries=3, base_delay=0.001, max_delay=0.01)
+    opened = []
+
+    def open_stream():
+        opened.append(1)
+        if len(opened) == 1:
+            raise RateLimited("429")
+        yield "a"
+        if len(opened) == 2:
+            raise RateLimited("429")
+        yield "b"
+
+    received = []
+    with pytest.raises(RateLimited):
+        for chunk in dispatcher.stream(open_stream):
+            received.append(chunk)
+    # Opened twice (one retry before output), then the mid-stream 429 propagates.
+    assert (len(opened), received) == (2, ["a"])
+
+
+def test_higher_priority_is_admitted_first_when_throttled():
+    # One request of burst and ten per second: the second and third callers queue.
+    dispatcher = Dispatcher(rpm=600, burst_s=0.1)
+    dispatcher.admit(priority=PRIORITY_BATCH)
+    order = []
+
+    def worker(name, priority):
+        dispatcher.admit(priority=priority)
+        order.append(name)
+
+    batch = threading.Thread(target=worker, args=("batch", PRIORITY_BATCH))
+    batch.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=worker, args=("interactive", PRIORITY_INTERACTIVE))
+    interactive.start()
+    batch.join(5)
+    interactive.join(5)
+    assert order == ["interactive", "batch"]
+    assert dispatcher.metrics()["admitted"] == 3
+
+
+def test_shared_clients_leave_retries_to_the_dispatcher(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    reset_clients()
+    try:
+        client = get_chat_client("gpt-4o-mini", 0.2)
+        assert client.max_retries == 0
+        assert get_chat_client("gpt-4o-mini", 0.2) is client
+    finally:
+        reset_clients()
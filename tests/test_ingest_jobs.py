@@ -0,0 +1,122 @@
+import shutil
+import time
+
+import pytest
+
+import app.rag.ingest_jobs as ingest_jobs
+import app.rag.pipeline as pipeline
+from app.rag.ingest_jobs import IngestQueue, JobStore, is_ready
+from app.rag.lexical import BM25Index, lexical_path
+from app.resources import ResourceManager, set_resources
+from benchmarks.fakes import HashEmbedder, synthetic_course_pdfs
+
+
+@pytest.fixture
+def pdfs(tmp_path):
+    # Three pages, then five.
+    return [
+        synthetic_course_pdfs(str(tmp_path / "pdfs"), files=1, pages=3, seed=4)[0],
+        synthetic_course_pdfs(str(tmp_path / "pdfs"), files=1, pages=5, seed=5)[0],
+    ]
+
+
+def _files(pdfs):
+    return [(p, f"f{i}.pdf", "material") for i, p in enumerate(pdfs)]
+
+
+def test_progress_covers_files_that_have_not_reported(tmp_path, pdfs):
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    job_id = store.create("db", "c", "", _files(pdfs), {"chunk_size": 1000, "overlap": 200})
+    job = store.get(job_id)
+    assert (job["pages_done"], job["pages_total"]) == (0, 8)
+
+    seen = []
+    store.update_file(job_id, 0, status="running", pages_done=2, pages_total=3)
+    seen.append(store.get(job_id)["pages_done"] / store.get(job_id)["pages_total"])
+    store.update_file(job_id, 0, status="done", pages_done=3, pages_total=3)
+    seen.append(store.get(job_id)["pages_done"] / store.get(job_id)["pages_total"])
+    store.update_file(job_id, 1, status="running", pages_done=1, pages_total=5)
+    seen.append(store.get(job_id)["pages_done"] / store.get(job_id)["pages_total"])
+    store.update_file(job_id, 1, status="done", pages_done=0, pages_total=5)
+    seen.append(store.get(job_id)["pages_done"] / store.get(job_id)["pages_total"])
+    # Never jumps back, and a file finished without page reports (skipped) counts in full.
+    assert seen == sorted(seen)
+    assert seen[0] == 2 / 8 and seen[-1] == 1.0
+
+
+def test_unreadable_file_weighs_one_page(tmp_path, pdfs):
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"not a pdf")
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    job_id = store.create("db", "c", "", _files([pdfs[0], str(broken)]), {})
+    assert store.get(job_id)["pages_total"] == 4
+
+
+def test_is_ready():
+    assert not is_ready(None, 10)
+    assert not is_ready({"status": "running", "chunks": 5}, 10)
+    assert is_ready({"status": "running", "chunks": 10}, 10)
+    assert is_ready({"status": "done", "chunks": 0}, 10)
+    assert is_ready({"status": "failed", "chunks": 3}, 10)
+    assert not is_ready({"status": "cancelled", "chunks": 0}, 10)
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setenv("QBANK_VECTOR_BACKEND", "numpy")
+    resources = ResourceManager()
+    embedder = HashEmbedder()
+    monkeypatch.setattr(resources, "embedder", lambda model_name=None: embedder)
+    set_resources(resources)
+    try:
+        yield IngestQueue(JobStore(str(tmp_path / "jobs.sqlite")), workers=2)
+    finally:
+        set_resources(None)
+
+
+def _finish(queue, job_id):
+    deadline = time.monotonic() + 30
+    while queue.get(job_id)["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.05)
+    job = queue.get(job_id)
+    assert job["status"] == "done", job["error"]
+    return job
+
+
+def test_queue_indexes_every_file(tmp_path, pdfs, queue):
+    persist = str(tmp_path / "db")
+    job = _finish(queue, queue.submit(persist, "c", _files(pdfs)))
+    assert job["pages_done"] == job["pages_total"] == 8
+    assert job["chunks"] == len(BM25Index(lexical_path(persist, "c")))
+
+    # A finished job is not reused; the new one finds every file in the manifest.
+    again = _finish(queue, queue.submit(persist, "c", _files(pdfs)))
+    assert again["job_id"] != job["job_id"]
+    assert all(f["skipped"] for f in again["files"])
+
+
+def test_reupload_of_earlier_version_is_indexed_again(tmp_path, pdfs, queue):
+    persist = str(tmp_path / "db")
+    path = str(tmp_path / "notes.pdf")
+    for version in (pdfs[0], pdfs[1], pdfs[0]):
+        shutil.copy(version, path)
+        _finish(queue, queue.submit(persist, "c", [(path, "notes.pdf", "material")]))
+    # v1 -> v2 -> v1: the index holds v1's three pages, not v2's five.
+    pages = {d["meta"]["page"] for d in BM25Index(lexical_path(persist, "c")).docs.values()}
+    assert max(pages) <= 3
+
+
+def test_one_extraction_pool_per_job(tmp_path, pdfs, queue, monkeypatch):
+    monkeypatch.setenv("QBANK_INGEST_WORKERS", "2")
+    opened = []
+
+    class CountingPool(ingest_jobs.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            opened.append(1)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(ingest_jobs, "ProcessPoolExecutor", CountingPool)
+    monkeypatch.setattr(pipeline, "ProcessPoolExecutor", CountingPool)
+    job = _finish(queue, queue.submit(str(tmp_path / "db"), "c", _files(pdfs)))
+    assert job["pages_done"] == 8
+    assert len(opened) == 1
@@ -0,0 +1,79 @@
+import json
+
+from app.rag.lexical import BM25Index, lexical_path
+from app.rag.manifest import IngestManifest, manifest_path
+from app.rag.numpy_index import NumpyIndex
+from app.rag.pipeline import ingest_pdfs
+from app.rag.retrieve import retrieve_top_k_strict
+from benchmarks.fakes import HashEmbedder, synthetic_course_pdfs
+
+TEXTS = {
+    "c1": "The Fourier transform maps a signal to its frequency spectrum.",
+    "c2": "Laplace transforms turn differential equations into algebra.",
+    "c3": "Sampling above the Nyquist rate avoids aliasing of the spectrum.",
+}
+METAS = {cid: {"source": "notes.pdf", "page": i, "source_type": "material"} for i, cid in enumerate(TEXTS, start=1)}
+
+
+def _store(tmp_path):
+    collection = NumpyIndex(str(tmp_path / "db" / "c.npindex"), HashEmbedder())
+    lexical = BM25Index(lexical_path(str(tmp_path / "db"), "c"))
+    ids = list(TEXTS)
+    collection.add_texts([TEXTS[i] for i in ids], [METAS[i] for i in ids], ids)
+    lexical.add(ids, [TEXTS[i] for i in ids], [METAS[i] for i in ids])
+    return collection, lexical
+
+
+def test_bm25_ranks_term_matches_and_filters(tmp_path):
+    _, lexical = _store(tmp_path)
+    assert [cid for cid, _ in lexical.search("spectrum aliasing")][0] == "c3"
+    assert {cid for cid, _ in lexical.search("spectrum")} == {"c1", "c3"}
+    assert [cid for cid, _ in lexical.search("spectrum", where={"page": 1})] == ["c1"]
+    assert lexical.search("spectrum", where={"page": 2}) == []
+
+
+def test_persist_keeps_postings_but_not_text(tmp_path):
+    _, lexical = _store(tmp_path)
+    lexical.persist()
+    data = json.loads(lexical.path.read_text(encoding="utf-8"))
+    assert "Nyquist" not in json.dumps(data)
+    reloaded = BM25Index(str(lexical.path))
+    assert reloaded.search("nyquist") == lexical.search("nyquist")
+
+    reloaded.delete(["c3"])
+    assert reloaded.search("nyquist") == []
+    assert [cid for cid, _ in reloaded.search("spectrum")] == ["c1"]
+    assert "nyquist" not in reloaded.postings
+
+
+def test_rrf_fuses_lexical_hits_with_text_from_the_vector_store(tmp_path):
+    collection, lexical = _store(tmp_path)
+    hits = retrieve_top_k_strict(collection, "nyquist aliasing", k=3, lexical_index=lexical)
+    assert hits[0]["text"] == TEXTS["c3"]
+    assert hits[0]["kw_score"] > 0
+    # Dense and lexical hits for the same chunk are one candidate.
+    assert len({h["text"] for h in hits}) == len(hits)
+
+    # A posting whose chunk is gone from the vector store is not fused as an empty hit.
+    collection.delete(["c3"])
+    hits = retrieve_top_k_strict(collection, "nyquist aliasing", k=3, lexical_index=lexical)
+    assert TEXTS["c3"] not in [h["text"] for h in hits]
+    assert all(h["text"] for h in hits)
+
+
+def test_collections_ingested_without_bm25_are_backfilled(tmp_path):
+    persist = str(tmp_path / "db")
+    pdfs = synthetic_course_pdfs(str(tmp_path / "pdfs"), files=2, pages=2, seed=3)
+    collection = NumpyIndex(str(tmp_path / "db" / "c.npindex"), HashEmbedder())
+    manifest = IngestManifest(manifest_path(persist, "c"))
+    # First ingest predates the lexical index.
+    ingest_pdfs(collection, manifest, [(pdfs[0], "a.pdf", "material")], workers=1)
+    assert manifest.get("a.pdf")["lexical"] is False
+
+    lexical = BM25Index(lexical_path(persist, "c"))
+    ingest_pdfs(collection, manifest, [(pdfs[1], "b.pdf", "material")], workers=1, lexical=lexical)
+    sources = {d["meta"]["source"] for d in BM25Index(lexical_path(persist, "c")).docs.values()}
+    assert sources == {"a.pdf", "b.pdf"}
+    reloaded = IngestManifest(manifest_path(persist, "c"))
+    assert reloaded.get("a.pdf")["lexical"] and reloaded.get("b.pdf")["lexical"]
+    assert len(lexical) == len(collection)
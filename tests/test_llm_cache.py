@@ -0,0 +1,82 @@
+import time
+
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from app.agents.llm import invoke_structured
+from app.agents.llm_cache import ResponseCache, cache_key, get_response_cache
+from app.schemas import AuditReport
+from benchmarks.fakes import FakeQBankChat
+
+
+class CountingChat(FakeQBankChat):
+    calls: int = 0
+    reply: str | None = None
+
+    def _respond(self, messages):
+        self.calls += 1
+        return self.reply if self.reply is not None else super()._respond(messages)
+
+
+def test_key_covers_prompt_model_and_temperature():
+    base = cache_key("sys", "user", "gpt-4o-mini", 0.2)
+    assert cache_key("sys", "user", "gpt-4o-mini", 0.2) == base
+    variants = [
+        cache_key("sys", "user2", "gpt-4o-mini", 0.2),
+        cache_key("sys", "user", "gpt-4o", 0.2),
+        cache_key("sys", "user", "gpt-4o-mini", 0.7),
+    ]
+    assert base not in variants and len(set(variants)) == 3
+
+
+def test_memory_then_disk_tiers(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, max_memory=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+    assert cache.get("c") == "C" and cache.memory_hits == 1
+    # "a" fell out of the 2-entry LRU but is still on disk.
+    assert cache.get("a") == "A" and cache.disk_hits == 1
+    assert cache.get("missing") is None and cache.misses == 1
+
+    reopened = ResponseCache(path)
+    assert reopened.get("b") == "B" and reopened.disk_hits == 1
+    assert reopened.stats()["hit_rate"] == 1.0
+
+
+def test_entries_expire_and_disk_is_bounded(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_disk=3, ttl_s=60)
+    for i in range(5):
+        cache.put(f"k{i}", str(i))
+    assert cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 3
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("k4") is None
+    assert cache._db.execute("SELECT COUNT(*) FROM responses WHERE key = 'k4'").fetchone()[0] == 0
+
+
+def test_invoke_structured_serves_repeats_from_the_cache_and_skips_bad_output(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    parser = PydanticOutputParser(pydantic_object=AuditReport)
+    template = ChatPromptTemplate.from_messages([("system", "You are an educational auditor."), ("user", "{prompt}")])
+    chat = CountingChat()
+
+    first = invoke_structured(chat, template, parser, {"prompt": "bank 1"}, cache=cache)
+    again = invoke_structured(chat, template, parser, {"prompt": "bank 1"}, cache=cache)
+    assert first == again and chat.calls == 1
+    invoke_structured(chat, template, parser, {"prompt": "bank 2"}, cache=cache)
+    assert chat.calls == 2
+
+    # A completion that does not parse is not stored, so the next call asks again.
+    broken = CountingChat(reply="not json")
+    for _ in range(2):
+        with pytest.raises(OutputParserException):
+            invoke_structured(broken, template, parser, {"prompt": "bank 3"}, cache=cache)
+    assert broken.calls == 2
+
+
+def test_cache_can_be_switched_off(monkeypatch):
+    monkeypatch.setenv("QBANK_LLM_CACHE", "off")
+    assert get_response_cache() is None
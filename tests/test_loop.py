@@ -0,0 +1,149 @@
+import re
+from concurrent.futures import Future
+
+from app.agents.auditor import AuditorAgent
+from app.agents.generator import GeneratorAgent
+from app.agents.loop import run_generation_loop
+from app.schemas import QuestionBank
+from benchmarks.fakes import TERMS, FakeQBankChat
+
+CTX = [
+    {
+        "source": "notes.pdf",
+        "page": p,
+        "source_type": "material",
+        # Distinct vocabulary per page so questions on different pages are not near-duplicates.
+        "text": " ".join(TERMS[(p * 4 + k) % len(TERMS)] + str(p) for k in range(24)),
+    }
+    for p in range(1, 13)
+]
+TARGETS = {"topic": "signals", "num_questions": 12, "marks_each": 2, "difficulty_mix": "Medium"}
+
+
+class RecordingGenerator(GeneratorAgent):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.avoided: list[list[str] | None] = []
+
+    def generate(self, *args, avoid_questions=None, **kwargs):
+        self.avoided.append(avoid_questions)
+        return super().generate(*args, avoid_questions=avoid_questions, **kwargs)
+
+
+def _run(seed: Future, seed_count: int, arrivals: list, gen: GeneratorAgent | None = None):
+    chat = FakeQBankChat()
+    return run_generation_loop(
+        "Signals",
+        TARGETS,
+        CTX,
+        subject_profile=None,
+        question_mix=None,
+        max_iters=1,
+        seed=seed,
+        seed_count=seed_count,
+        on_question=arrivals.append,
+        generator=gen or GeneratorAgent(client=chat),
+        auditor=AuditorAgent(client=chat),
+    )
+
+
+def test_failed_seed_is_made_up_by_the_loop():
+    seed: Future = Future()
+    seed.set_exception(RuntimeError("no script context"))
+    arrivals = []
+    qb, _, _ = _run(seed, 5, arrivals)
+    assert len(qb.questions) == 12
+    assert [q.id for q in qb.questions] == [f"Q{i}" for i in range(1, 13)]
+    # The top-up questions are streamed to the caller like the rest.
+    assert len(arrivals) == 12
+
+
+def test_remainder_questions_repeating_the_seed_are_replaced():
+    # The fake model answers the same prompt with the same questions, so the
+    # remainder's first questions repeat the seed's.
+    chat = FakeQBankChat()
+    seed_targets = dict(TARGETS, num_questions=5)
+    seed_bank = GeneratorAgent(client=chat).generate("Signals", seed_targets, CTX)
+    seed: Future = Future()
+    seed.set_result(seed_bank)
+    gen = RecordingGenerator(client=FakeQBankChat())
+    qb, _, _ = _run(seed, 5, [], gen)
+    seed_texts = [q.question_text for q in seed_bank.questions]
+    texts = [q.question_text for q in qb.questions]
+    assert isinstance(qb, QuestionBank)
+    assert len(texts) == 12
+    assert texts[:5] == seed_texts
+    # Of the 7-question remainder only the 2 new ones are kept ...
+    assert not set(texts[5:7]) & set(seed_texts)
+    # ... and the top-up for the 5 dropped ones excludes everything kept.
+    assert gen.avoided[-1] == seed_texts + texts[5:7]
+
+
+class RenamingChat(FakeQBankChat):
+    # Answers with its own spelling of the course name.
+    def _bank(self, prompt: str) -> dict:
+        return {**super()._bank(prompt), "course": "Signals & Systems (EE201)"}
+
+
+def test_bank_is_keyed_on_the_requested_course():
+    chat = RenamingChat()
+    qb, _, _ = run_generation_loop(
+        "Signals",
+        TARGETS,
+        CTX,
+        subject_profile=None,
+        question_mix=None,
+        max_iters=2,
+        repair=True,
+        generator=GeneratorAgent(client=chat),
+        auditor=AuditorAgent(client=chat),
+    )
+    assert qb.course == "Signals"
+    assert len(qb.questions) == 12
+
+
+class RepairChat(FakeQBankChat):
+    """
+    Breaks Q2's citation in the first bank, answers the first repair with a
+    kept question's wording (as a cached repair prompt would), and after
+    that leaves out the approved questions it is shown.
+    """
+
+    calls: int = 0
+
+    def _bank(self, prompt: str) -> dict:
+        self.calls += 1
+        if self.calls == 1:
+            bank = super()._bank(prompt)
+            bank["questions"][1]["source_citation"][0]["page"] = 999
+            return bank
+        if self.calls == 2:
+            return super()._bank(prompt)
+        block = re.search(r"Already approved questions.*?\n((?:- .*\n)+)", prompt)
+        approved = {line[2:] for line in block.group(1).splitlines()} if block else set()
+        count = int(re.search(r"num_questions: (\d+)", prompt).group(1))
+        bank = super()._bank(re.sub(r"num_questions: \d+", f"num_questions: {len(approved) + count}", prompt))
+        fresh = [q for q in bank["questions"] if q["question_text"] not in approved]
+        return {**bank, "questions": fresh[:count]}
+
+
+def test_repair_replacements_repeating_kept_questions_are_replaced():
+    gen_chat = RepairChat()
+    qb, audit, logs = run_generation_loop(
+        "Signals",
+        TARGETS,
+        CTX,
+        subject_profile=None,
+        question_mix=None,
+        max_iters=2,
+        repair=True,
+        generator=GeneratorAgent(client=gen_chat),
+        auditor=AuditorAgent(client=FakeQBankChat()),
+    )
+    assert [log["passed"] for log in logs] == [False, True]
+    assert audit.passed
+    texts = [q.question_text for q in qb.questions]
+    assert len(texts) == 12 and len(set(texts)) == 12
+    # Bank, repair (a repeat of Q1, dropped), top-up.
+    assert gen_chat.calls == 3
+    assert [q.id for q in qb.questions] == [f"Q{i}" for i in range(1, 13)]
@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+
+from app.rag.ann import IVFIndex
+from app.rag.numpy_index import NumpyIndex
+from benchmarks.fakes import TERMS, HashEmbedder
+
+EMBEDDER = HashEmbedder(dim=32)
+
+
+def _texts(start: int, n: int) -> list[str]:
+    return [" ".join(TERMS[(i * 3 + k) % len(TERMS)] for k in range(6)) + f" {i}" for i in range(start, start + n)]
+
+
+def _add(index: NumpyIndex, start: int, n: int) -> None:
+    texts = _texts(start, n)
+    metas = [{"source": f"s{i % 2}.pdf", "page": i} for i in range(start, start + n)]
+    index.add_texts(texts, metas, [f"c{i}" for i in range(start, start + n)])
+
+
+def _reload(index: NumpyIndex, cls=NumpyIndex) -> NumpyIndex:
+    return cls(str(index.path), EMBEDDER)
+
+
+def test_persist_after_appends_writes_only_the_new_rows(tmp_path):
+    index = NumpyIndex(str(tmp_path / "c.npindex"), EMBEDDER)
+    _add(index, 0, 10)
+    index.persist()
+    base_meta = (index.path / "meta.json").read_text(encoding="utf-8")
+    inode = (index.path / "vectors.npy").stat().st_ino
+
+    _add(index, 10, 5)
+    index.persist()
+    _add(index, 15, 5)
+    index.persist()
+    # meta.json is untouched, the matrix grew in place, each persist added one journal line.
+    assert (index.path / "meta.json").read_text(encoding="utf-8") == base_meta
+    assert (index.path / "vectors.npy").stat().st_ino == inode
+    journal = (index.path / "meta.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [(e["start"], len(e["ids"])) for e in map(json.loads, journal)] == [(10, 5), (15, 5)]
+
+    reloaded = _reload(index)
+    assert reloaded.ids == [f"c{i}" for i in range(20)]
+    assert reloaded.vectors.shape == (20, 32)
+    np.testing.assert_allclose(np.asarray(reloaded.vectors), np.asarray(index.vectors))
+    query = _texts(17, 1)[0]
+    assert reloaded.similarity_search_with_score(query, k=1, filter={"source": "s1.pdf"})[0][0].id == "c17"
+
+
+def test_delete_rewrites_and_folds_the_journal(tmp_path):
+    index = NumpyIndex(str(tmp_path / "c.npindex"), EMBEDDER)
+    _add(index, 0, 6)
+    index.persist()
+    _add(index, 6, 4)
+    index.persist()
+    index.delete(["c1", "c7"])
+    index.persist()
+    assert not (index.path / "meta.jsonl").exists()
+    _add(index, 10, 2)
+    index.persist()
+
+    reloaded = _reload(index)
+    assert reloaded.ids == [f"c{i}" for i in (0, 2, 3, 4, 5, 6, 8, 9, 10, 11)]
+    assert reloaded.get(["c8", "c1"]) == {
+        "ids": ["c8"],
+        "documents": _texts(8, 1),
+        "metadatas": [{"source": "s0.pdf", "page": 8}],
+    }
+
+
+def test_interrupted_append_keeps_the_rows_both_files_have(tmp_path):
+    index = NumpyIndex(str(tmp_path / "c.npindex"), EMBEDDER)
+    _add(index, 0, 4)
+    index.persist()
+    # A journal entry whose vectors never made it to disk, then a torn line.
+    with open(index.path / "meta.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps({"start": 4, "ids": ["c4"], "texts": ["x"], "metadatas": [{}]}) + "\n")
+        f.write('{"start": 5, "ids": [')
+
+    reloaded = _reload(index)
+    assert reloaded.ids == ["c0", "c1", "c2", "c3"]
+    _add(reloaded, 4, 2)
+    reloaded.persist()
+    assert _reload(reloaded).ids == [f"c{i}" for i in range(6)]
+
+
+def test_ivf_index_round_trips_through_appends(tmp_path):
+    index = IVFIndex(str(tmp_path / "c.ivf"), EMBEDDER, nlist=4, nprobe=4, min_train=8)
+    _add(index, 0, 12)
+    index.persist()
+    _add(index, 12, 4)
+    index.persist()
+    reloaded = _reload(index, IVFIndex)
+    assert len(reloaded) == 16 and reloaded.assign.shape == (16,)
+    assert reloaded.similarity_search_with_score(_texts(14, 1)[0], k=1)[0][0].id == "c14"
@@ -0,0 +1,90 @@
+import threading
+import time
+
+from app.rag.lexical import BM25Index, lexical_path
+from app.resources import ResourceManager
+from benchmarks.fakes import HashEmbedder
+
+
+def _manager(tmp_path, monkeypatch, **kwargs):
+    rm = ResourceManager(**kwargs)
+    embedder = HashEmbedder()
+    monkeypatch.setattr(rm, "embedder", lambda model_name=None: embedder)
+    return rm, str(tmp_path / "db")
+
+
+def test_collections_and_indexes_are_opened_once_and_counted(tmp_path, monkeypatch):
+    rm, persist = _manager(tmp_path, monkeypatch)
+    first = rm.collection(persist, "a", backend="numpy")
+    assert rm.collection(persist, "a", backend="numpy") is first
+    lexical = rm.lexical(persist, "a", backend="numpy")
+    assert rm.lexical(persist, "a", backend="numpy") is lexical
+    stats = rm.stats()
+    assert (stats["opened"], stats["reused"]) == (2, 2)
+    assert stats["collections"] == ["a"]
+
+
+def test_lexical_requests_sweep_like_collection_requests(tmp_path, monkeypatch):
+    rm, persist = _manager(tmp_path, monkeypatch, max_collections=1)
+    rm.lexical(persist, "a")
+    rm.lexical(persist, "b")
+    assert rm.stats()["collections"] == ["b"]
+    assert rm.released == 1
+
+
+def test_sweep_releases_idle_then_least_recently_used(tmp_path, monkeypatch):
+    rm, persist = _manager(tmp_path, monkeypatch, idle_s=60, max_collections=2)
+    for name in ("a", "b"):
+        rm.collection(persist, name, backend="numpy")
+    rm.collection(persist, "a", backend="numpy")
+    rm.collection(persist, "c", backend="numpy")
+    # "b" was the least recently used of three.
+    assert rm.stats()["collections"] == ["a", "c"]
+    assert rm.sweep(now=time.monotonic() + 61) == ["a", "c"]
+    assert rm.stats()["collections"] == []
+
+
+def test_invalidate_hands_new_readers_the_committed_index(tmp_path, monkeypatch):
+    rm, persist = _manager(tmp_path, monkeypatch)
+    old = rm.lexical(persist, "a")
+    assert len(old) == 0
+
+    writer = BM25Index(lexical_path(persist, "a"))
+    writer.add(["c1"], ["nyquist sampling"], [{"source": "notes.pdf"}])
+    writer.persist()
+    # Until invalidated, readers keep the cached snapshot.
+    assert rm.lexical(persist, "a") is old
+
+    rm.invalidate(persist, "a")
+    fresh = rm.lexical(persist, "a")
+    assert fresh is not old
+    assert [cid for cid, _ in fresh.search("nyquist")] == ["c1"]
+    assert len(old) == 0
+
+
+def test_counters_add_up_under_concurrent_requests(tmp_path, monkeypatch):
+    rm, persist = _manager(tmp_path, monkeypatch)
+
+    def worker():
+        for _ in range(50):
+            rm.collection(persist, "a", backend="numpy")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert (rm.opened, rm.reused) == (1, 399)
+
+
+def test_agents_are_built_outside_the_manager_lock(tmp_path, monkeypatch):
+    rm, _ = _manager(tmp_path, monkeypatch)
+    built = []
+
+    class Agent:
+        def __init__(self, model):
+            built.append(rm._lock.locked())
+
+    first = rm._agent(Agent, "m")
+    assert rm._agent(Agent, "m") is first
+    assert built == [False]
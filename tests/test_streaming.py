@@ -0,0 +1,51 @@
+import json
+
+from app.agents.streaming import QuestionStreamParser
+
+
+def _item(n: int, **extra) -> dict:
+    return {
+        "id": f"Q{n}",
+        "question_text": f'Explain "aliasing" {{case {n}}} [p{n}].',
+        "bloom_level": "Understand",
+        "co_mapping": "CO1",
+        "difficulty": "Medium",
+        "marks": 2,
+        "answer_key": "Sampling below the Nyquist rate folds high frequencies.",
+        "detailed_rubric": "1 mark per point.",
+        "source_citation": [{"source": "notes.pdf", "page": n, "snippet": "Nyquist rate"}],
+        **extra,
+    }
+
+
+def _feed(text: str, size: int) -> tuple[QuestionStreamParser, list[tuple[int, str]]]:
+    # Returns (parser, [(offset at which each item was emitted, id)]).
+    parser = QuestionStreamParser()
+    emitted = []
+    for i in range(0, len(text), size):
+        emitted += [(i + size, item.id) for item in parser.feed(text[i:i + size])]
+    return parser, emitted
+
+
+def test_items_are_emitted_as_soon_as_they_close_for_any_chunking():
+    doc = json.dumps({"course": "Signals", "questions": [_item(1), _item(2), _item(3)]}, indent=1)
+    text = "```json\n" + doc + "\n```"
+    for size in (1, 7, 64, len(text)):
+        parser, emitted = _feed(text, size)
+        assert [qid for _, qid in emitted] == ["Q1", "Q2", "Q3"]
+        assert parser.invalid == 0
+    # Character by character, Q1 arrives right after its closing brace, long before the document ends.
+    _, emitted = _feed(text, 1)
+    q1_end = text.index('"Q2"')
+    assert emitted[0][0] < q1_end
+
+
+def test_invalid_items_are_counted_not_raised_and_nested_objects_are_not_items():
+    bank = {
+        "course": "Signals",
+        "meta": {"questions": [{"id": "not an item"}]},
+        "questions": [_item(1), {"id": "Q2", "question_text": "no other fields"}, _item(3, marks=50), _item(4)],
+    }
+    parser, emitted = _feed(json.dumps(bank), 16)
+    assert [qid for _, qid in emitted] == ["Q1", "Q4"]
+    assert parser.invalid == 2
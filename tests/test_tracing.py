@@ -0,0 +1,41 @@
+from app.tracing import span, suspended, trace
+
+
+def _produce(n):
+    with span("produce"):
+        for i in range(n):
+            with span("produce.item"):
+                pass
+            with suspended():
+                yield i
+
+
+def test_consumer_spans_are_not_nested_under_a_suspended_producer():
+    with trace("run") as run:
+        with span("consume"):
+            for _ in _produce(2):
+                with span("consume.item"):
+                    pass
+        with span("after"):
+            pass
+    spans = {}
+    for s in run.spans:
+        spans.setdefault(s.name, []).append(s)
+    by_id = {s.span_id: s.name for s in run.spans}
+    assert by_id[spans["produce"][0].parent_id] == "consume"
+    assert {by_id[s.parent_id] for s in spans["produce.item"]} == {"produce"}
+    assert {by_id[s.parent_id] for s in spans["consume.item"]} == {"consume"}
+    assert by_id[spans["after"][0].parent_id] == "run"
+
+
+def test_producer_closed_early_restores_the_consumer_span():
+    with trace("run") as run:
+        with span("consume"):
+            items = _produce(3)
+            next(items)
+            items.close()
+            with span("consume.item"):
+                pass
+    by_id = {s.span_id: s.name for s in run.spans}
+    item = next(s for s in run.spans if s.name == "consume.item")
+    assert by_id[item.parent_id] == "consume"